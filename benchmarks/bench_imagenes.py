@@ -0,0 +1,129 @@
+"""
+Benchmark de conf.manejo_imagenes.procesar_imagen.
+
+Compara el pipeline anterior (decodificación completa + resize +
+optimize=True) con el actual (draft + thumbnail con reducing_gap)
+midiendo tiempo de CPU y memoria máxima (RSS) por tipo de imagen.
+Cada combinación corre en un proceso nuevo para que el RSS máximo
+de una no contamine a la otra.
+
+Uso:
+    python benchmarks/bench_imagenes.py [--corpus carpeta] [--count 5]
+
+Sin --corpus se generan fotos JPEG sintéticas de 48MP (8000x6000).
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+TIPOS = ("logo", "boleta", "articulo")
+EXTENSIONES = {".jpg", ".jpeg", ".png", ".webp"}
+
+
+def procesar_imagen_anterior(imagen, nuevo_nombre, tipo="articulo"):
+    """pipeline previo, se mantiene solo para comparar"""
+    from PIL import Image
+
+    img = Image.open(imagen)
+    if img.mode in ("RGBA", "P"):
+        img = img.convert("RGB")
+    size = {"logo": (300, 300), "boleta": (1024, 1024),
+            "articulo": (800, 800)}[tipo]
+    img = img.resize(size)
+    img_io = BytesIO()
+    img.save(img_io, "JPEG", quality=85, optimize=True)
+    img_io.seek(0)
+    return img_io
+
+
+def medir(pipeline, tipo, rutas, cola):
+    """corre en un proceso hijo y devuelve (cpu, rss_max, bytes)"""
+    if pipeline == "actual":
+        sys.path.insert(0, str(BASE_DIR))
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "conf.settings")
+        os.environ.setdefault("SECRET_KEY", "bench")
+        import django
+        django.setup()
+        from conf.manejo_imagenes import procesar_imagen
+    else:
+        procesar_imagen = procesar_imagen_anterior
+
+    inicio = time.process_time()
+    salida = 0
+    for ruta in rutas:
+        with open(ruta, "rb") as f:
+            salida += len(procesar_imagen(f, "bench", tipo).getvalue())
+    cpu = time.process_time() - inicio
+
+    # ru_maxrss está en KB en Linux
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    cola.put((cpu, rss, salida))
+
+
+def generar_corpus(carpeta, count):
+    """fotos sintéticas de 48MP con ruido para que no compriman trivial"""
+    from PIL import Image
+
+    for i in range(count):
+        ruido = Image.effect_noise((8000, 6000), 40 + i * 5)
+        img = Image.merge("RGB", (
+            ruido,
+            ruido.rotate(90, expand=False),
+            Image.linear_gradient("L").resize((8000, 6000)),
+        ))
+        ruta = Path(carpeta) / f"sintetica-{i}.jpg"
+        img.save(ruta, "JPEG", quality=90)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus", help="carpeta con imagenes")
+    parser.add_argument("--count", type=int, default=5,
+                        help="imagenes sintéticas a generar")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.corpus:
+            rutas = sorted(
+                p for p in Path(args.corpus).iterdir()
+                if p.suffix.lower() in EXTENSIONES)
+        else:
+            print(f"Generando {args.count} imagenes de 48MP...")
+            # en otro proceso, si no el RSS máximo del padre (que
+            # heredan los hijos) ya incluiría las imagenes generadas
+            generador = ctx.Process(
+                target=generar_corpus, args=(tmp, args.count))
+            generador.start()
+            generador.join()
+            rutas = sorted(Path(tmp).glob("sintetica-*.jpg"))
+
+        if not rutas:
+            sys.exit("El corpus no tiene imagenes")
+
+        print(f"{len(rutas)} imagenes\n")
+        print(f"{'tipo':<10}{'pipeline':<10}{'cpu (s)':>10}"
+              f"{'cpu/img':>10}{'rss max (MB)':>14}{'salida (KB)':>13}")
+
+        for tipo in TIPOS:
+            for pipeline in ("anterior", "actual"):
+                cola = ctx.Queue()
+                proceso = ctx.Process(
+                    target=medir, args=(pipeline, tipo, rutas, cola))
+                proceso.start()
+                cpu, rss, salida = cola.get()
+                proceso.join()
+                print(f"{tipo:<10}{pipeline:<10}{cpu:>10.2f}"
+                      f"{cpu / len(rutas):>10.3f}{rss:>14.1f}"
+                      f"{salida / 1024:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
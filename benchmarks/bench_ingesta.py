@@ -0,0 +1,155 @@
+"""
+Benchmark de la ingesta de imagenes (conf.ingesta).
+
+Mide la memoria máxima (RSS) y el tiempo del proceso web al recibir
+imagenes, antes de enviarlas al pool:
+
+- subidas: varias fotos grandes recibidas a la vez. El camino
+  anterior (ImageField + read() para enviar el contenido al pool)
+  deja cada archivo entero en memoria, el actual valida el
+  encabezado y envía la ruta del archivo temporal.
+- dimensiones: un PNG liviano de 9000x9000 subido como logo. El
+  camino anterior lo decodificaba completo, el actual lo rechaza
+  leyendo solo el encabezado.
+
+Cada caso corre en un proceso nuevo para que el RSS máximo de uno
+no contamine al otro.
+
+Uso:
+    python benchmarks/bench_ingesta.py [--uploads 4]
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def preparar_django():
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "conf.settings")
+    os.environ.setdefault("SECRET_KEY", "bench")
+    import django
+    django.setup()
+
+
+def recibir(rutas):
+    """
+    Copia cada archivo por bloques a un TemporaryUploadedFile, igual
+    que el upload handler con archivos sobre
+    FILE_UPLOAD_MAX_MEMORY_SIZE.
+    """
+    from django.core.files.uploadedfile import TemporaryUploadedFile
+
+    archivos = []
+    for ruta in rutas:
+        archivo = TemporaryUploadedFile(
+            Path(ruta).name, "image/jpeg", Path(ruta).stat().st_size, None)
+        with open(ruta, "rb") as f:
+            for bloque in iter(lambda: f.read(64 * 1024), b""):
+                archivo.write(bloque)
+        archivo.seek(0)
+        archivos.append(archivo)
+    return archivos
+
+
+def rss_mb():
+    # ru_maxrss está en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def medir(caso, pipeline, rutas, cola):
+    preparar_django()
+    from PIL import Image
+    from rest_framework import serializers
+    from conf import ingesta
+
+    tipo = "articulo" if caso == "subidas" else "logo"
+    archivos = recibir(rutas)
+    base = rss_mb()
+
+    inicio = time.perf_counter()
+    retenidos = []
+    rechazadas = 0
+    for archivo in archivos:
+        if pipeline == "anterior":
+            # ImageField verifica sobre el contenido en memoria y el
+            # servicio de imagenes enviaba el contenido al pool
+            data = archivo.read()
+            with Image.open(BytesIO(data)) as img:
+                img.verify()
+            if caso == "dimensiones":
+                # procesar_imagen decodificaba la imagen completa
+                Image.open(BytesIO(data)).convert("RGB")
+            retenidos.append(data)
+        else:
+            try:
+                ingesta.validar_encabezado(archivo, tipo)
+            except serializers.ValidationError:
+                rechazadas += 1
+                continue
+            retenidos.append(ingesta.origen(archivo))
+    segundos = time.perf_counter() - inicio
+
+    cola.put((segundos, base, rss_mb(), rechazadas))
+
+
+def generar(carpeta, uploads):
+    """fotos con ruido (no comprimen) y un PNG liso de 9000x9000"""
+    from PIL import Image
+
+    for i in range(uploads):
+        ruido = Image.effect_noise((4000, 3000), 60 + i)
+        img = Image.merge("RGB", (
+            ruido,
+            ruido.transpose(Image.Transpose.FLIP_LEFT_RIGHT),
+            ruido.transpose(Image.Transpose.FLIP_TOP_BOTTOM),
+        ))
+        img.save(Path(carpeta) / f"foto-{i}.jpg", "JPEG", quality=95)
+    Image.new("RGB", (9000, 9000), "white").save(
+        Path(carpeta) / "enorme.png", "PNG")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--uploads", type=int, default=4,
+                        help="fotos recibidas a la vez")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        generador = ctx.Process(target=generar, args=(tmp, args.uploads))
+        generador.start()
+        generador.join()
+
+        casos = {
+            "subidas": sorted(Path(tmp).glob("foto-*.jpg")),
+            "dimensiones": [Path(tmp) / "enorme.png"],
+        }
+        total = sum(p.stat().st_size for p in casos["subidas"])
+        print(f"{args.uploads} fotos, {total / 1024 / 1024:.1f}MB en total\n")
+        print(f"{'caso':<13}{'pipeline':<10}{'tiempo (s)':>11}"
+              f"{'rss base':>10}{'rss max':>10}{'extra (MB)':>12}"
+              f"{'rechazadas':>12}")
+
+        for caso, rutas in casos.items():
+            for pipeline in ("anterior", "actual"):
+                cola = ctx.Queue()
+                proceso = ctx.Process(
+                    target=medir, args=(caso, pipeline, rutas, cola))
+                proceso.start()
+                segundos, base, maximo, rechazadas = cola.get()
+                proceso.join()
+                print(f"{caso:<13}{pipeline:<10}{segundos:>11.3f}"
+                      f"{base:>10.1f}{maximo:>10.1f}"
+                      f"{maximo - base:>12.1f}{rechazadas:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark de un ataque de logins fallidos.
+
+Mide la latencia y el throughput de un endpoint normal (por defecto
+la búsqueda de productos) antes y durante una ráfaga de logins
+fallidos contra el servidor. Los intentos fallidos no esperan, el
+cliente queda bloqueado en Redis y recibe 429
+(users.utils.failed_attempt_lockout), así que con WSGI o ASGI el
+endpoint normal debería mantener su throughput. El test
+users.tests.FailedAttemptLockoutTests cubre lo mismo sin servidor.
+
+LoginThrottle limita a 20 intentos por hora por IP y los rechazados
+(429) no esperan, para medir el peor caso conviene correrlo en un
+entorno de prueba con la tasa del throttle aumentada.
+
+Uso, con el servidor corriendo (ej: gunicorn conf.wsgi:application):
+    python benchmarks/bench_login_flood.py --url http://localhost:8000 \\
+        [--attackers 200] [--seconds 20]
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+LOGIN_PATH = "/api/users/login/"
+NORMAL_PATH = "/api/products/search/?q=bench"
+
+
+def request(url, data=None):
+    body = json.dumps(data).encode() if data is not None else None
+    req = urllib.request.Request(
+        url, data=body, headers={"Content-Type": "application/json"})
+    inicio = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except OSError:
+        status = None
+    return status, time.perf_counter() - inicio
+
+
+def medir_normal(url, seconds, clients):
+    """requests/s y latencias del endpoint normal"""
+    fin = time.monotonic() + seconds
+    latencias = []
+    errores = 0
+    lock = threading.Lock()
+
+    def cliente():
+        nonlocal errores
+        while time.monotonic() < fin:
+            status, segundos = request(url)
+            with lock:
+                if status == 200:
+                    latencias.append(segundos)
+                else:
+                    errores += 1
+
+    with ThreadPoolExecutor(clients) as pool:
+        for _ in range(clients):
+            pool.submit(cliente)
+
+    latencias.sort()
+    p = lambda q: latencias[int(q * (len(latencias) - 1))] if latencias else 0
+    return {
+        "rps": len(latencias) / seconds,
+        "p50": p(0.5),
+        "p95": p(0.95),
+        "errores": errores,
+    }
+
+
+def flood(url, attackers, stop):
+    """logins fallidos sin pausa hasta que stop se active"""
+    def atacante(i):
+        while not stop.is_set():
+            request(url, {"email": f"bench{i}@example.com",
+                          "password": "incorrecta"})
+
+    pool = ThreadPoolExecutor(attackers)
+    for i in range(attackers):
+        pool.submit(atacante, i)
+    return pool
+
+
+def mostrar(nombre, r):
+    print(f"{nombre:<10}{r['rps']:>10.1f}{r['p50'] * 1000:>10.0f}"
+          f"{r['p95'] * 1000:>10.0f}{r['errores']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--attackers", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=20)
+    args = parser.parse_args()
+
+    normal = args.url.rstrip("/") + NORMAL_PATH
+    login = args.url.rstrip("/") + LOGIN_PATH
+
+    print(f"{'fase':<10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'errores':>10}")
+    mostrar("normal", medir_normal(normal, args.seconds, args.clients))
+
+    stop = threading.Event()
+    pool = flood(login, args.attackers, stop)
+    # se deja que los atacantes lleguen a la espera de 4 a 10s
+    time.sleep(2)
+    mostrar("ataque", medir_normal(normal, args.seconds, args.clients))
+    stop.set()
+    pool.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    main()
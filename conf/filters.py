@@ -0,0 +1,32 @@
+"""
+Filtros de queryset compartidos por las apps.
+"""
+from rest_framework.filters import BaseFilterBackend
+
+
+def is_admin(user):
+    return user.is_staff or user.is_superuser
+
+
+class OwnerStoreFilterBackend(BaseFilterBackend):
+    """
+    Deja solo las filas de la tienda del usuario autenticado
+    filtrando por store_name_id en la misma consulta, los
+    administradores ven todo.
+    La vista puede cambiar la columna con owner_field y limitar el
+    filtro a algunas acciones de un ViewSet con owner_actions.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        actions = getattr(view, "owner_actions", None)
+        if actions is not None and getattr(view, "action", None) not in actions:
+            return queryset
+
+        user = request.user
+        if not user or not user.is_authenticated:
+            return queryset.none()
+        if is_admin(user):
+            return queryset
+
+        owner_field = getattr(view, "owner_field", "store_name_id")
+        return queryset.filter(**{owner_field: user.id})
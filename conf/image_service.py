@@ -0,0 +1,235 @@
+"""
+Servicio para procesar imagenes fuera del hilo del request.
+El trabajo de PIL corre en un ProcessPoolExecutor acotado
+(IMAGE_WORKERS) para no ocupar la CPU de los workers web. Si ya hay
+IMAGE_WORKERS + IMAGE_QUEUE_SIZE imagenes en curso se responde 503
+en lugar de encolar sin límite. Los límites por tipo se revisan en
+el proceso web antes de enviar nada al pool (ver conf/ingesta.py).
+Si un worker muere el pool se descarta y se crea otro en el
+siguiente request.
+"""
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from conf import ingesta, manejo_imagenes
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pool = None
+_slots = None
+# métricas del proceso web, por tipo de imagen
+_metricas = {"en_curso": 0, "max_en_curso": 0, "rechazadas": 0,
+             "tipos": {}}
+
+
+class ImagenesSaturadas(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Hay demasiadas imagenes en proceso, intente nuevamente."
+    default_code = "images_busy"
+
+
+class ImagenTimeout(APIException):
+    status_code = status.HTTP_504_GATEWAY_TIMEOUT
+    default_detail = "La imagen tardó demasiado en procesarse."
+    default_code = "image_timeout"
+
+
+class ImagenesReiniciadas(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = (
+        "El procesamiento de imagenes se reinició, intente nuevamente.")
+    default_code = "images_restarted"
+
+
+def _alarma(signum, frame):
+    raise TimeoutError("Tiempo de procesamiento agotado")
+
+
+def _iniciar_worker():
+    """los procesos del pool parten sin Django configurado"""
+    import django
+    django.setup()
+    if hasattr(signal, "setitimer"):
+        signal.signal(signal.SIGALRM, _alarma)
+
+
+def _con_limite(segundos, func, *args):
+    """
+    Corre en el worker con un límite de tiempo. future.cancel() no
+    detiene una tarea que ya empezó, con la alarma la tarea termina
+    y el proceso queda libre aunque el request ya no espere.
+    """
+    if not hasattr(signal, "setitimer"):
+        return func(*args)
+    signal.setitimer(signal.ITIMER_REAL, segundos)
+    try:
+        return func(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def _get_pool():
+    """
+    crea el pool la primera vez que se usa (y después de descartar
+    uno roto). Los cupos se crean una sola vez por proceso.
+    """
+    global _pool, _slots
+    with _lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(
+                settings.IMAGE_WORKERS + settings.IMAGE_QUEUE_SIZE)
+        if _pool is None:
+            # spawn y no fork, el proceso web puede tener hilos
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_iniciar_worker)
+        return _pool
+
+
+def _descartar_pool(roto):
+    """
+    Descarta un pool con un worker muerto (BrokenProcessPool), el
+    siguiente _get_pool crea uno nuevo con los mismos cupos. Las
+    tareas del pool roto terminan con error y sus callbacks liberan
+    los cupos que tomaron.
+    """
+    global _pool
+    with _lock:
+        if _pool is roto:
+            _pool = None
+    roto.shutdown(wait=False, cancel_futures=True)
+    logger.error("Pool de imagenes roto, se creará uno nuevo")
+
+
+def _preparar(imagen, tipo):
+    """
+    Valida el encabezado antes de ocupar un cupo del pool y retorna
+    lo que se envía al worker (ruta o contenido, ver conf.ingesta).
+    """
+    ingesta.validar_encabezado(imagen, tipo)
+    return ingesta.origen(imagen)
+
+
+def _registrar(tipo, segundos, error=False):
+    with _lock:
+        _metricas["en_curso"] -= 1
+        datos = _metricas["tipos"].setdefault(
+            tipo, {"procesadas": 0, "errores": 0,
+                   "segundos": 0.0, "max_segundos": 0.0})
+        datos["procesadas"] += 1
+        datos["errores"] += error
+        datos["segundos"] += segundos
+        datos["max_segundos"] = max(datos["max_segundos"], segundos)
+
+
+def _ejecutar(tipo, func, valor, *args):
+    """
+    Envía func(valor, *args) al pool y espera el resultado.
+    El cupo se libera cuando el proceso termina y no cuando el
+    request deja de esperar, así un timeout no deja pasar más
+    trabajo del que el pool puede atender.
+    """
+    pool = _get_pool()
+    if not _slots.acquire(blocking=False):
+        with _lock:
+            _metricas["rechazadas"] += 1
+        logger.warning("Pool de imagenes saturado, %s rechazada", tipo)
+        raise ImagenesSaturadas()
+
+    with _lock:
+        _metricas["en_curso"] += 1
+        _metricas["max_en_curso"] = max(
+            _metricas["max_en_curso"], _metricas["en_curso"])
+        en_cola = _metricas["en_curso"]
+
+    inicio = time.monotonic()
+    try:
+        future = pool.submit(
+            _con_limite, settings.IMAGE_TIMEOUT, func, valor, *args)
+    except Exception as e:
+        _slots.release()
+        _registrar(tipo, 0.0, error=True)
+        if isinstance(e, BrokenProcessPool):
+            _descartar_pool(pool)
+            raise ImagenesReiniciadas()
+        raise
+
+    def terminar(f):
+        _slots.release()
+        segundos = time.monotonic() - inicio
+        _registrar(tipo, segundos, error=f.exception() is not None)
+        logger.info(
+            "imagen %s procesada en %.3fs (en curso al enviar: %s)",
+            tipo, segundos, en_cola)
+
+    future.add_done_callback(terminar)
+
+    try:
+        return future.result(timeout=settings.IMAGE_TIMEOUT)
+    except FutureTimeout:
+        # si ya empezó no se cancela, la alarma del worker la corta
+        future.cancel()
+        logger.error("Timeout procesando imagen %s", tipo)
+        raise ImagenTimeout()
+    except BrokenProcessPool:
+        _descartar_pool(pool)
+        raise ImagenesReiniciadas()
+
+
+def _procesar(valor, nuevo_nombre, tipo):
+    with ingesta.abrir_origen(valor) as imagen:
+        return manejo_imagenes.procesar_imagen(
+            imagen, nuevo_nombre, tipo).getvalue()
+
+
+def _procesar_variantes(valor):
+    with ingesta.abrir_origen(valor) as imagen:
+        variantes = manejo_imagenes.procesar_variantes(imagen)
+    return {
+        variante: {ext: img_io.getvalue() for ext, img_io in formatos.items()}
+        for variante, formatos in variantes.items()
+    }
+
+
+def procesar_imagen(imagen, nuevo_nombre, tipo="articulo"):
+    """
+    Igual que conf.manejo_imagenes.procesar_imagen pero en el pool.
+    Retorna un BytesIO listo para subir.
+    """
+    valor = _preparar(imagen, tipo)
+    return BytesIO(_ejecutar(tipo, _procesar, valor, nuevo_nombre, tipo))
+
+
+def procesar_variantes(imagen):
+    """
+    Igual que conf.manejo_imagenes.procesar_variantes pero en el pool.
+    Retorna {"full": {"webp": BytesIO, "jpg": BytesIO}, ...}
+    """
+    valor = _preparar(imagen, "articulo")
+    variantes = _ejecutar("articulo", _procesar_variantes, valor)
+    return {
+        variante: {ext: BytesIO(raw) for ext, raw in formatos.items()}
+        for variante, formatos in variantes.items()
+    }
+
+
+def metricas():
+    """copia de las métricas del proceso actual"""
+    with _lock:
+        return {
+            **_metricas,
+            "tipos": {t: dict(d) for t, d in _metricas["tipos"].items()},
+        }
@@ -0,0 +1,116 @@
+"""
+Ingesta de las imagenes recibidas.
+Los archivos sobre FILE_UPLOAD_MAX_MEMORY_SIZE quedan en disco
+(TemporaryUploadedFile) y se pasan al pool por ruta, así el proceso
+web no carga el archivo completo en memoria. Antes de procesar se
+lee solo el encabezado para rechazar formato, dimensiones y pixeles
+según los límites del tipo (IMAGE_LIMITS).
+"""
+import os
+import warnings
+from io import BytesIO
+
+from django.conf import settings
+from PIL import Image, UnidentifiedImageError
+from rest_framework import serializers
+
+
+def limites(tipo):
+    """límites de IMAGE_LIMITS para el tipo de imagen"""
+    try:
+        return settings.IMAGE_LIMITS[tipo]
+    except KeyError:
+        raise serializers.ValidationError(
+            {"detail": "Tipo de imagen no soportado"})
+
+
+def tamano(imagen):
+    """bytes del archivo sin leerlo"""
+    size = getattr(imagen, "size", None)
+    if size is not None:
+        return size
+    actual = imagen.tell()
+    imagen.seek(0, os.SEEK_END)
+    size = imagen.tell()
+    imagen.seek(actual)
+    return size
+
+
+def validar_encabezado(imagen, tipo):
+    """
+    Revisa peso, formato, dimensiones y pixeles leyendo solo el
+    encabezado (Image.open no decodifica la imagen).
+    Retorna (formato, ancho, alto)
+    """
+    limite = limites(tipo)
+    if tamano(imagen) > limite["max_bytes"]:
+        raise serializers.ValidationError(
+            {"detail": "La imagen supera los "
+                       f"{limite['max_bytes'] // (1024 * 1024)}MB"})
+
+    imagen.seek(0)
+    try:
+        with warnings.catch_warnings():
+            # los límites de pixeles los revisamos nosotros
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            with Image.open(imagen) as img:
+                formato = img.format
+                ancho, alto = img.size
+    except UnidentifiedImageError:
+        raise serializers.ValidationError(
+            {"detail": "El archivo no es una imagen válida"})
+    except Image.DecompressionBombError:
+        raise serializers.ValidationError(
+            {"detail": "La imagen tiene demasiados pixeles"})
+    finally:
+        imagen.seek(0)
+
+    if formato not in limite["formats"]:
+        raise serializers.ValidationError(
+            {"detail": f"Formato {formato} no permitido"})
+    if max(ancho, alto) > limite["max_side"]:
+        raise serializers.ValidationError(
+            {"detail": f"La imagen supera los {limite['max_side']}px"})
+    if ancho * alto > limite["max_pixels"]:
+        raise serializers.ValidationError(
+            {"detail": "La imagen tiene demasiados pixeles"})
+    return formato, ancho, alto
+
+
+def origen(imagen):
+    """
+    Lo que se envía al pool: la ruta si el archivo está en disco y
+    si no su contenido (a lo mas FILE_UPLOAD_MAX_MEMORY_SIZE en
+    las subidas).
+    """
+    if hasattr(imagen, "temporary_file_path"):
+        return imagen.temporary_file_path()
+    imagen.seek(0)
+    return imagen.read()
+
+
+def abrir_origen(valor):
+    """abre en el worker lo retornado por origen()"""
+    if isinstance(valor, str):
+        return open(valor, "rb")
+    return BytesIO(valor)
+
+
+class ImagenField(serializers.FileField):
+    """
+    Archivo de imagen validado por encabezado según el tipo.
+    Reemplaza a ImageField, que carga el archivo en memoria para
+    verificarlo con Pillow.
+    """
+
+    def __init__(self, tipo, **kwargs):
+        self.tipo = tipo
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        archivo = super().to_internal_value(data)
+        try:
+            validar_encabezado(archivo, self.tipo)
+        except serializers.ValidationError as e:
+            raise serializers.ValidationError(e.detail["detail"])
+        return archivo
@@ -1,42 +1,92 @@
 from io import BytesIO
-from PIL import Image
-import io
+from PIL import Image, UnidentifiedImageError
+from rest_framework import serializers
+
+from conf.storage import get_image_storage
+
+# tamaño maximo y opciones del encoder según el tipo de imagen
+PERFILES = {
+    # logo pequeño, optimize reduce el peso y cuesta poco a 300px
+    "logo": {
+        "size": (300, 300),
+        "formato": "JPEG",
+        "opciones": {"quality": 85, "optimize": True},
+    },
+    # boleta solo se lee, se prioriza la velocidad
+    "boleta": {
+        "size": (1024, 1024),
+        "formato": "JPEG",
+        "opciones": {"quality": 80},
+    },
+    # articulo se muestra en la vitrina, progresivo carga antes
+    "articulo": {
+        "size": (800, 800),
+        "formato": "JPEG",
+        "opciones": {"quality": 82, "progressive": True},
+    },
+}
+
+# derivados de las fotos de productos, de mayor a menor.
+# thumb para la grilla, card para el listado y full para el detalle
+VARIANTES = {
+    "full": (800, 800),
+    "card": (400, 400),
+    "thumb": (160, 160),
+}
+# cada variante se guarda en WebP y en JPEG para los navegadores sin WebP
+FORMATOS_VARIANTE = {
+    "webp": ("WEBP", {"quality": 78, "method": 4}),
+    "jpg": ("JPEG", {"quality": 82, "progressive": True}),
+}
+
+
+def abrir_reducida(imagen, size):
+    """
+    Abre la imagen sin decodificarla completa.
+    En JPEG draft() decodifica directamente a 1/2, 1/4 o 1/8 de la
+    resolución, lo mas cercano sin bajar de size, así una foto de
+    48MP no se carga entera en memoria.
+    """
+    img = Image.open(imagen)
+    img.draft("RGB", size)
+
+    # Convertir a RGB si viene con canal alfa o paleta
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    return img
+
+
+def reducir(img, size):
+    """
+    Reduce la imagen manteniendo la proporción hasta caber en size.
+    reducing_gap reduce primero con reduce() (rápido) y termina con
+    LANCZOS, casi sin diferencia visible.
+    """
+    img.thumbnail(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+    return img
+
 
 def procesar_imagen(imagen, nuevo_nombre, tipo="articulo"):
     """
     Procesa una imagen según el tipo, redimensiona y cambia el formato.
     Retorna un objeto BytesIO listo para subir a Cloudinary.
-    
+
     Args:
         imagen: Archivo recibido (InMemoryUploadedFile, BytesIO, etc.)
         nuevo_nombre: str -> nombre base de la imagen (ej: "Order-1")
         tipo: str -> "boleta", "logo", "articulo"
     """
+    perfil = PERFILES.get(tipo)
+    if perfil is None:
+        raise serializers.ValidationError(
+            {"detail": "Tipo de imagen no soportado"})
 
     try:
-        # Asegurar que sea archivo en memoria (InMemoryUploadedFile, BytesIO, etc.)
-        img = Image.open(imagen)
-
-        # Convertir a RGB si viene con canal alfa
-        if img.mode in ("RGBA", "P"):
-            img = img.convert("RGB")
-
-        # Ajustes según tipo
-        if tipo == "logo":
-            img = img.resize((300, 300))
-            formato = "JPEG"
-        elif tipo == "boleta":
-            img = img.resize((1024, 1024))
-            formato = "JPEG"
-        elif tipo == "articulo":
-            img = img.resize((800, 800))
-            formato = "JPEG"
-        else:
-            raise serializers.ValidationError({"detail": "Tipo de imagen no soportado"})
+        img = reducir(abrir_reducida(imagen, perfil["size"]), perfil["size"])
 
         # Guardar en memoria
-        img_io = io.BytesIO()
-        img.save(img_io, formato, quality=85, optimize=True)
+        img_io = BytesIO()
+        img.save(img_io, perfil["formato"], **perfil["opciones"])
         img_io.seek(0)
 
         return img_io
@@ -45,3 +95,56 @@ def procesar_imagen(imagen, nuevo_nombre, tipo="articulo"):
         raise serializers.ValidationError({"detail": "El archivo no es una imagen válida"})
     except OSError:
         raise serializers.ValidationError({"detail": "Error procesando la imagen"})
+
+
+def procesar_variantes(imagen):
+    """
+    Genera todas las variantes de VARIANTES en cada formato de
+    FORMATOS_VARIANTE decodificando la imagen una sola vez.
+    Cada variante se reduce desde la anterior (mas grande) y no
+    desde la original.
+    Retorna {"full": {"webp": BytesIO, "jpg": BytesIO}, ...}
+    """
+    mayor = max(VARIANTES.values())
+    try:
+        img = abrir_reducida(imagen, mayor)
+        img.load()
+
+        variantes = {}
+        for nombre, size in VARIANTES.items():
+            img = reducir(img.copy(), size)
+            variantes[nombre] = {}
+            for ext, (formato, opciones) in FORMATOS_VARIANTE.items():
+                img_io = BytesIO()
+                img.save(img_io, formato, **opciones)
+                img_io.seek(0)
+                variantes[nombre][ext] = img_io
+
+        return variantes
+
+    except UnidentifiedImageError:
+        raise serializers.ValidationError({"detail": "El archivo no es una imagen válida"})
+    except OSError:
+        raise serializers.ValidationError({"detail": "Error procesando la imagen"})
+
+
+def subir_variantes(variantes, folder, nombre):
+    """
+    Sube las variantes generadas por procesar_variantes.
+    Los public_id quedan como <nombre>-<variante>-<ext>, ej:
+    product-1-card-webp (el public_id no lleva la extensión, sin ella
+    el webp y el jpg de una variante serían el mismo archivo).
+    Retorna las urls por variante y formato junto a los public_id:
+        {"full": {"webp": url, "jpg": url}, ...,
+         "public_ids": [...]}
+    """
+    storage = get_image_storage()
+    resultado = {"public_ids": []}
+    for variante, formatos in variantes.items():
+        resultado[variante] = {}
+        for ext, img_io in formatos.items():
+            subida = storage.upload(
+                img_io, folder, f"{nombre}-{variante}-{ext}", fmt=ext)
+            resultado[variante][ext] = subida["url"]
+            resultado["public_ids"].append(subida["public_id"])
+    return resultado
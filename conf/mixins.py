@@ -0,0 +1,90 @@
+"""
+Mixins compartidos por los modelos.
+"""
+import copy
+
+
+class DirtyFieldsMixin:
+    """
+    Guarda los valores de los campos al cargar la instancia desde la
+    base de datos y en save() sin update_fields escribe solo las
+    columnas que cambiaron. Si nada cambió no se ejecuta el UPDATE
+    (tampoco se mueven los auto_now).
+    Las instancias nuevas y los save() con update_fields se guardan
+    igual que antes.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = instance._current_values()
+        return instance
+
+    def _current_values(self, fields=None):
+        """
+        Valores de los campos cargados (los diferidos no están en
+        __dict__). Listas y dicts (ArrayField, JSONField) se copian
+        para detectar cambios hechos en el mismo objeto.
+        """
+        values = {}
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.attname not in self.__dict__:
+                continue
+            if fields is not None and field.name not in fields \
+                    and field.attname not in fields:
+                continue
+            value = self.__dict__[field.attname]
+            if isinstance(value, (list, dict)):
+                value = copy.deepcopy(value)
+            values[field.attname] = value
+        return values
+
+    def get_dirty_fields(self):
+        """
+        Nombres de los campos que cambiaron desde que se cargó la
+        instancia, None si no se cargó desde la base de datos.
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        current = self._current_values()
+        return [
+            field.name for field in self._meta.concrete_fields
+            if field.attname in current and (
+                field.attname not in loaded
+                or current[field.attname] != loaded[field.attname])
+        ]
+
+    def field_changed(self, name):
+        """True si el campo cambió o si no se sabe (instancia nueva)"""
+        dirty = self.get_dirty_fields()
+        return dirty is None or name in dirty
+
+    def save(self, *args, **kwargs):
+        if (not args and not self._state.adding
+                and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')):
+            dirty = self.get_dirty_fields()
+            if dirty is not None:
+                if not dirty:
+                    return
+                # auto_now solo se actualiza si algo cambió
+                dirty += [
+                    field.name for field in self._meta.concrete_fields
+                    if getattr(field, 'auto_now', False)
+                    and field.name not in dirty
+                ]
+                kwargs['update_fields'] = dirty
+
+        super().save(*args, **kwargs)
+        self._loaded_values = {
+            **getattr(self, '_loaded_values', {}),
+            **self._current_values(kwargs.get('update_fields')),
+        }
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._loaded_values = {
+            **getattr(self, '_loaded_values', {}),
+            **self._current_values(fields),
+        }
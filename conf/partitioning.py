@@ -0,0 +1,252 @@
+"""
+Particionado mensual opcional (solo Postgres) para las tablas que
+crecen sin limite: Order por issued_at y Log por created_at.
+
+Se activa con PARTITIONED_MODELS en settings y se administra con el
+comando manage_partitions (setup, create y archive). create debe
+correr al menos una vez al mes (cron), las filas de un mes sin
+partición caen en la partición DEFAULT para que los INSERT del
+checkout no fallen, y create las mueve a su mes al crearlo.
+
+IMPORTANTE: en Postgres la llave primaria de una tabla particionada
+debe incluir la columna de partición, por lo que la conversión deja
+la PK en (id, fecha) y ninguna llave foránea puede apuntar solo a id.
+setup no convierte una tabla con llaves foráneas entrantes (Order
+tiene OrderDetail, Payment, PayoutLine y EmailOutbox), termina con un
+error que las lista. Para particionarla igual hay que decidir a mano
+qué hacer con cada relación (llave compuesta con la fecha o dejar de
+validarla en la base de datos) con:
+
+    ALTER TABLE <tabla> DROP CONSTRAINT <llave>;
+
+y recién ahí correr setup. Log no tiene llaves entrantes.
+"""
+import datetime
+import gzip
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection
+from django.db.models import CASCADE, SET_NULL, Q
+from django.utils import timezone
+
+# columna de partición de cada modelo
+PARTITION_KEYS = {
+    "orders.Order": "issued_at",
+    "logs.Log": "created_at",
+}
+
+# filas cerradas, una partición con otras filas no se archiva
+SETTLED = {
+    "orders.Order": (
+        Q(shipping_status="delivered", payment_status__in=("paid", "refounded"))
+        | Q(shipping_status="canceled", payment_status="refounded")),
+}
+
+
+def partitioned_models():
+    """modelos activados en settings con su columna de partición"""
+    return [
+        (apps.get_model(label), PARTITION_KEYS[label])
+        for label in settings.PARTITIONED_MODELS
+    ]
+
+
+def month_start(day, offset=0):
+    """primer dia del mes de day desplazado offset meses"""
+    month = day.month - 1 + offset
+    return datetime.date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y%m}"
+
+
+def is_partitioned(cursor, table):
+    cursor.execute(
+        "SELECT 1 FROM pg_partitioned_table "
+        "WHERE partrelid = to_regclass(%s)", [table])
+    return cursor.fetchone() is not None
+
+
+def default_partition_name(table):
+    return f"{table}_default"
+
+
+def table_exists(cursor, name):
+    cursor.execute("SELECT to_regclass(%s)", [name])
+    return cursor.fetchone()[0] is not None
+
+
+def create_default_partition(cursor, table):
+    """partición DEFAULT para las filas de meses sin partición"""
+    qn = connection.ops.quote_name
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {qn(default_partition_name(table))} "
+        f"PARTITION OF {qn(table)} DEFAULT")
+
+
+def count_default_rows(cursor, table):
+    qn = connection.ops.quote_name
+    cursor.execute(
+        f"SELECT COUNT(*) FROM {qn(default_partition_name(table))}")
+    return cursor.fetchone()[0]
+
+
+def create_partition(cursor, table, column, month):
+    """
+    Crea la partición del mes si no existe.
+    Postgres no permite crearla si la partición DEFAULT tiene filas
+    del mes, así que se separa la DEFAULT, se mueven sus filas del
+    mes a la partición nueva y se vuelve a unir.
+    """
+    qn = connection.ops.quote_name
+    name = partition_name(table, month)
+    if table_exists(cursor, name):
+        return
+
+    default = default_partition_name(table)
+    has_default = table_exists(cursor, default)
+    bounds = [month, month_start(month, 1)]
+
+    if has_default:
+        cursor.execute(
+            f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(default)}")
+    cursor.execute(
+        f"CREATE TABLE {qn(name)} PARTITION OF {qn(table)} "
+        f"FOR VALUES FROM (%s) TO (%s)", bounds)
+    if has_default:
+        in_month = f"{qn(column)} >= %s AND {qn(column)} < %s"
+        cursor.execute(
+            f"INSERT INTO {qn(table)} "
+            f"SELECT * FROM {qn(default)} WHERE {in_month}", bounds)
+        cursor.execute(
+            f"DELETE FROM {qn(default)} WHERE {in_month}", bounds)
+        cursor.execute(
+            f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(default)} DEFAULT")
+
+
+def inbound_foreign_keys(cursor, table):
+    """[(tabla, constraint)] de las llaves foráneas que apuntan a la tabla"""
+    cursor.execute(
+        "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+        "WHERE contype = 'f' AND confrelid = to_regclass(%s) "
+        "ORDER BY 1, 2", [table])
+    return cursor.fetchall()
+
+
+def list_partitions(cursor, table):
+    """
+    Retorna [(nombre, mes)] de las particiones mensuales de la tabla
+    ordenadas de la más antigua a la más nueva (sin la DEFAULT)
+    """
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(%s) ORDER BY c.relname",
+        [table])
+    prefix = f"{table}_p"
+    partitions = []
+    for (name,) in cursor.fetchall():
+        if name.startswith(prefix):
+            month = datetime.datetime.strptime(
+                name[len(prefix):], "%Y%m").date()
+            partitions.append((name, month))
+    return partitions
+
+
+def convert_to_partitioned(cursor, table, column, months_ahead):
+    """
+    Convierte la tabla a particionada por mes copiando sus filas.
+    Debe ejecutarse dentro de una transacción y en una ventana de
+    mantenimiento, la tabla queda bloqueada durante la copia.
+    La tabla no puede tener llaves foráneas entrantes (ver
+    inbound_foreign_keys), si quedan el DROP de la tabla original falla.
+    """
+    qn = connection.ops.quote_name
+    legacy = f"{table}_legacy"
+
+    cursor.execute(f"LOCK TABLE {qn(table)} IN ACCESS EXCLUSIVE MODE")
+
+    # indices a recrear (sin la PK ni los unicos, que no incluyen
+    # la columna de partición)
+    cursor.execute(
+        "SELECT indexdef FROM pg_indexes "
+        "WHERE tablename = %s AND indexdef NOT LIKE 'CREATE UNIQUE%%'",
+        [table])
+    index_defs = [row[0] for row in cursor.fetchall()]
+
+    # llaves foráneas salientes, LIKE no las copia
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE contype = 'f' AND conrelid = to_regclass(%s)", [table])
+    foreign_keys = cursor.fetchall()
+
+    cursor.execute(f"SELECT MIN({qn(column)}) FROM {qn(table)}")
+    first = cursor.fetchone()[0]
+
+    cursor.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}")
+    cursor.execute(
+        f"CREATE TABLE {qn(table)} (LIKE {qn(legacy)} "
+        f"INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING GENERATED "
+        f"INCLUDING CONSTRAINTS) "
+        f"PARTITION BY RANGE ({qn(column)})")
+    cursor.execute(
+        f"ALTER TABLE {qn(table)} ADD PRIMARY KEY (id, {qn(column)})")
+
+    today = timezone.localdate()
+    month = month_start(first.date() if first else today)
+    last = month_start(today, months_ahead)
+    while month <= last:
+        create_partition(cursor, table, column, month)
+        month = month_start(month, 1)
+    create_default_partition(cursor, table)
+
+    cursor.execute(
+        f"INSERT INTO {qn(table)} SELECT * FROM {qn(legacy)}")
+    cursor.execute(
+        f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+        f"(SELECT COALESCE(MAX(id), 0) + 1 FROM {qn(table)}), false)",
+        [table])
+
+    # sin CASCADE, nunca se eliminan llaves foráneas de otras tablas
+    cursor.execute(f"DROP TABLE {qn(legacy)}")
+    for index_def in index_defs:
+        cursor.execute(index_def)
+    for name, definition in foreign_keys:
+        cursor.execute(
+            f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}")
+
+
+def dependent_relations(model):
+    """relaciones de los modelos con llave foránea al modelo"""
+    return [
+        relation for relation in model._meta.related_objects
+        if relation.one_to_many or relation.one_to_one
+    ]
+
+
+def archive_blockers(model, rows):
+    """
+    Motivos por los que las filas no se pueden archivar: filas sin
+    cerrar (ver SETTLED) o relaciones que no son CASCADE ni SET_NULL
+    (ej: Payment y PayoutLine son PROTECT) con filas que las apuntan.
+    """
+    blockers = []
+    settled = SETTLED.get(model._meta.label)
+    if settled is not None and rows.exclude(settled).exists():
+        blockers.append("filas sin cerrar")
+    for relation in dependent_relations(model):
+        if relation.on_delete in (CASCADE, SET_NULL):
+            continue
+        if relation.related_model.objects.filter(
+                **{f"{relation.field.name}__in": rows}).exists():
+            blockers.append(relation.related_model._meta.label)
+    return blockers
+
+
+def copy_to_gzip(cursor, query, path):
+    """guarda el resultado de la consulta como CSV comprimido"""
+    with gzip.open(path, "wb") as f:
+        cursor.copy_expert(
+            f"COPY ({query}) TO STDOUT WITH CSV HEADER", f)
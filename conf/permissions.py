@@ -1,5 +1,7 @@
 from rest_framework import permissions
 
+from conf.filters import is_admin
+
 class IsOwnerByGUIDOrAdminForUserApp(permissions.BasePermission):
     """
     Permite acceso si el usuario autenticado es dueño del recurso 
@@ -40,23 +42,30 @@ class IsOwnerByGUIDOrAdminForUserApp(permissions.BasePermission):
 class IsOwnerByGUIDOrAdminForRestApp(permissions.BasePermission):
     """
     Permite acceso si el usuario autenticado es dueño del recurso 
-    (por GUID), o si es staff/superuser.
-    se utiliza en cualquier app que no sea usuario
+    (por store_name_id), o si es staff/superuser.
+    se utiliza en cualquier app que no sea usuario, junto con
+    conf.filters.OwnerStoreFilterBackend para los listados
     """
 
+    def has_permission(self, request, view):
+        # 1. Si no está autenticado → DRF debe devolver 401 automáticamente
+        user = request.user
+        return bool(user and user.is_authenticated)
+
     def has_object_permission(self, request, view, obj):
         user = request.user
 
-        # 1. Si no está autenticado → DRF debe devolver 401 automáticamente
         if not user or not user.is_authenticated:
             return False
 
         # 2. Si el usuario es staff o superuser, siempre tiene permiso.
-        if user.is_staff or user.is_superuser:
+        if is_admin(user):
             return True
 
-        # 3. Verificar si es dueño del objeto.
-        is_owner = str(user.guid) == str(obj.store_name.guid)
+        # 3. Verificar si es dueño del objeto, se compara la llave
+        # foránea para no cargar al dueño desde la base de datos
+        owner_field = getattr(view, "owner_field", "store_name_id")
+        is_owner = getattr(obj, owner_field, None) == user.id
 
         # 4. Métodos de solo lectura → permitir si es dueño
         if request.method in permissions.SAFE_METHODS:
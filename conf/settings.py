@@ -1,7 +1,9 @@
 from pathlib import Path
 from datetime import timedelta
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 import os
+import sys
 load_dotenv()
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -17,6 +19,9 @@ SECRET_KEY = os.getenv('SECRET_KEY')
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = os.getenv('DEBUG', 'False') == 'True'
 
+# manage.py test, habilita los servicios fake (pagos, SMS)
+TESTING = sys.argv[1:2] == ['test']
+
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', '').split(',')
 
 
@@ -35,6 +40,7 @@ INSTALLED_APPS = [
     'orders',
     'payments',
     'logs',
+    'images',
     #third party
     'rest_framework',
     "cloudinary",
@@ -86,6 +92,15 @@ DATABASES = {
     }
 }
 
+# particionado mensual opcional (solo Postgres), ej: "orders.Order,logs.Log"
+# se administra con el comando manage_partitions
+PARTITIONED_MODELS = [
+    label for label in os.getenv('PARTITIONED_MODELS', '').split(',')
+    if label
+]
+PARTITION_ARCHIVE_DIR = os.getenv(
+    'PARTITION_ARCHIVE_DIR', BASE_DIR / 'archive')
+
 CACHES = {
     "default": {
         "BACKEND": "django_redis.cache.RedisCache",
@@ -133,6 +148,57 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+MEDIA_URL = os.getenv('MEDIA_URL', '/media/')
+MEDIA_ROOT = os.getenv('MEDIA_ROOT', BASE_DIR / 'media')
+
+# backend para las imagenes procesadas (ver conf/storage.py)
+IMAGE_STORAGE_BACKEND = os.getenv(
+    'IMAGE_STORAGE_BACKEND', 'conf.storage.CloudinaryImageStorage')
+# carpeta donde se dejan las subidas que se procesan en segundo plano
+UPLOAD_STAGING_DIR = os.getenv(
+    'UPLOAD_STAGING_DIR', BASE_DIR / 'staging')
+
+# calculan el hash de los archivos mientras se reciben
+FILE_UPLOAD_HANDLERS = [
+    "conf.uploads.HashingMemoryFileUploadHandler",
+    "conf.uploads.HashingTemporaryFileUploadHandler",
+]
+# sobre este tamaño los archivos recibidos se guardan en disco
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(
+    os.getenv('FILE_UPLOAD_MAX_MEMORY_SIZE', 1024 * 1024))
+
+# pool de procesos para las imagenes (ver conf/image_service.py)
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+# imagenes que pueden esperar turno además de las que se procesan,
+# sobre eso se responde 503
+IMAGE_QUEUE_SIZE = int(os.getenv('IMAGE_QUEUE_SIZE', 4))
+# imagenes de un mismo request que ocupan cupos a la vez, un producto
+# con 5 imagenes no debe dejar sin cupos a los demás requests
+IMAGE_UPLOADS_PER_REQUEST = int(os.getenv('IMAGE_UPLOADS_PER_REQUEST', 2))
+IMAGE_TIMEOUT = float(os.getenv('IMAGE_TIMEOUT', 15))
+# límites por tipo de imagen, se revisan leyendo solo el encabezado
+# antes de decodificar (ver conf/ingesta.py)
+IMAGE_LIMITS = {
+    "logo": {
+        "max_bytes": 5 * 1024 * 1024,
+        "max_side": 4096,
+        "max_pixels": 12_000_000,
+        "formats": ("JPEG", "PNG", "WEBP"),
+    },
+    "boleta": {
+        "max_bytes": 10 * 1024 * 1024,
+        "max_side": 10000,
+        "max_pixels": 50_000_000,
+        "formats": ("JPEG", "PNG", "WEBP"),
+    },
+    "articulo": {
+        "max_bytes": 15 * 1024 * 1024,
+        "max_side": 12000,
+        "max_pixels": 64_000_000,
+        "formats": ("JPEG", "PNG", "WEBP"),
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -140,7 +206,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_THROTTLE_CLASSES': [
         'rest_framework.throttling.AnonRateThrottle',
@@ -152,10 +218,38 @@ REST_FRAMEWORK = {
     }
 }
 
+# correos al comprador (ver orders/notifications.py)
+EMAIL_BACKEND = os.getenv(
+    'EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', 25))
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'False') == 'True'
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'webmaster@localhost')
+
 TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID')
 TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN')
 TWILIO_PHONE_NUMBER = os.getenv('TWILIO_PHONE_NUMBER')
 
+# proveedores de SMS (ver users/sms.py), "fake" no envía nada y solo
+# existe en desarrollo y tests, en producción SMS_DEFAULT_PROVIDER
+# es obligatorio
+SMS_PROVIDERS = {"twilio": "users.sms.TwilioProvider"}
+if DEBUG or TESTING:
+    SMS_PROVIDERS["fake"] = "users.sms.FakeProvider"
+SMS_DEFAULT_PROVIDER = os.getenv(
+    'SMS_DEFAULT_PROVIDER', 'fake' if DEBUG or TESTING else None)
+if SMS_DEFAULT_PROVIDER not in SMS_PROVIDERS:
+    raise ImproperlyConfigured(
+        f"SMS_DEFAULT_PROVIDER={SMS_DEFAULT_PROVIDER!r} no es un "
+        f"proveedor configurado ({', '.join(SMS_PROVIDERS)})")
+if SMS_DEFAULT_PROVIDER == "twilio" and not (
+        TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN and TWILIO_PHONE_NUMBER):
+    raise ImproperlyConfigured(
+        "SMS_DEFAULT_PROVIDER=twilio necesita TWILIO_ACCOUNT_SID, "
+        "TWILIO_AUTH_TOKEN y TWILIO_PHONE_NUMBER")
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(
         minutes=int(os.getenv('SIMPLE_JWT_ACCESS_TOKEN_LIFETIME', 60))),
@@ -168,6 +262,24 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
 }
 
+# segundos que el usuario autenticado queda en cache
+# (ver users/authentication.py)
+JWT_USER_CACHE_TTL = int(os.getenv('JWT_USER_CACHE_TTL', 60))
+
+# pasarelas de pago disponibles, "fake" aprueba todo y solo existe en
+# desarrollo y tests, en producción PAYMENT_DEFAULT_GATEWAY es obligatorio
+PAYMENT_GATEWAYS = {}
+if DEBUG or TESTING:
+    PAYMENT_GATEWAYS["fake"] = "payments.gateways.FakeGateway"
+PAYMENT_DEFAULT_GATEWAY = os.getenv(
+    'PAYMENT_DEFAULT_GATEWAY', 'fake' if DEBUG or TESTING else None)
+if PAYMENT_DEFAULT_GATEWAY not in PAYMENT_GATEWAYS:
+    raise ImproperlyConfigured(
+        f"PAYMENT_DEFAULT_GATEWAY={PAYMENT_DEFAULT_GATEWAY!r} no es una "
+        f"pasarela configurada ({', '.join(PAYMENT_GATEWAYS) or 'ninguna'})")
+# firma de los webhooks de la pasarela fake (ver payments/gateways.py)
+FAKE_GATEWAY_SECRET = os.getenv('FAKE_GATEWAY_SECRET', 'fake-secret')
+
 CLOUDINARY_STORAGE = {
     "CLOUD_NAME": os.getenv("CLOUDINARY_CLOUD_NAME"),
     "API_KEY": os.getenv("CLOUDINARY_API_KEY"),
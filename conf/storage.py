@@ -0,0 +1,80 @@
+"""
+Backends para guardar las imagenes procesadas.
+IMAGE_STORAGE_BACKEND en settings elige el backend, Cloudinary en
+producción y LocalImageStorage en desarrollo y tests.
+"""
+import uuid
+from functools import lru_cache
+from pathlib import Path
+
+import cloudinary.uploader
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class CloudinaryImageStorage:
+    """Sube las imagenes a Cloudinary"""
+
+    def upload(self, fileobj, folder, public_id, fmt=None):
+        """
+        Sube el archivo sobrescribiendo el public_id.
+        Retorna {"url": str, "public_id": str}
+        """
+        options = {"folder": folder, "public_id": public_id,
+                   "overwrite": True}
+        if fmt:
+            options["format"] = fmt
+        result = cloudinary.uploader.upload(fileobj, **options)
+        return {"url": result["secure_url"],
+                "public_id": result["public_id"]}
+
+    def delete(self, public_id):
+        cloudinary.uploader.destroy(public_id)
+
+
+class LocalImageStorage:
+    """
+    Guarda las imagenes en MEDIA_ROOT, reemplaza a Cloudinary
+    en desarrollo y en los tests
+    """
+
+    def upload(self, fileobj, folder, public_id, fmt=None):
+        public_id = f"{folder.strip('/')}/{public_id}"
+        relative = f"{public_id}.{fmt or 'jpg'}"
+        path = Path(settings.MEDIA_ROOT) / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(fileobj.read())
+        return {"url": f"{settings.MEDIA_URL}{relative}",
+                "public_id": public_id}
+
+    def delete(self, public_id):
+        for path in Path(settings.MEDIA_ROOT).glob(f"{public_id}.*"):
+            path.unlink(missing_ok=True)
+
+
+@lru_cache
+def get_image_storage():
+    """backend configurado en IMAGE_STORAGE_BACKEND"""
+    return import_string(settings.IMAGE_STORAGE_BACKEND)()
+
+
+def stage_upload(upload, folder, name):
+    """
+    Copia el archivo recibido a UPLOAD_STAGING_DIR por bloques
+    para procesarlo después fuera del request.
+    Retorna la ruta del archivo.
+    """
+    staging = Path(settings.UPLOAD_STAGING_DIR) / folder
+    staging.mkdir(parents=True, exist_ok=True)
+    path = staging / f"{name}-{uuid.uuid4().hex}"
+    with open(path, "wb") as f:
+        for chunk in upload.chunks():
+            f.write(chunk)
+    return str(path)
+
+
+def discard_staged(path):
+    """borra un archivo de staging si todavía existe"""
+    if path:
+        Path(path).unlink(missing_ok=True)
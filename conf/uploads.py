@@ -0,0 +1,41 @@
+"""
+Upload handlers que calculan el sha256 del archivo mientras llega
+el request, sin volver a leerlo después. El hash queda en
+file.content_hash (ver images.utils.content_hash).
+"""
+import hashlib
+
+from django.core.files.uploadhandler import (
+    MemoryFileUploadHandler, TemporaryFileUploadHandler)
+
+
+class HashingMixin:
+    """
+    Solo el handler que guarda el archivo calcula el hash, el que
+    deja pasar los bloques al siguiente no los cuenta.
+    """
+
+    def new_file(self, *args, **kwargs):
+        self.sha = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        result = super().receive_data_chunk(raw_data, start)
+        if result is None:
+            self.sha.update(raw_data)
+        return result
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.content_hash = self.sha.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingMixin, MemoryFileUploadHandler):
+    """archivos pequeños, en memoria"""
+
+
+class HashingTemporaryFileUploadHandler(
+        HashingMixin, TemporaryFileUploadHandler):
+    """archivos sobre FILE_UPLOAD_MAX_MEMORY_SIZE, en disco"""
@@ -8,5 +8,6 @@ urlpatterns = [
     path('api/products/', include('products.urls')),
     path('api/orders/', include('orders.urls')),
     path('api/logs/', include('logs.urls')),
-    #path('api/payments/', include('payments.urls')),
+    path('api/payments/', include('payments.urls')),
+    path('api/images/', include('images.urls')),
 ]
@@ -0,0 +1,11 @@
+from django.contrib import admin
+from .models import ImageAsset
+
+
+@admin.register(ImageAsset)
+class ImageAssetAdmin(admin.ModelAdmin):
+    list_display = (
+        "id", "profile", "content_hash", "ref_count", "created_at")
+    list_filter = ("profile",)
+    search_fields = ("content_hash", "url")
+    readonly_fields = ("content_hash", "public_ids", "variants")
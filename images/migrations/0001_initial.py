@@ -0,0 +1,31 @@
+# Generated by Django 6.1.2 on 2026-10-19 12:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageAsset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('profile', models.CharField(max_length=20)),
+                ('url', models.URLField(max_length=500)),
+                ('public_ids', models.JSONField(default=list)),
+                ('variants', models.JSONField(blank=True, default=dict)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['url'], name='image_asset_url_idx')],
+                'constraints': [models.UniqueConstraint(fields=('content_hash', 'profile'), name='unique_image_asset_hash_profile')],
+            },
+        ),
+    ]
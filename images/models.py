@@ -0,0 +1,39 @@
+from django.db import models
+
+
+class ImageAsset(models.Model):
+    """
+    Imagen procesada y subida, identificada por el hash de su
+    contenido y el perfil con que se procesó (logo, articulo...).
+    Si la misma imagen vuelve a subirse se reutiliza este registro
+    sin decodificarla ni subirla otra vez.
+    ref_count cuenta los usuarios y productos que la usan, cuando
+    llega a 0 se borra junto a sus archivos.
+    """
+    content_hash = models.CharField(max_length=64)
+    profile = models.CharField(max_length=20)
+    url = models.URLField(max_length=500)
+    # el primero es el de url, el resto los de las variantes
+    public_ids = models.JSONField(default=list)
+    # variantes por tamaño y formato, solo en las fotos de productos
+    variants = models.JSONField(blank=True, default=dict)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['content_hash', 'profile'],
+                name='unique_image_asset_hash_profile'),
+        ]
+        indexes = [
+            models.Index(fields=['url'], name='image_asset_url_idx'),
+        ]
+
+    @property
+    def public_id(self):
+        """public_id del archivo de url, siempre el primero"""
+        return self.public_ids[0] if self.public_ids else ""
+
+    def __str__(self):
+        return f"{self.profile} {self.content_hash[:12]} ({self.ref_count})"
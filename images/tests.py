@@ -0,0 +1,108 @@
+from io import BytesIO
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from images.models import ImageAsset
+from images.utils import acquire_asset, delete_unused, release_assets
+from users.models import CustomUser
+
+METRICS_URL = "/api/images/metrics/"
+
+
+class ImageMetricsViewTests(TestCase):
+    """las métricas del pool solo las ven los administradores"""
+
+    def create_user(self, email, phone, **fields):
+        return CustomUser.objects.create_user(
+            email, f"Tienda {phone}", phone,
+            password="clave-segura-123", **fields)
+
+    def test_admin_sees_metrics(self):
+        client = APIClient()
+        client.force_authenticate(self.create_user(
+            "admin@example.com", "+56911111111", is_staff=True))
+        response = client.get(METRICS_URL)
+        self.assertEqual(response.status_code, 200)
+        for key in ("pid", "en_curso", "max_en_curso", "rechazadas", "tipos"):
+            self.assertIn(key, response.data)
+
+    def test_store_owner_is_forbidden(self):
+        client = APIClient()
+        client.force_authenticate(
+            self.create_user("dueno@example.com", "+56922222222"))
+        self.assertEqual(client.get(METRICS_URL).status_code, 403)
+
+
+class ImageAssetRefCountTests(TestCase):
+    """las imagenes repetidas comparten asset y se borran sin referencias"""
+
+    def setUp(self):
+        self.stored = mock.Mock(side_effect=lambda upload, digest: {
+            "url": f"https://cdn.example.com/{digest}.jpg",
+            "public_ids": [f"assets/logo/{digest}"],
+            "variants": {},
+        })
+        profiles = mock.patch.dict("images.utils.PROFILES", logo=self.stored)
+        profiles.start()
+        self.addCleanup(profiles.stop)
+
+        self.storage = mock.Mock()
+        storage = mock.patch(
+            "images.utils.get_image_storage", return_value=self.storage)
+        storage.start()
+        self.addCleanup(storage.stop)
+
+    def test_same_content_is_uploaded_once(self):
+        first = acquire_asset(BytesIO(b"logo"), "logo")
+        second = acquire_asset(BytesIO(b"logo"), "logo")
+
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(second.ref_count, 2)
+        self.stored.assert_called_once()
+
+    def test_same_content_other_profile_is_another_asset(self):
+        stored_articulo = mock.Mock(return_value={
+            "url": "https://cdn.example.com/articulo.jpg",
+            "public_ids": ["assets/articulo/x-full-jpg"], "variants": {}})
+        with mock.patch.dict(
+                "images.utils.PROFILES", articulo=stored_articulo):
+            logo = acquire_asset(BytesIO(b"foto"), "logo")
+            articulo = acquire_asset(BytesIO(b"foto"), "articulo")
+        self.assertNotEqual(logo.id, articulo.id)
+        self.assertEqual(ImageAsset.objects.count(), 2)
+
+    def test_release_keeps_asset_while_referenced(self):
+        asset = acquire_asset(BytesIO(b"logo"), "logo")
+        acquire_asset(BytesIO(b"logo"), "logo")
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            release_assets([asset.url, None, "https://otra.example.com/x.jpg"])
+
+        self.assertEqual(callbacks, [])
+        asset.refresh_from_db()
+        self.assertEqual(asset.ref_count, 1)
+        self.storage.delete.assert_not_called()
+
+    def test_last_release_deletes_after_commit(self):
+        asset = acquire_asset(BytesIO(b"logo"), "logo")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            release_assets([asset.url])
+
+        self.assertFalse(ImageAsset.objects.filter(id=asset.id).exists())
+        self.storage.delete.assert_called_once_with(asset.public_id)
+
+    def test_delete_unused_skips_reacquired_asset(self):
+        asset = acquire_asset(BytesIO(b"logo"), "logo")
+        ImageAsset.objects.filter(id=asset.id).update(ref_count=0)
+        # otro request la vuelve a usar antes del borrado
+        acquire_asset(BytesIO(b"logo"), "logo")
+
+        delete_unused([asset.id])
+
+        asset.refresh_from_db()
+        self.assertEqual(asset.ref_count, 1)
+        self.storage.delete.assert_not_called()
+        self.stored.assert_called_once()
@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import ImageMetricsView
+
+urlpatterns = [
+    path("metrics/", ImageMetricsView.as_view(), name="image-metrics"),
+]
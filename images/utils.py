@@ -0,0 +1,164 @@
+"""
+Deduplicación de imagenes por hash de contenido.
+Una imagen repetida (mismo contenido y perfil) reutiliza el
+ImageAsset existente sin procesarla ni subirla de nuevo.
+"""
+import hashlib
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F
+
+from conf import image_service
+from conf.manejo_imagenes import subir_variantes
+from conf.storage import get_image_storage
+from .models import ImageAsset
+
+# carpeta de los assets, el public_id es el hash así que dos subidas
+# simultáneas de la misma imagen escriben el mismo archivo
+ASSETS_FOLDER = "assets"
+
+
+def content_hash(upload):
+    """
+    sha256 del archivo. Usa el calculado por HashingUploadHandler
+    mientras llegaba el request y si no lo calcula por bloques.
+    """
+    digest = getattr(upload, "content_hash", None)
+    if digest:
+        return digest
+
+    sha = hashlib.sha256()
+    if hasattr(upload, "chunks"):
+        for chunk in upload.chunks():
+            sha.update(chunk)
+    else:
+        upload.seek(0)
+        for chunk in iter(lambda: upload.read(64 * 1024), b""):
+            sha.update(chunk)
+    upload.seek(0)
+    return sha.hexdigest()
+
+
+def upload_logo(upload, digest):
+    img_io = image_service.procesar_imagen(upload, digest, "logo")
+    result = get_image_storage().upload(
+        img_io, f"{ASSETS_FOLDER}/logo", digest, fmt="jpg")
+    return {"url": result["url"], "public_ids": [result["public_id"]],
+            "variants": {}}
+
+
+def upload_articulo(upload, digest):
+    variants = subir_variantes(
+        image_service.procesar_variantes(upload),
+        f"{ASSETS_FOLDER}/articulo", digest)
+    public_ids = variants.pop("public_ids")
+    # el public_id de url (full jpg) va primero
+    public_ids.sort(key=lambda public_id: not public_id.endswith("-full-jpg"))
+    return {"url": variants["full"]["jpg"], "public_ids": public_ids,
+            "variants": variants}
+
+
+# perfil -> función que procesa y sube la imagen
+PROFILES = {
+    "logo": upload_logo,
+    "articulo": upload_articulo,
+}
+
+
+def acquire_asset(upload, profile):
+    """
+    Retorna el ImageAsset de la imagen sumando una referencia.
+    Solo si el hash no existe para el perfil se procesa y sube.
+    """
+    digest = content_hash(upload)
+    assets = ImageAsset.objects.filter(content_hash=digest, profile=profile)
+
+    # ya existe: solo se suma la referencia, también si quedó en 0 y
+    # delete_unused aún no la borra
+    if assets.update(ref_count=F('ref_count') + 1):
+        return assets.get()
+
+    stored = PROFILES[profile](upload, digest)
+    with transaction.atomic():
+        asset, created = ImageAsset.objects.get_or_create(
+            content_hash=digest, profile=profile,
+            defaults={**stored, "ref_count": 1})
+        if not created:
+            # otro request la subió mientras procesabamos
+            assets.update(ref_count=F('ref_count') + 1)
+            asset.refresh_from_db()
+    return asset
+
+
+def store_asset(upload, profile):
+    """
+    Procesa y sube la imagen solo si el hash no existe para el perfil
+    y retorna su ImageAsset sin sumar una referencia (un asset nuevo
+    queda con ref_count 0). Va fuera de la transacción, que no debe
+    esperar la subida; reference_asset suma la referencia dentro.
+    """
+    digest = content_hash(upload)
+    asset = ImageAsset.objects.filter(
+        content_hash=digest, profile=profile).first()
+    if asset is not None:
+        return asset
+
+    stored = PROFILES[profile](upload, digest)
+    asset, _ = ImageAsset.objects.get_or_create(
+        content_hash=digest, profile=profile,
+        defaults={**stored, "ref_count": 0})
+    return asset
+
+
+def reference_asset(asset, upload):
+    """
+    Suma la referencia a un asset de store_asset, en la transacción
+    del modelo que lo usa para que se confirme (o se deshaga) con él.
+    Si delete_unused lo borró entre medio se vuelve a subir.
+    """
+    if ImageAsset.objects.filter(pk=asset.pk).update(
+            ref_count=F('ref_count') + 1):
+        return asset
+    return acquire_asset(upload, asset.profile)
+
+
+def release_assets(urls):
+    """
+    Resta una referencia por cada url (las urls que no son de un
+    ImageAsset se ignoran). Los assets que quedan sin referencias
+    se borran con sus archivos después del commit.
+    """
+    counts = Counter(url for url in urls if url)
+    if not counts:
+        return
+
+    with transaction.atomic():
+        assets = list(
+            ImageAsset.objects.filter(url__in=counts).select_for_update())
+        for asset in assets:
+            asset.ref_count = max(asset.ref_count - counts[asset.url], 0)
+        ImageAsset.objects.bulk_update(assets, ['ref_count'])
+
+        unused = [asset.id for asset in assets if asset.ref_count == 0]
+        if unused:
+            transaction.on_commit(lambda: delete_unused(unused))
+
+
+def delete_unused(asset_ids):
+    """
+    Borra los assets que siguen sin referencias y sus archivos.
+    La fila se mantiene (con ref_count 0) hasta borrar los archivos:
+    un acquire_asset concurrente la reutiliza antes del bloqueo, o
+    espera a que se borre y recién ahí sube el archivo de nuevo, así
+    no se borra un archivo que otro request volvió a subir.
+    """
+    if not asset_ids:
+        return
+    storage = get_image_storage()
+    with transaction.atomic():
+        for asset in ImageAsset.objects.filter(
+                id__in=asset_ids, ref_count=0).select_for_update():
+            for public_id in asset.public_ids:
+                storage.delete(public_id)
+            asset.delete()
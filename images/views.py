@@ -0,0 +1,24 @@
+import os
+
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from conf import image_service
+
+
+class ImageMetricsView(APIView):
+    """
+    Métricas del pool de imagenes (conf/image_service.py) del proceso
+    que atiende el request: imagenes en curso, rechazadas y tiempos
+    por tipo. Con varios workers web cada uno tiene las suyas, pid
+    indica de cuál son.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(
+            {"pid": os.getpid(), **image_service.metricas()},
+            status=status.HTTP_200_OK)
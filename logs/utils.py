@@ -1,4 +1,9 @@
 # logs/utils.py
+import datetime
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
 from .models import Log
 
 def create_log(
@@ -15,3 +20,44 @@ def create_log(
         related_model=related_model,
         related_id=related_id,
     )
+
+
+def create_logs(
+        user, action,
+        message, related_model=None,
+        related_ids=()):
+    """
+    CREATE ONE REGISTER PER RELATED ID IN A SINGLE INSERT
+    """
+    user = user if user and user.is_authenticated else None
+    Log.objects.bulk_create([
+        Log(
+            user=user,
+            action=action,
+            message=message,
+            related_model=related_model,
+            related_id=str(related_id),
+        )
+        for related_id in related_ids
+    ])
+
+
+def parse_query_datetime(value):
+    """
+    CONVERTS A QUERY PARAM (DATE OR DATETIME) TO AN AWARE DATETIME,
+    RETURNS NONE IF IT IS EMPTY OR INVALID
+    """
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                return None
+            parsed = datetime.datetime.combine(day, datetime.time.min)
+    except ValueError:
+        return None
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
@@ -1,7 +1,7 @@
 from rest_framework import generics
 from logs.models import Log
 from logs.serializers import LogSerializer
-from django.utils.dateparse import parse_datetime
+from logs.utils import parse_query_datetime
 
 
 class LogListView(generics.ListAPIView):
@@ -24,9 +24,12 @@ class LogListView(generics.ListAPIView):
         if related_model:
             queryset = queryset.filter(related_model__iexact=related_model)
 
-        # Filtrar por fecha (created_at)
-        start_date = request.query_params.get("start_date")
-        end_date = request.query_params.get("end_date")
+        # Filtrar por fecha (created_at), con particiones mensuales
+        # solo se leen las particiones del rango
+        start_date = parse_query_datetime(
+            request.query_params.get("start_date"))
+        end_date = parse_query_datetime(
+            request.query_params.get("end_date"))
 
         if start_date:
             queryset = queryset.filter(created_at__gte=start_date)
@@ -1,6 +1,6 @@
 # orders/admin.py
 from django.contrib import admin
-from .models import Order, OrderDetail
+from .models import Order, OrderDetail, StoreDailySales, EmailOutbox
 
 
 class OrderDetailInline(admin.TabularInline):
@@ -34,3 +34,31 @@ class OrderDetailAdmin(admin.ModelAdmin):
         "subtotal",
     )
     search_fields = ("order__id",)
+
+
+@admin.register(StoreDailySales)
+class StoreDailySalesAdmin(admin.ModelAdmin):
+    list_display = (
+        "store_name",
+        "day",
+        "orders_count",
+        "units",
+        "gross_amount",
+        "refunds_count",
+        "cancellations_count",
+    )
+    list_filter = ("day",)
+    search_fields = ("store_name__store_name",)
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = (
+        "to_email",
+        "subject",
+        "created_at",
+        "sent_at",
+        "attempts",
+    )
+    list_filter = ("sent_at", "created_at")
+    search_fields = ("to_email", "order__id")
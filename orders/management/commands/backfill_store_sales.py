@@ -0,0 +1,107 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils.dateparse import parse_date
+
+from orders.models import Order, OrderDetail, StoreDailySales
+from orders.rollups import add_delta, record_sales_deltas
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    """
+    Reconstruye StoreDailySales a partir de Order y OrderDetail.
+    Borra el resumen del rango y lo vuelve a sumar recorriendo las
+    ordenes por bloques de ids, todo en una transacción para que el
+    dashboard nunca vea un resumen a medias.
+    Conviene ejecutarlo con poco tráfico de checkout.
+    """
+
+    help = "Reconstruye el resumen diario de ventas por tienda"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--store', help="Slug de la tienda")
+        parser.add_argument('--from', dest='date_from',
+                            help="Fecha inicial YYYY-MM-DD")
+        parser.add_argument('--to', dest='date_to',
+                            help="Fecha final YYYY-MM-DD")
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help="Ordenes agregadas por consulta")
+
+    def handle(self, *args, **options):
+        orders = Order.objects.all()
+        rollups = StoreDailySales.objects.all()
+
+        if options['store']:
+            store_id = CustomUser.objects.filter(
+                slug=options['store']).values_list('id', flat=True).first()
+            if store_id is None:
+                raise CommandError(f"Tienda {options['store']} no encontrada")
+            orders = orders.filter(store_name_id=store_id)
+            rollups = rollups.filter(store_name_id=store_id)
+
+        for option, lookup in (('date_from', 'gte'), ('date_to', 'lte')):
+            if options[option]:
+                day = parse_date(options[option])
+                if day is None:
+                    raise CommandError(f"Fecha inválida: {options[option]}")
+                orders = orders.filter(**{f'issued_at__date__{lookup}': day})
+                rollups = rollups.filter(**{f'day__{lookup}': day})
+
+        bounds = orders.aggregate(first=Min('id'), last=Max('id'))
+        chunk_size = options['chunk_size']
+        total = 0
+
+        with transaction.atomic():
+            deleted, _ = rollups.delete()
+            self.stdout.write(f"{deleted} filas de resumen eliminadas")
+
+            if bounds['first'] is not None:
+                for start in range(
+                        bounds['first'], bounds['last'] + 1, chunk_size):
+                    chunk = orders.filter(
+                        id__gte=start, id__lt=start + chunk_size)
+                    total += self.rebuild_chunk(chunk)
+                    self.stdout.write(f"{total} ordenes procesadas")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Resumen reconstruido con {total} ordenes"))
+
+    def rebuild_chunk(self, chunk):
+        """agrega un bloque de ordenes por tienda y dia"""
+        deltas = {}
+        processed = 0
+
+        refounded = Q(payment_status='refounded')
+        canceled = Q(shipping_status='canceled')
+        rows = chunk.order_by().annotate(
+            sales_day=TruncDate('issued_at')
+        ).values('store_name_id', 'sales_day').annotate(
+            orders_count=Count('id'),
+            gross_amount=Sum('total_amount'),
+            refunds_count=Count('id', filter=refounded),
+            refunded_amount=Sum('total_amount', filter=refounded),
+            cancellations_count=Count('id', filter=canceled),
+            canceled_amount=Sum('total_amount', filter=canceled),
+        )
+        for row in rows:
+            store_id = row.pop('store_name_id')
+            day = row.pop('sales_day')
+            processed += row['orders_count']
+            add_delta(deltas, store_id, day,
+                      **{k: v or 0 for k, v in row.items()})
+
+        units = OrderDetail.objects.filter(
+            order__in=chunk
+        ).order_by().annotate(
+            store_id=F('order__store_name_id'),
+            sales_day=TruncDate('order__issued_at'),
+        ).values('store_id', 'sales_day').annotate(units=Sum('quantity'))
+        for row in units:
+            add_delta(deltas, row['store_id'], row['sales_day'],
+                      units=row['units'])
+
+        record_sales_deltas(deltas)
+        return processed
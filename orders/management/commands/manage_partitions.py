@@ -0,0 +1,164 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import CASCADE
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from conf.partitioning import (
+    archive_blockers,
+    convert_to_partitioned,
+    copy_to_gzip,
+    count_default_rows,
+    create_default_partition,
+    create_partition,
+    dependent_relations,
+    inbound_foreign_keys,
+    is_partitioned,
+    list_partitions,
+    month_start,
+    partitioned_models,
+)
+
+
+class Command(BaseCommand):
+    """
+    Administra las particiones mensuales de los modelos definidos en
+    PARTITIONED_MODELS (ver conf/partitioning.py).
+
+        setup    convierte las tablas a particionadas (una sola vez),
+                 falla si otras tablas tienen llaves foráneas hacia
+                 ella (ver conf/partitioning.py)
+        create   crea las particiones de los proximos meses, debe
+                 correr al menos una vez al mes (cron)
+        archive  separa las particiones antiguas, las guarda como CSV
+                 comprimido en PARTITION_ARCHIVE_DIR y las elimina.
+                 Las filas CASCADE que apuntan a ellas (OrderDetail)
+                 se archivan con la partición y las SET_NULL
+                 (EmailOutbox) quedan sin orden. Una partición con
+                 filas sin cerrar o apuntada por filas PROTECT
+                 (Payment, PayoutLine) no se archiva, los registros
+                 de pagos nunca se borran.
+    """
+
+    help = "Crea, convierte y archiva particiones mensuales"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'action', choices=['setup', 'create', 'archive'])
+        parser.add_argument(
+            '--months-ahead', type=int, default=3,
+            help="Meses futuros con partición creada")
+        parser.add_argument(
+            '--keep-months', type=int, default=12,
+            help="Meses que se mantienen al archivar")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("El particionado solo funciona en Postgres")
+
+        models = partitioned_models()
+        if not models:
+            self.stdout.write("PARTITIONED_MODELS está vacío, nada que hacer")
+            return
+
+        for model, column in models:
+            table = model._meta.db_table
+            with transaction.atomic(), connection.cursor() as cursor:
+                partitioned = is_partitioned(cursor, table)
+
+                if options['action'] == 'setup':
+                    if partitioned:
+                        self.stdout.write(f"{table} ya está particionada")
+                        continue
+                    foreign_keys = inbound_foreign_keys(cursor, table)
+                    if foreign_keys:
+                        raise CommandError(
+                            f"{table} tiene llaves foráneas entrantes que "
+                            f"la partición no puede mantener: "
+                            + ", ".join(f"{t}.{c}" for t, c in foreign_keys)
+                            + ". Ver conf/partitioning.py para el paso "
+                            "manual.")
+                    convert_to_partitioned(
+                        cursor, table, column, options['months_ahead'])
+                    self.stdout.write(self.style.SUCCESS(
+                        f"{table} particionada por {column}"))
+                    continue
+
+                if not partitioned:
+                    raise CommandError(
+                        f"{table} no está particionada, ejecute setup")
+
+                if options['action'] == 'create':
+                    self.create_ahead(
+                        cursor, table, column, options['months_ahead'])
+                else:
+                    self.archive(
+                        cursor, model, options['keep_months'])
+
+    def create_ahead(self, cursor, table, column, months_ahead):
+        # tablas particionadas antes de existir la DEFAULT
+        create_default_partition(cursor, table)
+        today = timezone.localdate()
+        for offset in range(months_ahead + 1):
+            create_partition(
+                cursor, table, column, month_start(today, offset))
+        self.stdout.write(
+            f"{table}: particiones creadas hasta "
+            f"{month_start(today, months_ahead):%Y-%m}")
+
+        # filas de meses pasados o muy futuros que siguen en la DEFAULT
+        leftover = count_default_rows(cursor, table)
+        if leftover:
+            self.stdout.write(self.style.WARNING(
+                f"{table}: {leftover} filas en la partición DEFAULT"))
+
+    def archive(self, cursor, model, keep_months):
+        qn = connection.ops.quote_name
+        table = model._meta.db_table
+        cutoff = month_start(timezone.localdate(), -keep_months)
+
+        archive_dir = Path(settings.PARTITION_ARCHIVE_DIR)
+        archive_dir.mkdir(parents=True, exist_ok=True)
+
+        for name, month in list_partitions(cursor, table):
+            if month >= cutoff:
+                break
+
+            rows = model.objects.filter(
+                pk__in=RawSQL(f"SELECT id FROM {qn(name)}", []))
+            blockers = archive_blockers(model, rows)
+            if blockers:
+                self.stdout.write(self.style.WARNING(
+                    f"{name} no se archiva: {', '.join(blockers)}"))
+                continue
+
+            cursor.execute(
+                f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(name)}")
+            copy_to_gzip(
+                cursor, f"SELECT * FROM {qn(name)}",
+                archive_dir / f"{name}.csv.gz")
+
+            # las filas que apuntan a la partición siguen su on_delete
+            for relation in dependent_relations(model):
+                dependent = qn(relation.related_model._meta.db_table)
+                column = qn(relation.field.column)
+                in_partition = f"{column} IN (SELECT id FROM {qn(name)})"
+                if relation.on_delete is CASCADE:
+                    copy_to_gzip(
+                        cursor,
+                        f"SELECT * FROM {dependent} WHERE {in_partition}",
+                        archive_dir / (
+                            f"{name}_"
+                            f"{relation.related_model._meta.db_table}.csv.gz"))
+                    cursor.execute(
+                        f"DELETE FROM {dependent} WHERE {in_partition}")
+                else:
+                    cursor.execute(
+                        f"UPDATE {dependent} SET {column} = NULL "
+                        f"WHERE {in_partition}")
+
+            cursor.execute(f"DROP TABLE {qn(name)}")
+            self.stdout.write(f"{name} archivada en {archive_dir}")
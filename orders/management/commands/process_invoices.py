@@ -0,0 +1,166 @@
+import datetime
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import serializers
+
+from conf.manejo_imagenes import procesar_imagen
+from conf.storage import discard_staged, get_image_storage
+from orders.models import Order
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Worker que procesa las boletas de envío dejadas en staging por
+    UpdateOrderSerializer. Reserva las ordenes pendientes por lotes,
+    las procesa en un pool de hilos (PIL libera el GIL al
+    redimensionar y la subida es I/O) y guarda shipping_invoice_url.
+    Si falla se reintenta con espera exponencial hasta --max-attempts
+    veces, al fallar del todo se borra el archivo de staging. Una
+    boleta tomada por un worker que se cortó se retoma pasado --lease.
+    """
+
+    help = "Procesa y sube las boletas de envío pendientes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help="Hilos procesando boletas")
+        parser.add_argument(
+            '--batch-size', type=int, default=20,
+            help="Boletas reservadas por vuelta")
+        parser.add_argument(
+            '--max-attempts', type=int, default=3,
+            help="Intentos antes de marcar la boleta como fallida")
+        parser.add_argument(
+            '--lease', type=int, default=600,
+            help="Segundos antes de retomar una boleta en proceso")
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Procesa lo pendiente y termina")
+        parser.add_argument(
+            '--sleep', type=float, default=2,
+            help="Segundos de espera cuando la cola está vacía")
+
+    def handle(self, *args, **options):
+        self.max_attempts = options['max_attempts']
+        self.lease = datetime.timedelta(seconds=options['lease'])
+        self.storage = get_image_storage()
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                order_ids = self.claim(options['batch_size'])
+                if order_ids:
+                    done = sum(pool.map(self.process_invoice, order_ids))
+                    self.stdout.write(
+                        f"{done}/{len(order_ids)} boletas subidas")
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['sleep'])
+
+    @transaction.atomic
+    def claim(self, batch_size):
+        """reserva un lote de boletas pendientes"""
+        now = timezone.now()
+        # boletas que quedaron a medias porque su worker se cortó,
+        # las que siguen dentro del lease son de otro worker activo
+        Order.objects.filter(
+            Q(invoice_claimed_at__isnull=True) |
+            Q(invoice_claimed_at__lt=now - self.lease),
+            invoice_status='processing',
+        ).update(invoice_status='pending')
+
+        # una orden se procesa en un solo worker a la vez, si llega
+        # una boleta nueva mientras se sube la anterior espera a que
+        # se libere la orden (finish) o venza el lease
+        order_ids = list(
+            Order.objects.filter(invoice_status='pending').filter(
+                Q(invoice_claimed_at__isnull=True) |
+                Q(invoice_claimed_at__lt=now - self.lease),
+            ).filter(
+                Q(invoice_next_attempt_at__isnull=True) |
+                Q(invoice_next_attempt_at__lte=now),
+            ).order_by('id').select_for_update(
+                skip_locked=True).values_list('id', flat=True)[:batch_size])
+        Order.objects.filter(id__in=order_ids).update(
+            invoice_status='processing', invoice_claimed_at=now)
+        return order_ids
+
+    def process_invoice(self, order_id):
+        """procesa y sube una boleta, retorna True si se subió"""
+        try:
+            return self.upload_invoice(order_id)
+        finally:
+            # cada hilo del pool usa su propia conexión
+            connections.close_all()
+
+    def upload_invoice(self, order_id):
+        order = Order.objects.only(
+            'id', 'invoice_upload_path', 'invoice_attempts').get(id=order_id)
+        path = order.invoice_upload_path
+
+        try:
+            with open(path, 'rb') as f:
+                processed_img = procesar_imagen(
+                    f, f"Order-{order_id}", "boleta")
+            result = self.storage.upload(
+                processed_img,
+                folder="order-invoices/",
+                public_id=f"Order-{order_id}")
+        except Exception as e:
+            attempts = order.invoice_attempts + 1
+            # una imagen inválida no mejora al reintentar
+            retry = (attempts < self.max_attempts and
+                     not isinstance(e, serializers.ValidationError))
+            if retry:
+                self.finish(
+                    order_id, path,
+                    invoice_status='pending',
+                    invoice_attempts=attempts,
+                    invoice_next_attempt_at=timezone.now() +
+                    datetime.timedelta(
+                        seconds=min(60 * 2 ** attempts, 6 * 3600)))
+            else:
+                self.finish(
+                    order_id, path,
+                    invoice_status='failed',
+                    invoice_attempts=attempts,
+                    invoice_upload_path=None)
+                # la boleta no se va a subir, no queda en staging
+                discard_staged(path)
+            logger.warning(
+                "Boleta de la orden %s falló (intento %s): %r",
+                order_id, attempts, e)
+            return False
+
+        self.finish(
+            order_id, path,
+            shipping_invoice_url=result["url"],
+            invoice_status='done',
+            invoice_upload_path=None,
+            updated_at=timezone.now())
+        # UpdateOrderSerializer también puede haberla borrado
+        discard_staged(path)
+        return True
+
+    def finish(self, order_id, path, **fields):
+        """
+        Guarda el resultado solo si la boleta de la orden sigue siendo
+        path y libera la orden. Una boleta nueva dejada en staging
+        mientras se subía esta queda pendiente y su subida reemplaza
+        a esta imagen.
+        """
+        updated = Order.objects.filter(
+            id=order_id, invoice_upload_path=path).update(
+                invoice_claimed_at=None, **fields)
+        if not updated:
+            Order.objects.filter(id=order_id).update(
+                invoice_claimed_at=None)
@@ -0,0 +1,102 @@
+import datetime
+import logging
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from orders.models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Worker que envía los correos de EmailOutbox.
+    Toma lotes de correos pendientes (skip locked, se pueden correr
+    varios workers) y los envía por una sola conexión SMTP que se
+    reutiliza entre lotes. Un correo que falla se reintenta con
+    espera exponencial hasta --max-attempts veces.
+    """
+
+    help = "Envía los correos pendientes del outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help="Correos enviados por lote")
+        parser.add_argument(
+            '--max-attempts', type=int, default=8,
+            help="Intentos antes de abandonar un correo")
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Envía lo pendiente y termina")
+        parser.add_argument(
+            '--sleep', type=float, default=5,
+            help="Segundos de espera cuando la cola está vacía")
+
+    def handle(self, *args, **options):
+        self.max_attempts = options['max_attempts']
+        self.connection = get_connection()
+
+        try:
+            while True:
+                sent, total = self.send_batch(options['batch_size'])
+                if total:
+                    self.stdout.write(f"{sent}/{total} correos enviados")
+                elif options['once']:
+                    break
+                else:
+                    # no dejamos la conexión SMTP abierta sin uso
+                    self.connection.close()
+                    time.sleep(options['sleep'])
+        finally:
+            self.connection.close()
+
+    @transaction.atomic
+    def send_batch(self, batch_size):
+        now = timezone.now()
+        emails = list(
+            EmailOutbox.objects.filter(
+                sent_at__isnull=True,
+                attempts__lt=self.max_attempts,
+                next_attempt_at__lte=now,
+            ).order_by('next_attempt_at').select_for_update(
+                skip_locked=True)[:batch_size])
+        if not emails:
+            return 0, 0
+
+        sent = 0
+        for email in emails:
+            message = EmailMessage(
+                subject=email.subject,
+                body=email.body,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[email.to_email],
+                connection=self.connection,
+            )
+            try:
+                # open() no hace nada si la conexión ya está abierta
+                self.connection.open()
+                self.connection.send_messages([message])
+            except Exception as e:
+                email.attempts += 1
+                email.last_error = repr(e)
+                email.next_attempt_at = now + datetime.timedelta(
+                    seconds=min(60 * 2 ** email.attempts, 6 * 3600))
+                logger.warning(
+                    "No se pudo enviar el correo %s: %r", email.id, e)
+                # la siguiente vuelta abre una conexión nueva
+                self.connection.close()
+                continue
+
+            email.sent_at = timezone.now()
+            email.last_error = None
+            sent += 1
+
+        EmailOutbox.objects.bulk_update(
+            emails, ['sent_at', 'attempts', 'next_attempt_at', 'last_error'])
+        return sent, len(emails)
@@ -0,0 +1,49 @@
+# Generated by Django 6.1.2 on 2026-10-19 12:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('products', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('issued_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('payment_status', models.CharField(choices=[('paid', 'Paid'), ('failed', 'Failed'), ('refounded', 'Refounded')], default='pending', max_length=20)),
+                ('shipping_status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('delivered', 'Delivered'), ('canceled', 'Canceled')], default='pending', max_length=20)),
+                ('shipping_address', models.TextField()),
+                ('buyer_phone', models.CharField(max_length=20)),
+                ('buyer_email', models.EmailField(max_length=254)),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('tracking_number', models.CharField(blank=True, max_length=100, null=True)),
+                ('shipping_invoice_url', models.URLField(blank=True, max_length=500, null=True)),
+                ('store_name', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OrderDetail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('price_per_unit', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('product_name_snapshot', models.CharField(max_length=255)),
+                ('product_sku_snapshot', models.CharField(blank=True, max_length=100, null=True)),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='products.productinventory')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='orders.order')),
+            ],
+        ),
+    ]
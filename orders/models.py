@@ -1,7 +1,10 @@
 from django.db import models
+from django.db.models.functions import Lower
+from django.utils import timezone
+from conf.mixins import DirtyFieldsMixin
 from users.models import CustomUser
 
-class Order(models.Model):
+class Order(DirtyFieldsMixin, models.Model):
     """
     Orden para la factura del pedido
     La funcion formatted_id se usara para buscar la orden
@@ -20,6 +23,7 @@ class Order(models.Model):
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
 
     PAYMENT_STATUS = [
+        ('pending', 'Pending'),
         ('paid', 'Paid'),
         ('failed', 'Failed'),
         ('refounded', 'Refounded'),
@@ -51,6 +55,66 @@ class Order(models.Model):
     shipping_invoice_url = models.URLField(
         max_length=500, null=True, blank=True)
 
+    # la boleta se procesa y sube en segundo plano (process_invoices)
+    INVOICE_STATUS = [
+        ('none', 'None'),
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    invoice_status = models.CharField(
+        max_length=20, choices=INVOICE_STATUS, default='none')
+    invoice_upload_path = models.CharField(
+        max_length=500, blank=True, null=True)
+    invoice_attempts = models.PositiveSmallIntegerField(default=0)
+    # espera entre reintentos de una boleta que falló
+    invoice_next_attempt_at = models.DateTimeField(blank=True, null=True)
+    # cuando un worker tomó la boleta, pasado el lease otro la retoma
+    invoice_claimed_at = models.DateTimeField(blank=True, null=True)
+
+    # fecha en que la orden se incluyó en un pago a la tienda
+    settled_at = models.DateTimeField(blank=True, null=True)
+
+    # copia inmutable de la orden y sus articulos tomada en el checkout,
+    # se combina con MUTABLE_FIELDS al consultar la orden
+    snapshot = models.JSONField(default=dict, blank=True, editable=False)
+
+    # campos que pueden cambiar despues del checkout
+    MUTABLE_FIELDS = (
+        "payment_status",
+        "shipping_status",
+        "tracking_number",
+        "shipping_invoice_url",
+        "invoice_status",
+    )
+
+    class Meta:
+        indexes = [
+            # listado de ordenes de la tienda con y sin filtros de estado
+            models.Index(
+                fields=["store_name", "issued_at"],
+                name="order_store_issued_idx"),
+            models.Index(
+                fields=[
+                    "store_name", "payment_status",
+                    "shipping_status", "issued_at"],
+                name="order_store_status_idx"),
+            # busqueda por email sin distinguir mayúsculas
+            models.Index(
+                Lower("buyer_email"), name="order_buyer_email_lower_idx"),
+            # cola de boletas por procesar
+            models.Index(
+                fields=["id"],
+                condition=models.Q(invoice_status="pending"),
+                name="order_invoice_pending_idx"),
+            # boletas tomadas por un worker, para retomar las vencidas
+            models.Index(
+                fields=["invoice_claimed_at"],
+                condition=models.Q(invoice_status="processing"),
+                name="order_invoice_processing_idx"),
+        ]
+
     def __str__(self):
         return f"Order {self.id} - from {self.store_name}"
     
@@ -89,3 +153,75 @@ class OrderDetail(models.Model):
 
     def __str__(self):
         return f"{self.quantity}-{self.article} (Order {self.order.id})"
+
+
+class StoreDailySales(models.Model):
+    """
+    Resumen diario de ventas por tienda para el dashboard.
+    Se actualiza con deltas en el checkout, las cancelaciones y
+    los reembolsos, y se puede reconstruir con backfill_store_sales.
+    El dia corresponde a la fecha de emisión de la orden.
+    """
+    store_name = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name="daily_sales"
+    )
+    day = models.DateField()
+
+    orders_count = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    gross_amount = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0)
+    refunds_count = models.PositiveIntegerField(default=0)
+    refunded_amount = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0)
+    cancellations_count = models.PositiveIntegerField(default=0)
+    canceled_amount = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["store_name", "day"],
+                name="unique_store_daily_sales"),
+        ]
+
+    def __str__(self):
+        return f"{self.store_name} - {self.day}"
+
+
+class EmailOutbox(models.Model):
+    """
+    Correos al comprador pendientes de envío.
+    Se escriben en la misma transacción que el cambio de la orden
+    y el comando send_outbox_emails los envía por lotes.
+    """
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="emails"
+    )
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # cola de correos por enviar
+            models.Index(
+                fields=["next_attempt_at"],
+                condition=models.Q(sent_at__isnull=True),
+                name="outbox_pending_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to_email}"
@@ -0,0 +1,79 @@
+# orders/notifications.py
+"""
+Correos al comprador. No se envían en el request, se guardan en
+EmailOutbox con un solo INSERT y los envía send_outbox_emails.
+"""
+from .models import EmailOutbox
+
+# asunto y cuerpo de cada aviso
+EMAIL_TEMPLATES = {
+    "paid": (
+        "Recibimos tu pedido #{formatted_id}",
+        "Tu pago de ${total_amount} fue confirmado.\n"
+        "Puedes revisar el estado de tu pedido con el número "
+        "{formatted_id}.",
+    ),
+    "processing": (
+        "Tu pedido #{formatted_id} va en camino",
+        "La tienda despachó tu pedido.\n"
+        "Número de seguimiento: {tracking_number}",
+    ),
+    "delivered": (
+        "Tu pedido #{formatted_id} fue entregado",
+        "Tu pedido fue entregado. ¡Gracias por tu compra!",
+    ),
+    "canceled": (
+        "Tu pedido #{formatted_id} fue cancelado",
+        "La tienda canceló tu pedido, te avisaremos cuando se "
+        "reembolse el pago de ${total_amount}.",
+    ),
+    "refounded": (
+        "Reembolso de tu pedido #{formatted_id}",
+        "Reembolsamos ${total_amount} de tu pedido.",
+    ),
+}
+
+
+def build_order_email(kind, order_id, buyer_email, **context):
+    """arma el correo sin guardarlo"""
+    subject, body = EMAIL_TEMPLATES[kind]
+    context = {
+        "formatted_id": f"{order_id:05d}",
+        "total_amount": "",
+        "tracking_number": "-",
+        **{k: v for k, v in context.items() if v is not None},
+    }
+    return EmailOutbox(
+        order_id=order_id,
+        to_email=buyer_email,
+        subject=subject.format(**context),
+        body=body.format(**context),
+    )
+
+
+def enqueue_order_emails(kind, orders):
+    """
+    Guarda un correo por orden con un solo INSERT.
+    orders: iterable de dicts con id, buyer_email y opcionalmente
+    total_amount y tracking_number
+    """
+    EmailOutbox.objects.bulk_create([
+        build_order_email(
+            kind,
+            order["id"],
+            order["buyer_email"],
+            total_amount=order.get("total_amount"),
+            tracking_number=order.get("tracking_number"),
+        )
+        for order in orders
+    ])
+
+
+def enqueue_order_email(kind, order):
+    """igual que enqueue_order_emails para una instancia de Order"""
+    enqueue_order_emails(kind, [{
+        "id": order.id,
+        "buyer_email": order.buyer_email,
+        "total_amount": order.total_amount,
+        "tracking_number": order.tracking_number,
+    }])
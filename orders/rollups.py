@@ -0,0 +1,76 @@
+# orders/rollups.py
+"""
+Mantiene StoreDailySales con deltas en lugar de agregar
+Order/OrderDetail sobre todo el historial en cada consulta.
+"""
+from django.db import connection
+from django.utils import timezone
+
+from .models import StoreDailySales
+
+ROLLUP_FIELDS = (
+    "orders_count",
+    "units",
+    "gross_amount",
+    "refunds_count",
+    "refunded_amount",
+    "cancellations_count",
+    "canceled_amount",
+)
+
+
+def add_delta(deltas, store_id, issued_at, **values):
+    """
+    Acumula valores en deltas {(store_id, dia): {campo: valor}}.
+    issued_at puede ser un datetime o una fecha.
+    """
+    day = (timezone.localdate(issued_at)
+           if hasattr(issued_at, "hour") else issued_at)
+    row = deltas.setdefault((store_id, day), {})
+    for field, value in values.items():
+        row[field] = row.get(field, 0) + value
+    return deltas
+
+
+def record_sales_deltas(deltas):
+    """
+    Suma los deltas a StoreDailySales con un solo
+    INSERT ... ON CONFLICT (store_name_id, day) DO UPDATE
+    """
+    if not deltas:
+        return
+
+    qn = connection.ops.quote_name
+    table = qn(StoreDailySales._meta.db_table)
+    columns = ["store_name_id", "day", *ROLLUP_FIELDS]
+
+    placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    params = []
+    for (store_id, day), values in deltas.items():
+        params += [store_id, day,
+                   *(values.get(field, 0) for field in ROLLUP_FIELDS)]
+
+    updates = ", ".join(
+        f"{qn(field)} = {table}.{qn(field)} + EXCLUDED.{qn(field)}"
+        for field in ROLLUP_FIELDS)
+
+    sql = (
+        f"INSERT INTO {table} ({', '.join(qn(c) for c in columns)}) "
+        f"VALUES {', '.join([placeholders] * len(deltas))} "
+        f"ON CONFLICT ({qn('store_name_id')}, {qn('day')}) "
+        f"DO UPDATE SET {updates}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def record_order_totals(orders, count_field, amount_field):
+    """
+    Suma 1 a count_field y el total de la orden a amount_field.
+    orders: iterable de (store_id, issued_at, total_amount)
+    """
+    deltas = {}
+    for store_id, issued_at, total_amount in orders:
+        add_delta(deltas, store_id, issued_at,
+                  **{count_field: 1, amount_field: total_amount})
+    record_sales_deltas(deltas)
@@ -1,15 +1,28 @@
+import uuid
+
 from django.db import transaction
 from rest_framework import serializers
-from .models import Order, OrderDetail
+from .models import Order, OrderDetail, StoreDailySales
+from .state_machine import (
+    TRANSITIONS,
+    apply_transition,
+    can_transition,
+    is_allowed,
+    manual_actions,
+    record_sales,
+    restock_orders,
+)
+from .notifications import enqueue_order_email
+from .rollups import ROLLUP_FIELDS, add_delta, record_sales_deltas
 from products.models import ProductInventory
-from conf.manejo_imagenes import procesar_imagen
-import cloudinary.uploader
+from conf.ingesta import ImagenField
+from conf.storage import discard_staged, stage_upload
+from payments.gateways import get_gateway
+from logs.utils import create_logs
+from payments.models import Payment
+from payments.utils import charge_payments
 
 #TODO: añadir logs en las orders
-#TODO: añadir logica para enviar emails al realizar pagos 
-# y actualizaciones
-#TODO: crear un payment en el checkout cuando se valida
-#la venta
 class OrderDetailSerializer(serializers.ModelSerializer):
     """
     Despliega la información de los productos comprados
@@ -56,6 +69,7 @@ class OrderSerializer(serializers.ModelSerializer):
             "shipping_status",
             "tracking_number",
             "shipping_invoice_url",
+            "invoice_status",
             "issued_at",
             "items"
         ]
@@ -92,6 +106,59 @@ class OrderSerializer(serializers.ModelSerializer):
         return order
 
 
+class OrderSnapshotSerializer(serializers.ModelSerializer):
+    """
+    Parte inmutable de la orden que se guarda en Order.snapshot
+    al hacer el checkout. Recibe los articulos ya cargados en el
+    contexto para no volver a consultarlos.
+    """
+
+    items = serializers.SerializerMethodField()
+    total_amount = serializers.DecimalField(
+        max_digits=10, 
+        decimal_places=2, 
+        read_only=True)
+    store_name = serializers.CharField(
+        source='store_name.store_name', 
+        read_only=True)
+
+    class Meta:
+        model = Order
+        fields = [
+            "id",
+            "formatted_id",
+            "store_name",
+            "buyer_email",
+            "buyer_phone",
+            "shipping_address",
+            "total_amount",
+            "issued_at",
+            "items"
+        ]
+        read_only_fields = fields
+
+    def get_items(self, obj):
+        return OrderDetailSerializer(
+            self.context["items"], many=True).data
+
+
+def build_order_snapshot(order, items):
+    """arma el snapshot de la orden como un dict serializable a JSON"""
+    return dict(OrderSnapshotSerializer(
+        order, context={"items": items}).data)
+
+
+def order_public_data(snapshot, order_status):
+    """
+    Combina el snapshot con los campos mutables de la orden,
+    el resultado tiene la misma forma que OrderSerializer
+    """
+    return {
+        **snapshot,
+        **{field: order_status[field] for field in Order.MUTABLE_FIELDS},
+    }
+
+
 class OrderSerializerList(serializers.ModelSerializer):
     """
     Despliega la oden del cliente en una lista corta
@@ -127,36 +194,53 @@ class UpdateOrderSerializer(serializers.ModelSerializer):
     del envio del producto. cuando el producto esté en manos
     del cliente se dara como completado
     """
-    # Cambiamos a ImageField para recibir archivos
-    shipping_invoice_url = serializers.ImageField(required=True)
+    # archivo validado por encabezado, no se carga entero en memoria
+    shipping_invoice_url = ImagenField("boleta", required=True)
     
     class Meta:
         model = Order
         fields = ["tracking_number", "shipping_invoice_url"]
 
     def update(self, instance, validated_data):
-        # Procesar imagen tipo "boleta"
-        if validated_data.get("shipping_invoice_url"):
-            processed_img = procesar_imagen(
-                validated_data.get("shipping_invoice_url"), 
-                f"Order-{instance.id}", 
-                "boleta")
+        # no se despachan ordenes canceladas, reembolsadas o entregadas
+        if not can_transition(instance, "ship"):
+            raise serializers.ValidationError(
+                {
+                    "detail": "Order cannot be shipped",
+                    "code": "canceled_refounded_or_delivered",
+                }
+            )
 
-            # Subir a Cloudinary
-            result = cloudinary.uploader.upload(
-                processed_img, 
-                folder="order-invoices/",
-                public_id=f"Order-{instance.id}",
-                overwrite=True)
-            
-            instance.shipping_invoice_url = result["secure_url"]
+        # la imagen tipo "boleta" se deja en staging y el comando
+        # process_invoices la procesa y sube a Cloudinary
+        previous_path = instance.invoice_upload_path
+        if validated_data.get("shipping_invoice_url"):
+            instance.invoice_upload_path = stage_upload(
+                validated_data.get("shipping_invoice_url"),
+                "order-invoices",
+                f"Order-{instance.id}")
+            instance.invoice_status = "pending"
+            instance.invoice_attempts = 0
+            instance.invoice_next_attempt_at = None
 
 
         instance.tracking_number = validated_data.get(
             "tracking_number", 
             instance.tracking_number)
-        instance.shipping_status = "processing"
-        instance.save()
+        apply_transition(instance, "ship")
+        staged_path = instance.invoice_upload_path
+        try:
+            with transaction.atomic():
+                instance.save()
+                enqueue_order_email(TRANSITIONS["ship"]["email"], instance)
+                # la boleta anterior que no se alcanzó a procesar
+                if previous_path and previous_path != staged_path:
+                    transaction.on_commit(
+                        lambda: discard_staged(previous_path))
+        except Exception:
+            if staged_path != previous_path:
+                discard_staged(staged_path)
+            raise
         return instance
 
 
@@ -171,29 +255,40 @@ class CancelOrderSerializer(serializers.ModelSerializer):
         fields = []
 
     def update(self, instance, validated_data):
-        if instance.shipping_status != "processing":
-            raise serializers.ValidationError(
-                {
-                    "detail": "Order cannot be canceled", 
-                    "code": "already_canceled_or_shipping"
-                }
-            )
+        request = self.context.get("request")
+        with transaction.atomic():
+            # se valida sobre la fila bloqueada, un cancel masivo o
+            # repetido espera y ve la orden ya cancelada (sin reponer
+            # el stock dos veces)
+            order = Order.objects.select_for_update().get(pk=instance.pk)
+            if not can_transition(order, "cancel"):
+                raise serializers.ValidationError(
+                    {
+                        "detail": "Order cannot be canceled",
+                        "code": "already_canceled_or_shipping"
+                    }
+                )
 
-        # Revertir stock de los OrderDetail
-        for item in instance.items.all():
-            try:
-                inventory = ProductInventory.objects.get(
-                    id=item.product_sku_snapshot)
-                inventory.stock += item.quantity
-                inventory.save()
-            except ProductInventory.DoesNotExist:
-                pass
-
-        # Cambiar estados
-        instance.shipping_status = "canceled"
-        instance.payment_status = "failed"
-        instance.save()
-        return instance
+            # Revertir stock de los OrderDetail
+            restock_orders([order.id])
+
+            # Cambiar estados
+            apply_transition(order, "cancel")
+            order.save()
+            record_sales("cancel", [(
+                order.store_name_id,
+                order.issued_at,
+                order.total_amount)])
+            enqueue_order_email("canceled", order)
+
+            create_logs(
+                user=request.user if request else None,
+                action="UPDATE",
+                message="Order cancel",
+                related_model="Order",
+                related_ids=[order.id],
+            )
+        return order
 
 
 class CompleteOrRefoundOrderSerializer(serializers.Serializer):
@@ -213,19 +308,10 @@ class CompleteOrRefoundOrderSerializer(serializers.Serializer):
 
     def update(self, instance, validated_data):
         option = validated_data["option"]
+        action = "deliver" if option == 1 else "refound"
 
-        print(instance.shipping_status)
-        print(instance.payment_status)
         # Validación de estados previos
-        if instance.shipping_status == "processing" and \
-            option == 1:
-            instance.shipping_status = "delivered"
-
-        elif instance.payment_status == "failed" and \
-            option == 2:
-            instance.payment_status = "refounded"
-
-        else: 
+        if not can_transition(instance, action):
             raise serializers.ValidationError(
                 {
                     "detail": "Order status cannot be changed",
@@ -233,10 +319,66 @@ class CompleteOrRefoundOrderSerializer(serializers.Serializer):
                 }
             )
 
-        instance.save()
+        with transaction.atomic():
+            apply_transition(instance, action)
+            instance.save()
+            record_sales(action, [(
+                instance.store_name_id,
+                instance.issued_at,
+                instance.total_amount)])
+            enqueue_order_email(TRANSITIONS[action]["email"], instance)
         return instance
 
 
+class BulkOrderTransitionSerializer(serializers.Serializer):
+    """
+    Recibe una lista de ordenes y la acción a aplicar a todas.
+    deliver y refound son solo para administradores,
+    ship y cancel los puede usar el dueño sobre sus ordenes.
+    """
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=1000)
+    action = serializers.ChoiceField(choices=manual_actions())
+
+    def validate_action(self, value):
+        if not is_allowed(self.context["request"].user, value):
+            raise serializers.ValidationError(
+                "Only admins can apply this action.")
+        return value
+
+
+class StoreDailySalesSerializer(serializers.ModelSerializer):
+    """Resumen de ventas de un dia de la tienda"""
+
+    class Meta:
+        model = StoreDailySales
+        fields = [
+            "day",
+            "orders_count",
+            "units",
+            "gross_amount",
+            "refunds_count",
+            "refunded_amount",
+            "cancellations_count",
+            "canceled_amount",
+        ]
+        read_only_fields = fields
+
+
+class StoreSalesTotalsSerializer(serializers.ModelSerializer):
+    """
+    Totales de un rango de dias, recibe un dict con la suma de cada
+    campo y los montos salen con el mismo formato que en los dias
+    """
+
+    class Meta:
+        model = StoreDailySales
+        fields = list(ROLLUP_FIELDS)
+        read_only_fields = fields
+
+
 class CartItemSerializer(serializers.Serializer):
     """
     Maneja los articulos del carro del cliente
@@ -265,7 +407,7 @@ class CheckoutSerializer(serializers.Serializer):
         with transaction.atomic():
             for item in cart_items:
                 article = ProductInventory.objects.select_related(
-                    "product").get(id=item["article"])
+                    "product", "size").get(id=item["article"])
                 store_user = article.product.store_name
 
                 # Validamos stock
@@ -284,6 +426,9 @@ class CheckoutSerializer(serializers.Serializer):
                     {"article": article, "quantity": item["quantity"]})
 
             orders_created = []
+            payments = []
+            sales = {}
+            gateway = get_gateway()
 
             for store_user, items in grouped_cart.items():
                 # calculamos el total de la orden
@@ -295,7 +440,7 @@ class CheckoutSerializer(serializers.Serializer):
                 order = Order.objects.create(
                     store_name=store_user,
                     total_amount=total_amount,
-                    payment_status="paid",
+                    payment_status="pending",
                     shipping_status="pending",
                     shipping_address=validated_data["address"],
                     buyer_phone=validated_data["phone"],
@@ -304,18 +449,49 @@ class CheckoutSerializer(serializers.Serializer):
                 )
 
                 # creamos los detalles
-                for i in items:
-                    OrderDetail.objects.create(
+                details = OrderDetail.objects.bulk_create([
+                    OrderDetail(
                         order=order,
                         article=i["article"],
                         quantity=i["quantity"],
                         price_per_unit=i["article"].product.price,
                         subtotal=i[
                             "article"].product.price * i["quantity"],
-                        product_name_snapshot=i["article"],
+                        product_name_snapshot=str(i["article"]),
                         product_sku_snapshot=i["article"].id
                     )
+                    for i in items
+                ])
+
+                # el pago queda pendiente, se cobra después del commit
+                payments.append(Payment(
+                    order=order,
+                    gateway=gateway.name,
+                    reference=uuid.uuid4().hex,
+                    amount=total_amount))
+
+                # guardamos la parte inmutable de la orden
+                order.snapshot = build_order_snapshot(order, details)
+                order.save(update_fields=["snapshot"])
 
                 orders_created.append(order)
+                add_delta(
+                    sales, store_user.id, order.issued_at,
+                    orders_count=1,
+                    units=sum(i["quantity"] for i in items),
+                    gross_amount=total_amount)
+
+            Payment.objects.bulk_create(payments)
+
+            # resumen diario de ventas de cada tienda
+            record_sales_deltas(sales)
+
+            # el cobro no va en la transacción: si algo se deshace no
+            # queda un cobro sin orden. La respuesta de la pasarela (o
+            # su webhook) marca el pago y avisa al comprador
+            transaction.on_commit(
+                lambda: charge_payments(gateway, payments))
 
+        for order in orders_created:
+            order.refresh_from_db(fields=["payment_status"])
         return orders_created
@@ -0,0 +1,228 @@
+# orders/state_machine.py
+"""
+Transiciones legales de payment_status y shipping_status de una orden.
+
+Cada acción indica los estados de origen permitidos (source),
+los valores que se escriben (target) y si solo un administrador
+puede ejecutarla. Las vistas de una orden y las masivas usan
+estas mismas reglas. Las acciones con "gateway" las aplica solo
+el comando process_webhooks con los eventos de la pasarela.
+"""
+from django.db import transaction
+from django.db.models import Case, F, Sum, Value, When
+from django.utils import timezone
+
+from logs.utils import create_logs
+from products.models import ProductInventory
+from .models import Order, OrderDetail
+from .notifications import enqueue_order_emails
+from .rollups import record_order_totals
+
+TRANSITIONS = {
+    # la tienda despacha el pedido (o actualiza el seguimiento)
+    "ship": {
+        "source": {
+            "shipping_status": ("pending", "processing"),
+            "payment_status": ("pending", "paid"),
+        },
+        "target": {"shipping_status": "processing"},
+        "admin_only": False,
+        "email": "processing",
+    },
+    # el pedido llegó al cliente
+    "deliver": {
+        "source": {"shipping_status": ("processing",)},
+        "target": {"shipping_status": "delivered"},
+        "admin_only": True,
+        "email": "delivered",
+    },
+    # se devuelve el dinero de un pedido cancelado
+    "refound": {
+        "source": {"payment_status": ("failed",)},
+        "target": {"payment_status": "refounded"},
+        "admin_only": True,
+        "rollup": ("refunds_count", "refunded_amount"),
+        "email": "refounded",
+    },
+    # la tienda cancela el pedido y se repone el stock
+    "cancel": {
+        "source": {"shipping_status": ("processing",)},
+        "target": {"shipping_status": "canceled", "payment_status": "failed"},
+        "admin_only": False,
+        "restock": True,
+        "rollup": ("cancellations_count", "canceled_amount"),
+        "email": "canceled",
+    },
+    # la pasarela confirma el cobro, no revive ordenes canceladas
+    "pay": {
+        "source": {
+            "payment_status": ("pending", "failed"),
+            "shipping_status": ("pending", "processing"),
+        },
+        "target": {"payment_status": "paid"},
+        "admin_only": True,
+        "gateway": True,
+        "email": "paid",
+    },
+    # la pasarela rechaza el cobro
+    "fail": {
+        "source": {"payment_status": ("pending",)},
+        "target": {"payment_status": "failed"},
+        "admin_only": True,
+        "gateway": True,
+    },
+    # la pasarela devuelve el dinero
+    "gateway_refound": {
+        "source": {"payment_status": ("paid", "failed")},
+        "target": {"payment_status": "refounded"},
+        "admin_only": True,
+        "gateway": True,
+        "rollup": ("refunds_count", "refunded_amount"),
+        "email": "refounded",
+    },
+}
+
+# acción según el estado informado por la pasarela
+GATEWAY_ACTIONS = {
+    "paid": "pay",
+    "failed": "fail",
+    "refounded": "gateway_refound",
+}
+
+# resultado por orden en las transiciones masivas
+UPDATED = "updated"
+NOT_FOUND = "not_found"
+INVALID_TRANSITION = "invalid_transition"
+
+
+def manual_actions():
+    """acciones que se pueden pedir desde la API"""
+    return [
+        action for action, transition in TRANSITIONS.items()
+        if not transition.get("gateway")]
+
+
+def is_allowed(user, action):
+    """indica si el usuario puede ejecutar la acción"""
+    if user.is_staff or user.is_superuser:
+        return True
+    return not TRANSITIONS[action]["admin_only"]
+
+
+def can_transition(order, action):
+    """valida el estado actual de una orden contra la acción"""
+    source = TRANSITIONS[action]["source"]
+    return all(
+        getattr(order, field) in allowed
+        for field, allowed in source.items())
+
+
+def apply_transition(order, action):
+    """cambia los estados de la instancia, no la guarda"""
+    for field, value in TRANSITIONS[action]["target"].items():
+        setattr(order, field, value)
+
+
+def record_sales(action, orders):
+    """
+    Actualiza StoreDailySales según la acción.
+    orders: iterable de (store_id, issued_at, total_amount)
+    """
+    rollup = TRANSITIONS[action].get("rollup")
+    if rollup:
+        record_order_totals(orders, *rollup)
+
+
+def notify_buyers(action, orders):
+    """
+    Deja en el outbox el correo de la acción para cada orden.
+    orders: iterable de dicts con id, buyer_email, total_amount
+    y tracking_number
+    """
+    kind = TRANSITIONS[action].get("email")
+    if kind:
+        enqueue_order_emails(kind, orders)
+
+
+def restock_orders(order_ids):
+    """
+    Devuelve al inventario las unidades de las ordenes
+    con un solo UPDATE para todos los articulos
+    """
+    quantities = dict(
+        OrderDetail.objects.filter(order_id__in=order_ids)
+        .order_by()
+        .values_list("article_id")
+        .annotate(total=Sum("quantity")))
+    if not quantities:
+        return
+
+    ProductInventory.objects.filter(id__in=quantities).update(
+        stock=F("stock") + Case(
+            *[When(id=article_id, then=Value(total))
+              for article_id, total in quantities.items()],
+            default=Value(0),
+        ))
+
+
+def bulk_transition(action, order_ids, queryset=None, user=None):
+    """
+    Aplica la acción a varias ordenes.
+    Valida todas con una consulta (bloqueando las filas) y las
+    actualiza con un UPDATE condicionado al estado de origen.
+    Retorna un dict {id: resultado}.
+    """
+    transition = TRANSITIONS[action]
+    source = transition["source"]
+    if queryset is None:
+        queryset = Order.objects.all()
+
+    order_ids = set(order_ids)
+    outcomes = {}
+
+    with transaction.atomic():
+        current = {
+            row["id"]: row
+            for row in queryset.filter(
+                id__in=order_ids
+            ).select_for_update().values(
+                "id", "store_name_id", "issued_at", "total_amount",
+                "buyer_email", "tracking_number", *source)
+        }
+
+        eligible = []
+        for order_id in order_ids:
+            if order_id not in current:
+                outcomes[order_id] = NOT_FOUND
+            elif all(current[order_id][field] in allowed
+                     for field, allowed in source.items()):
+                eligible.append(order_id)
+                outcomes[order_id] = UPDATED
+            else:
+                outcomes[order_id] = INVALID_TRANSITION
+
+        if eligible:
+            Order.objects.filter(
+                id__in=eligible,
+                **{f"{field}__in": allowed
+                   for field, allowed in source.items()},
+            ).update(**transition["target"], updated_at=timezone.now())
+
+            if transition.get("restock"):
+                restock_orders(eligible)
+            record_sales(action, [
+                (current[i]["store_name_id"],
+                 current[i]["issued_at"],
+                 current[i]["total_amount"])
+                for i in eligible])
+            notify_buyers(action, [current[i] for i in eligible])
+
+            create_logs(
+                user=user,
+                action="UPDATE",
+                message=f"Order {action} (bulk)",
+                related_model="Order",
+                related_ids=eligible,
+            )
+
+    return outcomes
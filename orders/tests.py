@@ -1,3 +1,375 @@
-from django.test import TestCase
+import datetime
+import re
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import serializers
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.test import APIClient
+
+from logs.models import Log
+from orders.management.commands.process_invoices import (
+    Command as ProcessInvoices)
+from orders.models import Order, OrderDetail, StoreDailySales
+from orders.rollups import add_delta, record_sales_deltas
+from orders.state_machine import can_transition
+from products.models import Category, Product, ProductInventory, Size
+from users.models import CustomUser
+
+
+def updated_columns(sql):
+    """columnas del SET de un UPDATE"""
+    set_clause = sql.split(" SET ", 1)[1].split(" WHERE ", 1)[0]
+    return re.findall(r'"(\w+)" = ', set_clause)
+
+
+class OrderDirtyFieldsSaveTests(TestCase):
+    """save() de Order escribe solo las columnas que cambiaron"""
+
+    @classmethod
+    def setUpTestData(cls):
+        store = CustomUser.objects.create_user(
+            "dueno@example.com", "Tienda Test", "+56911111111",
+            password="clave-segura-123")
+        cls.order = Order.objects.create(
+            store_name=store,
+            total_amount=1000,
+            shipping_address="Calle 123",
+            buyer_phone="+56922222222",
+            buyer_email="comprador@example.com",
+            snapshot={"items": []},
+        )
+
+    def test_unchanged_save_runs_no_queries(self):
+        order = Order.objects.get(pk=self.order.pk)
+        with CaptureQueriesContext(connection) as queries:
+            order.save()
+        self.assertEqual(len(queries), 0)
+
+    def test_changed_field_updates_only_that_column(self):
+        order = Order.objects.get(pk=self.order.pk)
+        order.tracking_number = "TRK123"
+        with CaptureQueriesContext(connection) as queries:
+            order.save()
+        self.assertEqual(len(queries), 1)
+        # updated_at es auto_now, se escribe junto al campo cambiado
+        self.assertEqual(
+            sorted(updated_columns(queries[0]["sql"])),
+            ["tracking_number", "updated_at"])
+
+    def test_json_mutated_in_place_is_saved(self):
+        order = Order.objects.get(pk=self.order.pk)
+        order.snapshot["items"].append({"id": 1})
+        with CaptureQueriesContext(connection) as queries:
+            order.save()
+        self.assertEqual(len(queries), 1)
+        self.assertIn("snapshot", updated_columns(queries[0]["sql"]))
+
+
+BULK_URL = "/api/orders/order/bulk-transition/"
+
+
+class OrderTransitionTests(TestCase):
+    """tabla de transiciones en la cancelación y en las acciones masivas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = CustomUser.objects.create_user(
+            "dueno@example.com", "Tienda Test", "+56911111111",
+            password="clave-segura-123")
+        cls.other_store = CustomUser.objects.create_user(
+            "otro@example.com", "Otra Tienda", "+56933333333",
+            password="clave-segura-123")
+        product = Product.objects.create(
+            name="Polera", category=Category.objects.create(name="Ropa"),
+            store_name=cls.store, price=5000)
+        cls.article = ProductInventory.objects.create(
+            product=product, size=Size.objects.create(size_name="M"),
+            stock=5)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.store)
+
+    def create_order(self, store=None, quantity=2, **fields):
+        order = Order.objects.create(
+            store_name=store or self.store,
+            total_amount=10000,
+            shipping_address="Calle 123",
+            buyer_phone="+56922222222",
+            buyer_email="comprador@example.com",
+            **fields)
+        OrderDetail.objects.create(
+            order=order, article=self.article, quantity=quantity,
+            price_per_unit=5000, subtotal=5000 * quantity,
+            product_name_snapshot="Polera")
+        return order
+
+    def bulk(self, action, ids):
+        return self.client.post(
+            BULK_URL, {"ids": ids, "action": action}, format="json")
+
+    def test_illegal_transitions_are_rejected(self):
+        pending = Order(shipping_status="pending", payment_status="pending")
+        delivered = Order(shipping_status="delivered", payment_status="paid")
+        canceled = Order(shipping_status="canceled", payment_status="failed")
+        self.assertFalse(can_transition(pending, "deliver"))
+        self.assertFalse(can_transition(delivered, "cancel"))
+        self.assertFalse(can_transition(canceled, "ship"))
+        self.assertFalse(can_transition(delivered, "refound"))
+        self.assertTrue(can_transition(canceled, "refound"))
+
+    def test_cancel_restocks_once_and_logs(self):
+        order = self.create_order(shipping_status="processing")
+        url = f"/api/orders/order/{order.id}/cancel/"
+
+        self.assertEqual(self.client.patch(url).status_code, 200)
+        order.refresh_from_db()
+        self.assertEqual(order.shipping_status, "canceled")
+        self.assertEqual(order.payment_status, "failed")
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.stock, 7)
+        self.assertTrue(Log.objects.filter(
+            related_model="Order", related_id=order.id).exists())
+
+        # la segunda cancelación no vuelve a reponer el stock
+        response = self.client.patch(url)
+        self.assertEqual(response.status_code, 400)
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.stock, 7)
+
+    def test_cancel_rejects_pending_order(self):
+        order = self.create_order()
+        response = self.client.patch(f"/api/orders/order/{order.id}/cancel/")
+        self.assertEqual(response.status_code, 400)
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.stock, 5)
+
+    def test_admin_only_action_is_forbidden_for_owner(self):
+        order = self.create_order(shipping_status="processing")
+        response = self.bulk("deliver", [order.id])
+        self.assertEqual(response.status_code, 400)
+        order.refresh_from_db()
+        self.assertEqual(order.shipping_status, "processing")
+
+    def test_admin_can_run_admin_only_action(self):
+        admin = CustomUser.objects.create_user(
+            "admin@example.com", "Admin", "+56944444444",
+            password="clave-segura-123", is_staff=True)
+        self.client.force_authenticate(admin)
+        order = self.create_order(shipping_status="processing")
+        response = self.bulk("deliver", [order.id])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data["results"], [{"id": order.id, "result": "updated"}])
+
+    def test_bulk_results(self):
+        updated = self.create_order(shipping_status="processing")
+        invalid = self.create_order(shipping_status="delivered")
+        foreign = self.create_order(
+            store=self.other_store, shipping_status="processing")
+        missing = foreign.id + 1000
+
+        response = self.bulk(
+            "cancel", [updated.id, invalid.id, foreign.id, missing])
+        self.assertEqual(response.status_code, 200)
+        results = {r["id"]: r["result"] for r in response.data["results"]}
+        self.assertEqual(results, {
+            updated.id: "updated",
+            invalid.id: "invalid_transition",
+            foreign.id: "not_found",
+            missing: "not_found",
+        })
+        foreign.refresh_from_db()
+        self.assertEqual(foreign.shipping_status, "processing")
+        # solo se repone el stock de la orden cancelada
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.stock, 7)
+
+
+class StoreDailySalesTests(TestCase):
+    """el resumen diario suma deltas y backfill lo reconstruye igual"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = CustomUser.objects.create_user(
+            "dueno@example.com", "Tienda Test", "+56911111111",
+            password="clave-segura-123")
+        cls.other_store = CustomUser.objects.create_user(
+            "otro@example.com", "Otra Tienda", "+56933333333",
+            password="clave-segura-123")
+        product = Product.objects.create(
+            name="Polera", category=Category.objects.create(name="Ropa"),
+            store_name=cls.store, price=5000)
+        cls.article = ProductInventory.objects.create(
+            product=product, size=Size.objects.create(size_name="M"),
+            stock=20)
+        cls.day = datetime.date(2026, 3, 10)
+
+    def create_order(self, store, quantity, **fields):
+        order = Order.objects.create(
+            store_name=store,
+            total_amount=5000 * quantity,
+            shipping_address="Calle 123",
+            buyer_phone="+56922222222",
+            buyer_email="comprador@example.com",
+            **fields)
+        # issued_at es auto_now_add
+        Order.objects.filter(pk=order.pk).update(issued_at=datetime.datetime(
+            2026, 3, 10, 15, tzinfo=datetime.timezone.utc))
+        OrderDetail.objects.create(
+            order=order, article=self.article, quantity=quantity,
+            price_per_unit=5000, subtotal=5000 * quantity,
+            product_name_snapshot="Polera")
+        return order
+
+    def rollup(self, store):
+        return StoreDailySales.objects.get(store_name=store, day=self.day)
+
+    def test_add_delta_accumulates_by_store_and_day(self):
+        deltas = {}
+        issued_at = datetime.datetime(
+            2026, 3, 10, 23, tzinfo=datetime.timezone.utc)
+        add_delta(deltas, self.store.id, issued_at, orders_count=1, units=2)
+        add_delta(deltas, self.store.id, self.day, orders_count=1, units=3)
+        self.assertEqual(
+            deltas, {(self.store.id, self.day): {"orders_count": 2, "units": 5}})
+
+    def test_deltas_are_added_to_existing_row(self):
+        for units in (2, 3):
+            record_sales_deltas({(self.store.id, self.day): {
+                "orders_count": 1, "units": units,
+                "gross_amount": Decimal("5000")}})
+        row = self.rollup(self.store)
+        self.assertEqual(row.orders_count, 2)
+        self.assertEqual(row.units, 5)
+        self.assertEqual(row.gross_amount, Decimal("10000"))
+        self.assertEqual(row.cancellations_count, 0)
+
+    def test_cancel_adds_cancellation_delta(self):
+        order = self.create_order(
+            self.store, 2, shipping_status="processing")
+        client = APIClient()
+        client.force_authenticate(self.store)
+        response = client.patch(f"/api/orders/order/{order.id}/cancel/")
+        self.assertEqual(response.status_code, 200)
+        row = self.rollup(self.store)
+        self.assertEqual(row.cancellations_count, 1)
+        self.assertEqual(row.canceled_amount, Decimal("10000"))
+
+    def test_backfill_rebuilds_from_orders(self):
+        self.create_order(self.store, 2)
+        self.create_order(
+            self.store, 1, shipping_status="canceled",
+            payment_status="refounded")
+        self.create_order(self.other_store, 4)
+        # resumen desfasado que backfill debe reemplazar
+        StoreDailySales.objects.create(
+            store_name=self.store, day=self.day, orders_count=99)
+
+        call_command("backfill_store_sales", chunk_size=1, stdout=StringIO())
+
+        row = self.rollup(self.store)
+        self.assertEqual(row.orders_count, 2)
+        self.assertEqual(row.units, 3)
+        self.assertEqual(row.gross_amount, Decimal("15000"))
+        self.assertEqual(row.refunds_count, 1)
+        self.assertEqual(row.refunded_amount, Decimal("5000"))
+        self.assertEqual(row.cancellations_count, 1)
+        self.assertEqual(row.canceled_amount, Decimal("5000"))
+        self.assertEqual(self.rollup(self.other_store).units, 4)
+
+    def test_backfill_only_touches_the_given_store(self):
+        self.create_order(self.store, 2)
+        StoreDailySales.objects.create(
+            store_name=self.other_store, day=self.day, orders_count=7)
+
+        call_command(
+            "backfill_store_sales", store=self.store.slug, stdout=StringIO())
+
+        self.assertEqual(self.rollup(self.store).orders_count, 1)
+        self.assertEqual(self.rollup(self.other_store).orders_count, 7)
+
+
+class ProcessInvoicesTests(TestCase):
+    """las boletas que fallan esperan antes de reintentar"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = CustomUser.objects.create_user(
+            "dueno@example.com", "Tienda Test", "+56911111111",
+            password="clave-segura-123")
+
+    def setUp(self):
+        staging = tempfile.TemporaryDirectory()
+        self.addCleanup(staging.cleanup)
+        self.path = Path(staging.name) / "Order-boleta"
+        self.path.write_bytes(b"boleta")
+        self.order = Order.objects.create(
+            store_name=self.store,
+            total_amount=1000,
+            shipping_address="Calle 123",
+            buyer_phone="+56922222222",
+            buyer_email="comprador@example.com",
+            invoice_status="pending",
+            invoice_upload_path=str(self.path),
+        )
+        self.command = ProcessInvoices()
+        self.command.max_attempts = 3
+        self.command.lease = datetime.timedelta(minutes=10)
+        self.command.storage = mock.Mock()
+        self.command.storage.upload.return_value = {
+            "url": "https://cdn.example.com/boleta.jpg"}
+
+    def process(self, error=None):
+        """reserva y procesa en este hilo (sin el pool del comando)"""
+        with mock.patch(
+                "orders.management.commands.process_invoices."
+                "procesar_imagen", side_effect=error):
+            order_ids = self.command.claim(10)
+            if error and order_ids:
+                with self.assertLogs(
+                        "orders.management.commands.process_invoices",
+                        "WARNING"):
+                    self.command.upload_invoice(order_ids[0])
+            else:
+                for order_id in order_ids:
+                    self.command.upload_invoice(order_id)
+        self.order.refresh_from_db()
+        return order_ids
+
+    def test_failed_invoice_waits_before_retrying(self):
+        self.process(ConnectionError)
+        self.assertEqual(self.order.invoice_status, "pending")
+        self.assertEqual(self.order.invoice_attempts, 1)
+        self.assertGreater(
+            self.order.invoice_next_attempt_at, timezone.now())
+        self.assertTrue(self.path.exists())
+
+        # no se toma antes de la hora del reintento
+        self.assertEqual(self.process(), [])
+
+        Order.objects.filter(pk=self.order.pk).update(
+            invoice_next_attempt_at=timezone.now())
+        self.assertEqual(self.process(), [self.order.id])
+        self.assertEqual(self.order.invoice_status, "done")
+
+    def test_last_attempt_discards_staged_file(self):
+        Order.objects.filter(pk=self.order.pk).update(invoice_attempts=2)
+        self.process(ConnectionError)
+        self.assertEqual(self.order.invoice_status, "failed")
+        self.assertIsNone(self.order.invoice_upload_path)
+        self.assertFalse(self.path.exists())
+
+    def test_invalid_image_fails_without_retry(self):
+        self.process(serializers.ValidationError("imagen inválida"))
+        self.assertEqual(self.order.invoice_status, "failed")
+        self.assertFalse(self.path.exists())
@@ -1,14 +1,23 @@
 from django.urls import path
 from .views import (StoreOrdersListView,
+                    StoreOrdersExportView,
+                    StoreSalesStatsView,
                     OrderDetailView,
                     UpdateOrderView,
                     CancelOrderView,
                     CheckoutView,
-                    CompleteOrRefoundOrderView)
+                    CompleteOrRefoundOrderView,
+                    BulkOrderTransitionView)
 
 urlpatterns = [
     path("store/<str:store>/orders/", 
          StoreOrdersListView.as_view(), name="store-orders"),
+    path("store/<str:store>/orders/export/", 
+         StoreOrdersExportView.as_view(), name="store-orders-export"),
+    path("store/<str:store>/stats/", 
+         StoreSalesStatsView.as_view(), name="store-stats"),
+    path("order/bulk-transition/", 
+         BulkOrderTransitionView.as_view(), name="order-bulk-transition"),
     path("order/<str:id>/", 
          OrderDetailView.as_view(), name="order-detail"),
     path("order/<int:id>/update/", 
@@ -0,0 +1,92 @@
+# orders/utils.py
+import csv
+import json
+from itertools import groupby
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import JSONRenderer
+
+# columnas de la orden y de sus articulos en la exportación
+EXPORT_ORDER_FIELDS = (
+    "id",
+    "issued_at",
+    "buyer_email",
+    "buyer_phone",
+    "shipping_address",
+    "payment_status",
+    "shipping_status",
+    "tracking_number",
+    "total_amount",
+)
+EXPORT_ITEM_FIELDS = (
+    "items__id",
+    "items__product_name_snapshot",
+    "items__product_sku_snapshot",
+    "items__quantity",
+    "items__price_per_unit",
+    "items__subtotal",
+)
+EXPORT_CHUNK_SIZE = 2000
+
+
+class CSVStreamRenderer(JSONRenderer):
+    """
+    Habilita ?format=csv en la exportación. La respuesta se genera con
+    StreamingHttpResponse, este renderer solo se usa para los errores.
+    """
+    media_type = "text/csv"
+    format = "csv"
+
+
+class NDJSONStreamRenderer(JSONRenderer):
+    """Habilita ?format=ndjson en la exportación"""
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+
+class Echo:
+    """Buffer falso para que csv.writer devuelva cada fila"""
+
+    def write(self, value):
+        return value
+
+
+def _order_line_rows(queryset, chunk_size):
+    """
+    Recorre las ordenes con sus articulos en un solo cursor
+    (LEFT JOIN) leyendo por bloques para mantener la memoria constante
+    """
+    return queryset.order_by(
+        "-issued_at", "-id", "items__id"
+    ).values_list(
+        *EXPORT_ORDER_FIELDS, *EXPORT_ITEM_FIELDS
+    ).iterator(chunk_size=chunk_size)
+
+
+def stream_orders_csv(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """genera una fila CSV por articulo vendido"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(
+        [*EXPORT_ORDER_FIELDS,
+         *(f.replace("items__", "item_") for f in EXPORT_ITEM_FIELDS)])
+    for row in _order_line_rows(queryset, chunk_size):
+        yield writer.writerow(["" if v is None else v for v in row])
+
+
+def stream_orders_ndjson(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """genera una linea JSON por orden con sus articulos anidados"""
+    n_order = len(EXPORT_ORDER_FIELDS)
+    rows = _order_line_rows(queryset, chunk_size)
+
+    for _, lines in groupby(rows, key=lambda row: row[0]):
+        lines = list(lines)
+        order = dict(zip(EXPORT_ORDER_FIELDS, lines[0][:n_order]))
+        order["items"] = [
+            {
+                field.replace("items__", ""): value
+                for field, value in zip(EXPORT_ITEM_FIELDS, line[n_order:])
+            }
+            for line in lines
+            if line[n_order] is not None
+        ]
+        yield json.dumps(order, cls=DjangoJSONEncoder) + "\n"
@@ -1,14 +1,24 @@
+from conf.filters import OwnerStoreFilterBackend
 from conf.permissions import IsOwnerByGUIDOrAdminForRestApp
 
-from .models import Order
+from .models import Order, StoreDailySales
+from users.models import CustomUser
 
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAdminUser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.throttling import AnonRateThrottle
+from rest_framework.pagination import CursorPagination
 
 from django.shortcuts import get_object_or_404
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+import datetime
+
+from logs.utils import parse_query_datetime
+from django.http import Http404, StreamingHttpResponse
 
 from .serializers import (
     OrderSerializer,
@@ -16,7 +26,20 @@ from .serializers import (
     CancelOrderSerializer,
     CheckoutSerializer,
     OrderSerializerList,
-    CompleteOrRefoundOrderSerializer
+    CompleteOrRefoundOrderSerializer,
+    BulkOrderTransitionSerializer,
+    StoreDailySalesSerializer,
+    StoreSalesTotalsSerializer,
+    build_order_snapshot,
+    order_public_data,
+)
+from .rollups import ROLLUP_FIELDS
+from .state_machine import bulk_transition
+from .utils import (
+    CSVStreamRenderer,
+    NDJSONStreamRenderer,
+    stream_orders_csv,
+    stream_orders_ndjson,
 )
 
 
@@ -26,21 +49,33 @@ class OrderThrottle(AnonRateThrottle):
     rate = '100/hour'
 
 
-# 1. Get All Orders ny store_name__slug
-class StoreOrdersListView(generics.ListAPIView):
+class StoreOrdersPagination(CursorPagination):
     """
-    permite al dueño de la tienda ver todas sus ordenes.
-    El puede filtrar para ver cuales están listas y cuales
-    faltan por actualizar.
+    Paginación por cursor sobre (issued_at, id), no necesita
+    contar ni saltar filas aunque la tienda tenga miles de ordenes
     """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ("-issued_at", "-id")
 
-    permission_classes = [IsOwnerByGUIDOrAdminForRestApp]
-    serializer_class = OrderSerializerList
+
+class StoreOrdersFilterMixin:
+    """
+    Filtros compartidos por el listado y la exportación
+    de las ordenes de una tienda
+    """
 
     def get_queryset(self):
-        store_slug = self.kwargs["store"]
+        # resolvemos la tienda una sola vez para filtrar por store_name_id
+        # y aprovechar los indices (store_name, ..., issued_at)
+        store_id = CustomUser.objects.filter(
+            slug=self.kwargs["store"]).values_list("id", flat=True).first()
+        if store_id is None:
+            return Order.objects.none()
+
         qs = Order.objects.filter(
-            store_name__slug=store_slug).order_by("-issued_at")
+            store_name_id=store_id).order_by("-issued_at", "-id")
 
         # Filtros opcionales
         payment_status = self.request.query_params.get("payment_status")
@@ -52,11 +87,134 @@ class StoreOrdersListView(generics.ListAPIView):
         if shipping_status:
             qs = qs.filter(shipping_status=shipping_status)
         if buyer_email:
-            qs = qs.filter(buyer_email__iexact=buyer_email)
+            # usa el indice funcional Lower(buyer_email)
+            qs = qs.alias(buyer_email_lower=Lower("buyer_email")).filter(
+                buyer_email_lower=buyer_email.lower())
+
+        # rango de fechas, con particiones mensuales solo se leen
+        # las particiones del rango
+        start_date = parse_query_datetime(
+            self.request.query_params.get("start_date"))
+        end_date = parse_query_datetime(
+            self.request.query_params.get("end_date"))
+
+        if start_date:
+            qs = qs.filter(issued_at__gte=start_date)
+        if end_date:
+            qs = qs.filter(issued_at__lte=end_date)
 
         return qs
 
 
+# 1. Get All Orders ny store_name__slug
+class StoreOrdersListView(StoreOrdersFilterMixin, generics.ListAPIView):
+    """
+    permite al dueño de la tienda ver todas sus ordenes.
+    El puede filtrar para ver cuales están listas y cuales
+    faltan por actualizar.
+    """
+
+    permission_classes = [IsOwnerByGUIDOrAdminForRestApp]
+    filter_backends = [OwnerStoreFilterBackend]
+    serializer_class = OrderSerializerList
+    pagination_class = StoreOrdersPagination
+
+    def get_queryset(self):
+        # el listado no usa el snapshot, no se trae
+        return super().get_queryset().select_related(
+            "store_name").defer("snapshot")
+
+
+# 1.1 Export orders by store_name__slug
+class StoreOrdersExportView(StoreOrdersFilterMixin, generics.GenericAPIView):
+    """
+    Exporta las ordenes de la tienda con sus articulos en CSV
+    (una fila por articulo) o NDJSON (una linea por orden).
+    Acepta los mismos filtros que el listado.
+    Ejemplo: GET /orders/store/<store>/orders/export/?format=ndjson
+    """
+
+    permission_classes = [IsOwnerByGUIDOrAdminForRestApp]
+    filter_backends = [OwnerStoreFilterBackend]
+    renderer_classes = [CSVStreamRenderer, NDJSONStreamRenderer]
+
+    def get(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        store_slug = self.kwargs["store"]
+
+        if request.accepted_renderer.format == "ndjson":
+            response = StreamingHttpResponse(
+                stream_orders_ndjson(queryset),
+                content_type="application/x-ndjson")
+            filename = f"{store_slug}-orders.ndjson"
+        else:
+            response = StreamingHttpResponse(
+                stream_orders_csv(queryset),
+                content_type="text/csv")
+            filename = f"{store_slug}-orders.csv"
+
+        response["Content-Disposition"] = (
+            f'attachment; filename="{filename}"')
+        return response
+
+
+# 1.2 Sales stats by store_name__slug
+class StoreSalesStatsView(generics.GenericAPIView):
+    """
+    Devuelve las ventas diarias de la tienda y sus totales
+    leyendo el resumen StoreDailySales.
+    por defecto muestra los ultimos 30 dias.
+    Ejemplo: GET /orders/store/<store>/stats/?from=2025-01-01&to=2025-01-31
+    """
+
+    permission_classes = [IsOwnerByGUIDOrAdminForRestApp]
+    filter_backends = [OwnerStoreFilterBackend]
+    serializer_class = StoreDailySalesSerializer
+
+    def get(self, request, *args, **kwargs):
+        store_id = CustomUser.objects.filter(
+            slug=self.kwargs["store"]).values_list("id", flat=True).first()
+        if store_id is None:
+            return Response(
+                {"detail": "Store not found", "code": "store_not_found"},
+                status=status.HTTP_404_NOT_FOUND)
+
+        raw_to = request.query_params.get("to")
+        raw_from = request.query_params.get("from")
+        try:
+            date_to = parse_date(raw_to) if raw_to else timezone.localdate()
+            date_from = (parse_date(raw_from) if raw_from
+                         else date_to - datetime.timedelta(days=29))
+        except ValueError:
+            date_to = date_from = None
+        if date_from is None or date_to is None or date_from > date_to:
+            return Response(
+                {"detail": "Invalid date range", "code": "invalid_range"},
+                status=status.HTTP_400_BAD_REQUEST)
+
+        # un solo rango sobre el indice unico (store_name, day),
+        # el filtro del dueño deja vacio el resumen de otras tiendas
+        days = self.filter_queryset(StoreDailySales.objects.filter(
+            store_name_id=store_id,
+            day__range=(date_from, date_to))).order_by("day")
+        data = self.get_serializer(days, many=True).data
+
+        totals = {field: 0 for field in ROLLUP_FIELDS}
+        for day in days:
+            for field in ROLLUP_FIELDS:
+                totals[field] += getattr(day, field)
+
+        return Response(
+            {
+                "from": date_from,
+                "to": date_to,
+                "totals": StoreSalesTotalsSerializer(totals).data,
+                "days": data,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
 # 2. Get Order by Formatted id
 class OrderDetailView(generics.RetrieveAPIView):
     """
@@ -75,11 +233,39 @@ class OrderDetailView(generics.RetrieveAPIView):
         except ValueError:
             # devolvemos un json custom
             raise ValueError("invalid_id")
-        return get_object_or_404(Order, id=real_id)
+        return get_object_or_404(
+            Order.objects.select_related(
+                "store_name").prefetch_related("items"),
+            id=real_id)
+
+    def get_order_data(self):
+        """
+        Lee en una sola consulta el snapshot inmutable y los
+        campos que cambian (estados, tracking y boleta)
+        """
+        formatted_id = self.kwargs["id"]
+        try:
+            real_id = int(formatted_id)
+        except ValueError:
+            raise ValueError("invalid_id")
+
+        order_status = Order.objects.filter(id=real_id).values(
+            "snapshot", *Order.MUTABLE_FIELDS).first()
+        if order_status is None:
+            raise Http404
+
+        snapshot = order_status.pop("snapshot")
+        if not snapshot:
+            # ordenes creadas antes de guardar snapshots
+            order = self.get_object()
+            snapshot = build_order_snapshot(order, order.items.all())
+            Order.objects.filter(id=order.id).update(snapshot=snapshot)
+
+        return order_public_data(snapshot, order_status)
 
     def retrieve(self, request, *args, **kwargs):
         try:
-            return super().retrieve(request, *args, **kwargs)
+            return Response(self.get_order_data())
         except ValueError as e:
             return Response(
                 {
@@ -100,10 +286,13 @@ class UpdateOrderView(generics.UpdateAPIView):
     """
     permite al dueño de la tienda subir la factura del envío
     y cambiar el estado a processing.
+    la imagen se procesa en segundo plano, invoice_status indica
+    si ya está disponible en shipping_invoice_url.
     al hacer esto el dueño de la tienda no puede cancelar el pedido
     """
 
     permission_classes = [IsOwnerByGUIDOrAdminForRestApp]
+    filter_backends = [OwnerStoreFilterBackend]
     queryset = Order.objects.all()
     serializer_class = UpdateOrderSerializer
     lookup_field = "id"
@@ -130,6 +319,7 @@ class CancelOrderView(generics.UpdateAPIView):
     """
 
     permission_classes = [IsOwnerByGUIDOrAdminForRestApp]
+    filter_backends = [OwnerStoreFilterBackend]
     queryset = Order.objects.all()
     serializer_class = CancelOrderSerializer
     lookup_field = "id"
@@ -152,7 +342,8 @@ class CompleteOrRefoundOrderView(generics.UpdateAPIView):
     cambia estado de pedido a delivered si el pedido se completa
     o el pago a refounded si ocurre algo durante el traslado del pedido.
     Si se completa el delivery y el estado cambia a delivered,
-    se crea una boleta para pagarle a la tienda que hizo las ventas
+    la orden se incluye en el siguiente pago a la tienda
+    (comando settle_payouts de la app payments)
     """
 
     permission_classes = [IsAdminUser]
@@ -174,6 +365,49 @@ class CompleteOrRefoundOrderView(generics.UpdateAPIView):
         )
 
 
+#5.1 bulk state transitions
+class BulkOrderTransitionView(APIView):
+    """
+    aplica la misma acción (deliver, refound o cancel) a una lista
+    de ordenes y devuelve el resultado de cada una.
+    el dueño de la tienda solo puede cancelar sus propias ordenes,
+    las demás acciones son para administradores.
+    Ejemplo: POST {"ids": [1, 2, 3], "action": "deliver"}
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = BulkOrderTransitionSerializer(
+            data=request.data, context={"request": request})
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+        queryset = Order.objects.all()
+        if not (user.is_staff or user.is_superuser):
+            queryset = queryset.filter(store_name_id=user.id)
+
+        outcomes = bulk_transition(
+            serializer.validated_data["action"],
+            serializer.validated_data["ids"],
+            queryset=queryset,
+            user=user,
+        )
+        return Response(
+            {
+                "detail": "Orders processed",
+                "code": "bulk transition",
+                "results": [
+                    {"id": order_id, "result": result}
+                    for order_id, result in sorted(outcomes.items())
+                ],
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
 #6 generate payment
 class CheckoutView(APIView):
     """
@@ -187,8 +421,8 @@ class CheckoutView(APIView):
         if serializer.is_valid():
             orders = serializer.save()  # lista de órdenes creadas
             return Response(
-                OrderSerializer(
-                    orders, many=True).data, 
-                    status=status.HTTP_201_CREATED)
+                [order_public_data(order.snapshot, vars(order))
+                 for order in orders],
+                status=status.HTTP_201_CREATED)
         return Response(
             serializer.errors, status=status.HTTP_400_BAD_REQUEST)
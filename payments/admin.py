@@ -1,3 +1,42 @@
 from django.contrib import admin
+from .models import (SettlementRun, Payout, PayoutLine,
+                     Payment, WebhookEvent)
 
-# Register your models here.
+
+class PayoutLineInline(admin.TabularInline):
+    model = PayoutLine
+    extra = 0
+    readonly_fields = ["order", "amount"]
+
+
+@admin.register(SettlementRun)
+class SettlementRunAdmin(admin.ModelAdmin):
+    list_display = (
+        "id", "status", "orders_settled", "started_at", "finished_at")
+    list_filter = ("status",)
+
+
+@admin.register(Payout)
+class PayoutAdmin(admin.ModelAdmin):
+    list_display = (
+        "id", "store_name", "amount", "orders_count",
+        "status", "created_at")
+    list_filter = ("status", "created_at")
+    search_fields = ("store_name__store_name",)
+    inlines = [PayoutLineInline]
+
+
+@admin.register(Payment)
+class PaymentAdmin(admin.ModelAdmin):
+    list_display = (
+        "reference", "order", "gateway", "amount", "status", "created_at")
+    list_filter = ("gateway", "status")
+    search_fields = ("reference", "order__id")
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = (
+        "event_id", "gateway", "received_at", "processed_at", "attempts")
+    list_filter = ("gateway", "processed_at")
+    search_fields = ("event_id",)
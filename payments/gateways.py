@@ -0,0 +1,82 @@
+# payments/gateways.py
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class BaseGateway:
+    """
+    Interfaz de una pasarela de pagos.
+    Cada pasarela sabe cobrar una orden y leer sus webhooks.
+    """
+    name = None
+
+    def charge(self, order, reference):
+        """
+        Inicia el cobro de la orden. reference es la del Payment ya
+        guardado, la pasarela la usa como llave de idempotencia y la
+        informa en sus webhooks.
+        Retorna {"status": "pending"|"paid"|"failed"}
+        """
+        raise NotImplementedError
+
+    def verify_webhook(self, request):
+        """valida la firma del webhook recibido"""
+        raise NotImplementedError
+
+    def event_id(self, payload):
+        """identificador unico del evento en la pasarela"""
+        raise NotImplementedError
+
+    def parse_event(self, payload):
+        """
+        Traduce el evento al formato interno.
+        Retorna {"reference": str, "status": "paid"|"failed"|"refounded"}
+        """
+        raise NotImplementedError
+
+
+class FakeGateway(BaseGateway):
+    """
+    Pasarela local para desarrollo y tests, solo se registra con
+    DEBUG o en los tests (ver PAYMENT_GATEWAYS).
+    Aprueba todos los cobros y acepta webhooks con la forma
+    {"id": ..., "reference": ..., "status": ...} firmados con
+    FAKE_GATEWAY_SECRET en el header X-Fake-Signature.
+    """
+    name = "fake"
+
+    def charge(self, order, reference):
+        return {"status": "paid"}
+
+    @staticmethod
+    def sign(body):
+        """firma hmac sha256 del cuerpo del webhook"""
+        return hmac.new(
+            settings.FAKE_GATEWAY_SECRET.encode(), body,
+            hashlib.sha256).hexdigest()
+
+    def verify_webhook(self, request):
+        signature = request.META.get("HTTP_X_FAKE_SIGNATURE", "")
+        return hmac.compare_digest(signature, self.sign(request.body))
+
+    def event_id(self, payload):
+        return str(payload["id"])
+
+    def parse_event(self, payload):
+        return {
+            "reference": payload["reference"],
+            "status": payload["status"],
+        }
+
+
+def get_gateway(name=None):
+    """
+    Retorna la pasarela configurada en PAYMENT_GATEWAYS.
+    Lanza KeyError si no existe o no está configurada (ej: "fake" en
+    producción), el webhook de esa pasarela responde 404.
+    """
+    name = name or settings.PAYMENT_DEFAULT_GATEWAY
+    return import_string(settings.PAYMENT_GATEWAYS[name])()
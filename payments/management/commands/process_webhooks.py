@@ -0,0 +1,87 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from payments.gateways import get_gateway
+from payments.models import WebhookEvent
+from payments.utils import apply_payment_status
+
+MAX_ATTEMPTS = 8
+
+
+class Command(BaseCommand):
+    """
+    Worker que aplica los webhooks guardados por PaymentWebhookView.
+    Toma los eventos pendientes por lotes (skip locked, se pueden
+    correr varios workers) y los aplica uno a uno en el orden en que
+    llegaron con apply_payment_status (payments/utils.py).
+    Un evento repetido (el pago ya tiene ese estado) se marca
+    procesado sin cambios. Uno que aún no se puede aplicar, por
+    ejemplo un reembolso que llega antes que el pago, queda pendiente
+    y se reintenta con espera exponencial hasta MAX_ATTEMPTS veces.
+    """
+
+    help = "Procesa los webhooks de pago pendientes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=200,
+            help="Eventos procesados por transacción")
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Procesa lo pendiente y termina")
+        parser.add_argument(
+            '--sleep', type=float, default=2,
+            help="Segundos de espera cuando la cola está vacía")
+
+    def handle(self, *args, **options):
+        while True:
+            processed = self.process_batch(options['batch_size'])
+            if processed:
+                self.stdout.write(f"{processed} eventos procesados")
+            elif options['once']:
+                break
+            else:
+                time.sleep(options['sleep'])
+
+    @transaction.atomic
+    def process_batch(self, batch_size):
+        now = timezone.now()
+        events = list(
+            WebhookEvent.objects.filter(
+                processed_at__isnull=True,
+                attempts__lt=MAX_ATTEMPTS,
+                next_attempt_at__lte=now,
+            ).order_by('id').select_for_update(
+                skip_locked=True)[:batch_size])
+        if not events:
+            return 0
+
+        gateways = {}
+
+        for event in events:
+            event.attempts += 1
+            try:
+                if event.gateway not in gateways:
+                    gateways[event.gateway] = get_gateway(event.gateway)
+                parsed = gateways[event.gateway].parse_event(event.payload)
+                # un error deshace solo los cambios de este evento
+                with transaction.atomic():
+                    apply_payment_status(
+                        event.gateway, parsed["reference"], parsed["status"])
+            except Exception as e:
+                event.last_error = repr(e)
+                event.next_attempt_at = now + datetime.timedelta(
+                    seconds=min(60 * 2 ** event.attempts, 6 * 3600))
+                continue
+
+            event.processed_at = now
+            event.last_error = None
+
+        WebhookEvent.objects.bulk_update(
+            events,
+            ['processed_at', 'attempts', 'last_error', 'next_attempt_at'])
+        return len(events)
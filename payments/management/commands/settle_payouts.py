@@ -0,0 +1,114 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from orders.models import Order
+from payments.models import SettlementRun, Payout, PayoutLine
+
+
+class Command(BaseCommand):
+    """
+    Genera los pagos a las tiendas por sus ordenes entregadas.
+
+    Recorre las ordenes pagadas y entregadas que aún no se liquidan
+    por bloques de ids. Cada bloque se procesa en una transacción que
+    crea/suma los Payout, crea los PayoutLine y marca las ordenes con
+    settled_at, así un corte a mitad de camino no paga dos veces.
+    Si hay una ejecución sin terminar se retoma desde su ultima orden.
+    """
+
+    help = "Liquida las ordenes entregadas y genera los pagos a tiendas"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help="Ordenes liquidadas por transacción")
+
+    def handle(self, *args, **options):
+        run = SettlementRun.objects.filter(
+            status='running').order_by('-id').first()
+        if run:
+            self.stdout.write(
+                f"Retomando liquidación {run.id} desde la orden "
+                f"{run.last_order_id}")
+        else:
+            run = SettlementRun.objects.create()
+
+        while self.settle_chunk(run, options['chunk_size']):
+            self.stdout.write(f"{run.orders_settled} ordenes liquidadas")
+
+        run.status = 'finished'
+        run.finished_at = timezone.now()
+        run.save(update_fields=['status', 'finished_at'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Liquidación {run.id} terminada: "
+            f"{run.orders_settled} ordenes, "
+            f"{run.payouts.count()} pagos"))
+
+    @transaction.atomic
+    def settle_chunk(self, run, chunk_size):
+        """liquida un bloque de ordenes, retorna False si no quedan"""
+        order_ids = list(
+            Order.objects.filter(
+                payment_status='paid',
+                shipping_status='delivered',
+                settled_at__isnull=True,
+                id__gt=run.last_order_id,
+            ).order_by('id').select_for_update(
+                skip_locked=True
+            ).values_list('id', flat=True)[:chunk_size])
+        if not order_ids:
+            return False
+
+        chunk = Order.objects.filter(id__in=order_ids)
+
+        # un solo agregado agrupado por tienda
+        totals = {
+            row['store_name_id']: row
+            for row in chunk.order_by().values('store_name_id').annotate(
+                amount=Sum('total_amount'), orders_count=Count('id'))
+        }
+
+        payouts = {
+            payout.store_name_id: payout
+            for payout in Payout.objects.select_for_update().filter(
+                run=run, store_name_id__in=totals)
+        }
+        for payout in payouts.values():
+            payout.amount += totals[payout.store_name_id]['amount']
+            payout.orders_count += totals[payout.store_name_id][
+                'orders_count']
+        Payout.objects.bulk_update(
+            payouts.values(), ['amount', 'orders_count'])
+
+        new_payouts = Payout.objects.bulk_create([
+            Payout(
+                run=run,
+                store_name_id=store_id,
+                amount=row['amount'],
+                orders_count=row['orders_count'],
+            )
+            for store_id, row in totals.items()
+            if store_id not in payouts
+        ])
+        payouts.update(
+            {payout.store_name_id: payout for payout in new_payouts})
+
+        PayoutLine.objects.bulk_create([
+            PayoutLine(
+                payout=payouts[store_id],
+                order_id=order_id,
+                amount=amount,
+            )
+            for order_id, store_id, amount in chunk.values_list(
+                'id', 'store_name_id', 'total_amount')
+        ])
+        chunk.update(settled_at=timezone.now())
+
+        # checkpoint en la misma transacción
+        run.last_order_id = order_ids[-1]
+        run.orders_settled += len(order_ids)
+        run.save(update_fields=['last_order_id', 'orders_settled'])
+        return True
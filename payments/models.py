@@ -1,3 +1,149 @@
 from django.db import models
+from django.utils import timezone
+from users.models import CustomUser
+from orders.models import Order
 
-# Create your models here.
+
+class SettlementRun(models.Model):
+    """
+    Ejecución del comando settle_payouts.
+    Guarda la ultima orden procesada para retomar la ejecución
+    si se interrumpe a mitad de camino.
+    """
+    STATUS = [
+        ('running', 'Running'),
+        ('finished', 'Finished'),
+    ]
+    status = models.CharField(
+        max_length=20, choices=STATUS, default='running')
+    last_order_id = models.BigIntegerField(default=0)
+    orders_settled = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Settlement {self.id} - {self.status}"
+
+
+class Payout(models.Model):
+    """
+    Pago a la tienda por sus ordenes entregadas.
+    Hay un solo pago por tienda en cada ejecución.
+    """
+    run = models.ForeignKey(
+        SettlementRun,
+        on_delete=models.PROTECT,
+        related_name='payouts'
+    )
+    store_name = models.ForeignKey(
+        CustomUser,
+        on_delete=models.PROTECT,
+        related_name='payouts'
+    )
+    amount = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0)
+    orders_count = models.PositiveIntegerField(default=0)
+
+    STATUS = [
+        ('pending', 'Pending'),
+        ('paid', 'Paid'),
+    ]
+    status = models.CharField(
+        max_length=20, choices=STATUS, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['run', 'store_name'],
+                name='unique_payout_per_run_store'),
+        ]
+
+    def __str__(self):
+        return f"Payout {self.id} - {self.store_name}"
+
+
+class PayoutLine(models.Model):
+    """
+    Orden incluida en un pago.
+    La relación uno a uno impide pagar dos veces la misma orden.
+    """
+    payout = models.ForeignKey(
+        Payout,
+        on_delete=models.CASCADE,
+        related_name='lines'
+    )
+    order = models.OneToOneField(
+        Order,
+        on_delete=models.PROTECT,
+        related_name='payout_line'
+    )
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.order} in Payout {self.payout_id}"
+
+
+class Payment(models.Model):
+    """
+    Cobro de una orden en la pasarela de pagos.
+    reference es el identificador del cobro en la pasarela.
+    """
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.PROTECT,
+        related_name='payments'
+    )
+    gateway = models.CharField(max_length=50)
+    reference = models.CharField(max_length=100, unique=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+
+    STATUS = [
+        ('pending', 'Pending'),
+        ('paid', 'Paid'),
+        ('failed', 'Failed'),
+        ('refounded', 'Refounded'),
+    ]
+    status = models.CharField(
+        max_length=20, choices=STATUS, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Payment {self.reference} - {self.status}"
+
+
+class WebhookEvent(models.Model):
+    """
+    Webhook recibido desde la pasarela, se guarda sin procesar
+    y el comando process_webhooks lo aplica después.
+    (gateway, event_id) es unico para no aplicar dos veces un evento.
+    """
+    gateway = models.CharField(max_length=50)
+    event_id = models.CharField(max_length=100)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+    # un evento que aún no se puede aplicar (ej: el reembolso llega
+    # antes que el pago) se reintenta desde esta fecha
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['gateway', 'event_id'],
+                name='unique_webhook_event'),
+        ]
+        indexes = [
+            # cola de eventos pendientes
+            models.Index(
+                fields=['id'],
+                condition=models.Q(processed_at__isnull=True),
+                name='webhook_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.gateway} {self.event_id}"
@@ -1,3 +1,312 @@
+import datetime
+import json
+from unittest import mock
+
+from django.core.management import call_command
+from django.db.models import QuerySet
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from orders.models import EmailOutbox, Order
+from payments.gateways import FakeGateway
+from payments.models import (
+    Payment, Payout, PayoutLine, SettlementRun, WebhookEvent)
+from products.models import Category, Product, ProductInventory, Size
+from users.models import CustomUser
+
+WEBHOOK_URL = "/api/payments/webhook/fake/"
+
+
+def create_order(store, **fields):
+    """orden pendiente con su pago en la pasarela fake"""
+    order = Order.objects.create(
+        store_name=store,
+        total_amount=1000,
+        shipping_address="Calle 123",
+        buyer_phone="+56922222222",
+        buyer_email="comprador@example.com",
+        **fields)
+    payment = Payment.objects.create(
+        order=order, gateway="fake", reference=f"ref-{order.id}",
+        amount=1000, status=order.payment_status)
+    return order, payment
+
+
+def create_store(email="dueno@example.com", phone="+56911111111"):
+    return CustomUser.objects.create_user(
+        email, f"Tienda {phone}", phone, password="clave-segura-123")
+
+
+class PaymentWebhookViewTests(TestCase):
+    """el webhook solo guarda eventos firmados y una vez cada uno"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.body = json.dumps(
+            {"id": "evt-1", "reference": "ref-1", "status": "paid"}).encode()
+
+    def post(self, body, **headers):
+        return self.client.post(
+            WEBHOOK_URL, body, content_type="application/json", **headers)
+
+    def test_missing_signature_is_rejected(self):
+        response = self.post(self.body)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["code"], "invalid_signature")
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_wrong_signature_is_rejected(self):
+        response = self.post(
+            self.body, HTTP_X_FAKE_SIGNATURE=FakeGateway.sign(b"otro"))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_signed_event_is_stored_once(self):
+        signature = FakeGateway.sign(self.body)
+        for _ in range(2):
+            response = self.post(self.body, HTTP_X_FAKE_SIGNATURE=signature)
+            self.assertEqual(response.status_code, 200)
+        event = WebhookEvent.objects.get()
+        self.assertEqual(event.event_id, "evt-1")
+        self.assertIsNone(event.processed_at)
+
+    def test_unknown_gateway_is_not_found(self):
+        response = self.client.post(
+            "/api/payments/webhook/stripe/", self.body,
+            content_type="application/json")
+        self.assertEqual(response.status_code, 404)
+
+    def test_fake_gateway_is_not_registered_in_production(self):
+        with self.settings(PAYMENT_GATEWAYS={}):
+            response = self.post(
+                self.body, HTTP_X_FAKE_SIGNATURE=FakeGateway.sign(self.body))
+        self.assertEqual(response.status_code, 404)
+
+
+class ProcessWebhooksTests(TestCase):
+    """process_webhooks aplica los eventos en orden y una sola vez"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = create_store()
+
+    def add_event(self, event_id, payment, status):
+        return WebhookEvent.objects.create(
+            gateway="fake", event_id=event_id,
+            payload={"id": event_id, "reference": payment.reference,
+                     "status": status})
+
+    def process(self):
+        call_command("process_webhooks", "--once", stdout=mock.Mock())
+
+    def test_paid_event_marks_payment_and_order(self):
+        order, payment = create_order(self.store)
+        event = self.add_event("evt-1", payment, "paid")
+        self.process()
+
+        payment.refresh_from_db()
+        order.refresh_from_db()
+        event.refresh_from_db()
+        self.assertEqual(payment.status, "paid")
+        self.assertEqual(order.payment_status, "paid")
+        self.assertIsNotNone(event.processed_at)
+        self.assertEqual(
+            EmailOutbox.objects.filter(order=order).count(), 1)
+
+    def test_repeated_event_is_a_no_op(self):
+        order, payment = create_order(self.store)
+        self.add_event("evt-1", payment, "paid")
+        self.process()
+        repeated = self.add_event("evt-2", payment, "paid")
+        self.process()
+
+        repeated.refresh_from_db()
+        self.assertIsNotNone(repeated.processed_at)
+        self.assertIsNone(repeated.last_error)
+        # un solo aviso de pago
+        self.assertEqual(
+            EmailOutbox.objects.filter(order=order).count(), 1)
+
+    def test_refund_before_payment_waits_for_it(self):
+        order, payment = create_order(self.store)
+        refund = self.add_event("evt-1", payment, "refounded")
+        self.process()
+
+        refund.refresh_from_db()
+        self.assertIsNone(refund.processed_at)
+        self.assertEqual(refund.attempts, 1)
+        self.assertGreater(refund.next_attempt_at, timezone.now())
+
+        self.add_event("evt-2", payment, "paid")
+        self.process()
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, "paid")
+
+        # llega la hora del reintento
+        WebhookEvent.objects.filter(id=refund.id).update(
+            next_attempt_at=timezone.now() - datetime.timedelta(seconds=1))
+        self.process()
+        refund.refresh_from_db()
+        payment.refresh_from_db()
+        order.refresh_from_db()
+        self.assertIsNotNone(refund.processed_at)
+        self.assertEqual(payment.status, "refounded")
+        self.assertEqual(order.payment_status, "refounded")
+
+    def test_late_payment_does_not_revive_canceled_order(self):
+        order, payment = create_order(
+            self.store, payment_status="failed", shipping_status="canceled")
+        event = self.add_event("evt-1", payment, "paid")
+        self.process()
+
+        order.refresh_from_db()
+        event.refresh_from_db()
+        self.assertEqual(order.payment_status, "failed")
+        self.assertIsNone(event.processed_at)
+        self.assertIn("no permitido", event.last_error)
+
+
+class CheckoutChargeTests(TestCase):
+    """el checkout guarda la orden antes de cobrarla"""
+
+    @classmethod
+    def setUpTestData(cls):
+        store = create_store()
+        product = Product.objects.create(
+            name="Polera", category=Category.objects.create(name="Ropa"),
+            store_name=store, price=5000)
+        cls.article = ProductInventory.objects.create(
+            product=product, size=Size.objects.create(size_name="M"),
+            stock=3)
+
+    def checkout(self):
+        return APIClient().post("/api/orders/checkout/", {
+            "email": "comprador@example.com",
+            "phone": "+56922222222",
+            "address": "Calle 123",
+            "notes": "sin notas",
+            "items": [{"article": self.article.id, "quantity": 2}],
+        }, format="json")
+
+    def test_charge_runs_after_commit(self):
+        with mock.patch.object(
+                FakeGateway, "charge",
+                return_value={"status": "paid"}) as charge:
+            with self.captureOnCommitCallbacks() as callbacks:
+                response = self.checkout()
+            # el cobro no corre dentro de la transacción
+            charge.assert_not_called()
+            for callback in callbacks:
+                callback()
+
+        self.assertEqual(response.status_code, 201)
+        payment = Payment.objects.get()
+        charge.assert_called_once()
+        self.assertEqual(charge.call_args.args[1], payment.reference)
+        self.assertEqual(payment.status, "paid")
+        self.assertEqual(payment.order.payment_status, "paid")
+
+    def test_failed_charge_leaves_order_pending(self):
+        with mock.patch.object(
+                FakeGateway, "charge", side_effect=ConnectionError), \
+                self.assertLogs("payments.utils", "ERROR"), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.checkout()
+
+        self.assertEqual(response.status_code, 201)
+        payment = Payment.objects.get()
+        self.assertEqual(payment.status, "pending")
+        self.assertEqual(payment.order.payment_status, "pending")
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.stock, 1)
+
+    def test_rollback_does_not_charge(self):
+        with mock.patch.object(FakeGateway, "charge") as charge, \
+                mock.patch(
+                    "orders.serializers.record_sales_deltas",
+                    side_effect=RuntimeError), \
+                self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError):
+                self.checkout()
+
+        charge.assert_not_called()
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(Payment.objects.exists())
+
+
+class SettlePayoutsTests(TestCase):
+    """settle_payouts paga cada orden entregada una sola vez"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = create_store()
+        cls.other_store = create_store("otro@example.com", "+56933333333")
+
+    def delivered(self, store):
+        order, _ = create_order(
+            store, payment_status="paid", shipping_status="delivered")
+        return order
+
+    def settle(self, chunk_size=2):
+        call_command(
+            "settle_payouts", chunk_size=chunk_size, stdout=mock.Mock())
+
+    def test_settles_delivered_orders_by_store(self):
+        for _ in range(3):
+            self.delivered(self.store)
+        self.delivered(self.other_store)
+        pending, _ = create_order(self.store, shipping_status="processing")
+
+        self.settle()
+
+        run = SettlementRun.objects.get()
+        self.assertEqual(run.status, "finished")
+        self.assertEqual(run.orders_settled, 4)
+        # los bloques de la misma tienda suman en un solo pago
+        payout = Payout.objects.get(store_name=self.store)
+        self.assertEqual(payout.orders_count, 3)
+        self.assertEqual(payout.amount, 3000)
+        self.assertEqual(
+            Payout.objects.get(store_name=self.other_store).orders_count, 1)
+        pending.refresh_from_db()
+        self.assertIsNone(pending.settled_at)
+        self.assertFalse(PayoutLine.objects.filter(order=pending).exists())
+
+    def test_second_run_does_not_pay_twice(self):
+        order = self.delivered(self.store)
+        self.settle()
+        self.settle()
+
+        self.assertEqual(PayoutLine.objects.filter(order=order).count(), 1)
+        self.assertEqual(SettlementRun.objects.count(), 2)
+        self.assertEqual(
+            SettlementRun.objects.latest("id").orders_settled, 0)
+
+    def test_resumes_unfinished_run(self):
+        first = self.delivered(self.store)
+        second = self.delivered(self.store)
+        run = SettlementRun.objects.create(last_order_id=first.id)
+
+        self.settle()
+
+        run.refresh_from_db()
+        self.assertEqual(run.status, "finished")
+        self.assertEqual(SettlementRun.objects.count(), 1)
+        self.assertTrue(PayoutLine.objects.filter(order=second).exists())
+        self.assertFalse(PayoutLine.objects.filter(order=first).exists())
+
+    def test_orders_are_locked_with_skip_locked(self):
+        self.delivered(self.store)
+        select_for_update = QuerySet.select_for_update
+        with mock.patch.object(
+                QuerySet, "select_for_update", autospec=True,
+                side_effect=select_for_update) as locked:
+            self.settle()
 
-# Create your tests here.
+        orders = [
+            c for c in locked.call_args_list
+            if c.args[0].model is Order]
+        self.assertTrue(orders)
+        # otra ejecución en paralelo salta las ordenes bloqueadas
+        self.assertTrue(all(c.kwargs.get("skip_locked") for c in orders))
@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import PaymentWebhookView
+
+urlpatterns = [
+    path("webhook/<str:gateway>/", 
+         PaymentWebhookView.as_view(), name="payment-webhook"),
+]
@@ -0,0 +1,102 @@
+"""
+Estados informados por la pasarela.
+El checkout cobra los pagos después de guardar las ordenes y tanto su
+respuesta como los webhooks (process_webhooks) se aplican con
+apply_payment_status usando las transiciones de orders/state_machine.py.
+"""
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from orders.models import Order
+from orders.state_machine import (
+    GATEWAY_ACTIONS,
+    TRANSITIONS,
+    apply_transition,
+    can_transition,
+    notify_buyers,
+    record_sales,
+)
+from .models import Payment
+
+logger = logging.getLogger(__name__)
+
+
+class EventoPendiente(Exception):
+    """el evento todavía no se puede aplicar, se reintenta después"""
+
+
+def apply_payment_status(gateway, reference, status):
+    """
+    Aplica el estado informado al pago y su orden, se llama dentro
+    de una transacción.
+    Lanza EventoPendiente si el pago no existe o sus estados
+    actuales no permiten la transición.
+    """
+    action = GATEWAY_ACTIONS.get(status)
+    if action is None:
+        raise ValueError(f"Estado {status} no soportado")
+    transition = TRANSITIONS[action]
+    payment_source = transition["source"]["payment_status"]
+    new_status = transition["target"]["payment_status"]
+
+    payment = Payment.objects.filter(
+        gateway=gateway, reference=reference,
+    ).select_for_update().first()
+    if payment is None:
+        raise EventoPendiente("Pago no encontrado")
+    if payment.status == new_status:
+        # evento repetido
+        return
+
+    order = Order.objects.select_for_update().get(id=payment.order_id)
+    if payment.status not in payment_source \
+            or not can_transition(order, action):
+        raise EventoPendiente(
+            f"{action} no permitido con el pago {payment.status} y "
+            f"la orden {order.payment_status}/{order.shipping_status}")
+
+    # mismos estados de origen que la orden
+    Payment.objects.filter(
+        id=payment.id, status__in=payment_source,
+    ).update(status=new_status, updated_at=timezone.now())
+
+    apply_transition(order, action)
+    order.save()
+    record_sales(action, [
+        (order.store_name_id, order.issued_at, order.total_amount)])
+    # aviso al comprador (no se avisa de los pagos fallidos)
+    notify_buyers(action, [{
+        "id": order.id,
+        "buyer_email": order.buyer_email,
+        "total_amount": order.total_amount,
+        "tracking_number": order.tracking_number,
+    }])
+
+
+def charge_payments(gateway, payments):
+    """
+    Cobra los pagos ya guardados, fuera de la transacción que creó
+    las ordenes. Si la pasarela responde paid o failed se aplica como
+    un webhook. Si el cobro falla o queda pendiente la orden sigue
+    pending hasta que llegue el webhook con la referencia del pago.
+    """
+    for payment in payments:
+        try:
+            result = gateway.charge(payment.order, payment.reference)
+        except Exception:
+            logger.exception(
+                "No se pudo cobrar el pago %s", payment.reference)
+            continue
+
+        if result["status"] == "pending":
+            continue
+        try:
+            with transaction.atomic():
+                apply_payment_status(
+                    gateway.name, payment.reference, result["status"])
+        except EventoPendiente as e:
+            # un webhook ya cambió el pago
+            logger.warning(
+                "Cobro %s no aplicado: %s", payment.reference, e)
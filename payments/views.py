@@ -0,0 +1,51 @@
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .gateways import get_gateway
+from .models import WebhookEvent
+
+
+class PaymentWebhookView(APIView):
+    """
+    recibe los webhooks de la pasarela, los guarda sin procesar
+    y responde de inmediato. el comando process_webhooks aplica
+    los cambios de estado a los pagos y las ordenes.
+    un evento repetido se ignora por su event_id.
+    """
+
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    throttle_classes = []
+
+    def post(self, request, gateway):
+        try:
+            payment_gateway = get_gateway(gateway)
+        except KeyError:
+            return Response(
+                {"detail": "Gateway not found", "code": "gateway_not_found"},
+                status=status.HTTP_404_NOT_FOUND)
+
+        if not payment_gateway.verify_webhook(request):
+            return Response(
+                {"detail": "Invalid signature", "code": "invalid_signature"},
+                status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            event_id = payment_gateway.event_id(request.data)
+        except (KeyError, TypeError):
+            return Response(
+                {"detail": "Invalid event", "code": "invalid_event"},
+                status=status.HTTP_400_BAD_REQUEST)
+
+        WebhookEvent.objects.bulk_create(
+            [WebhookEvent(
+                gateway=payment_gateway.name,
+                event_id=event_id,
+                payload=request.data)],
+            ignore_conflicts=True)
+
+        return Response(
+            {"detail": "Event received", "code": "event_received"},
+            status=status.HTTP_200_OK)
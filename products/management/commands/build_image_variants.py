@@ -0,0 +1,84 @@
+import logging
+from io import BytesIO
+from urllib.request import urlopen
+
+from django.core.management.base import BaseCommand
+from rest_framework import serializers
+
+from conf.ingesta import limites, validar_encabezado
+from conf.manejo_imagenes import procesar_variantes, subir_variantes
+from products.models import Product
+
+logger = logging.getLogger(__name__)
+
+
+def missing_variants(product):
+    """posiciones de image_urls sin variantes o con variantes viejas"""
+    variants = product.image_variants or []
+    return [
+        i for i, url in enumerate(product.image_urls)
+        if i >= len(variants) or not variants[i]
+        or variants[i].get("source") != url
+    ]
+
+
+class Command(BaseCommand):
+    """
+    Genera las variantes (thumb, card, full en WebP y JPEG) de las
+    imagenes de productos que aún no las tienen, por ejemplo las
+    cargadas con import_catalog o antes de existir image_variants.
+    Cada imagen se descarga y decodifica una sola vez.
+    """
+
+    help = "Genera las variantes de las imagenes de productos"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--store', help="Slug de la tienda, por defecto todas")
+        parser.add_argument(
+            '--timeout', type=float, default=20,
+            help="Segundos máximos para descargar cada imagen")
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image_urls=[]).select_related(
+            'store_name').only(
+                'id', 'image_urls', 'image_variants', 'store_name__guid')
+        if options['store']:
+            products = products.filter(store_name__slug=options['store'])
+
+        max_bytes = limites("articulo")["max_bytes"]
+        done = failed = 0
+        for product in products.iterator(chunk_size=200):
+            pending = missing_variants(product)
+            if not pending:
+                continue
+
+            variants = list(product.image_variants or [])
+            variants += [None] * (len(product.image_urls) - len(variants))
+            del variants[len(product.image_urls):]
+
+            for i in pending:
+                url = product.image_urls[i]
+                try:
+                    with urlopen(url, timeout=options['timeout']) as resp:
+                        original = BytesIO(resp.read(max_bytes + 1))
+                    validar_encabezado(original, "articulo")
+                    derived = subir_variantes(
+                        procesar_variantes(original),
+                        f"users/{product.store_name.guid}/products/{product.id}",
+                        f"product-{i + 1}")
+                except (OSError, serializers.ValidationError) as e:
+                    logger.warning(
+                        "Producto %s imagen %s: %r", product.id, url, e)
+                    failed += 1
+                    continue
+                derived["source"] = url
+                variants[i] = derived
+                done += 1
+
+            # solo se toca image_variants, no se mueve updated_at
+            Product.objects.filter(id=product.id).update(
+                image_variants=variants)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{done} imagenes procesadas, {failed} con error"))
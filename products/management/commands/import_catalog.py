@@ -0,0 +1,249 @@
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from products.models import Category, Tag, Size, Product, ProductInventory
+from users.models import CustomUser
+
+
+class NameMap:
+    """
+    Mapa en memoria nombre -> id para Category, Tag y Size.
+    Los nombres que faltan se crean en bloque con una sola consulta.
+    """
+
+    def __init__(self, model, field):
+        self.model = model
+        self.field = field
+        self.ids = {}
+
+    def resolve(self, names):
+        missing = {name for name in names if name not in self.ids}
+        if missing:
+            self.model.objects.bulk_create(
+                [self.model(**{self.field: name}) for name in missing],
+                ignore_conflicts=True)
+            self.ids.update(
+                self.model.objects.filter(
+                    **{f"{self.field}__in": missing}
+                ).values_list(self.field, 'id'))
+        return self.ids
+
+
+class Command(BaseCommand):
+    """
+    Importa el catalogo de una tienda desde un CSV o JSONL.
+
+    Columnas CSV: sku, name, description, category, price,
+    tags (separados por |), inventory (talla:stock separados por |),
+    image_urls (separadas por |) e is_active (opcional).
+    En JSONL tags e image_urls son listas e inventory un objeto
+    {talla: stock}.
+
+    El archivo se lee por bloques para no cargarlo entero en memoria.
+    Los productos se identifican por (tienda, sku), asi que volver a
+    importar el mismo archivo actualiza en lugar de duplicar.
+    """
+
+    help = "Importa productos de una tienda desde un CSV o JSONL"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Archivo .csv o .jsonl")
+        parser.add_argument(
+            '--store', required=True, help="Slug de la tienda")
+        parser.add_argument(
+            '--format', choices=['csv', 'jsonl'],
+            help="Formato del archivo, por defecto según la extensión")
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help="Filas procesadas por transacción")
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f"No existe el archivo {path}")
+
+        fmt = options['format'] or path.suffix.lstrip('.').lower()
+        if fmt == 'ndjson':
+            fmt = 'jsonl'
+        if fmt not in ('csv', 'jsonl'):
+            raise CommandError("Formato no soportado, use csv o jsonl")
+
+        try:
+            store = CustomUser.objects.get(slug=options['store'])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"Tienda {options['store']} no encontrada")
+
+        self.categories = NameMap(Category, 'name')
+        self.tags = NameMap(Tag, 'name')
+        self.sizes = NameMap(Size, 'size_name')
+
+        chunk_size = options['chunk_size']
+        total = 0
+        started = time.monotonic()
+
+        with path.open(newline='', encoding='utf-8-sig') as f:
+            rows = self.read_csv(f) if fmt == 'csv' else self.read_jsonl(f)
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+
+                with transaction.atomic():
+                    self.import_chunk(store, chunk)
+
+                total += len(chunk)
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"{total} filas importadas "
+                    f"({total / elapsed:.0f} filas/s)")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Importación terminada: {total} filas en "
+            f"{time.monotonic() - started:.1f}s"))
+
+    def read_csv(self, f):
+        for line, row in enumerate(csv.DictReader(f), start=2):
+            inventory = {}
+            for pair in split_list(row.get('inventory')):
+                size, _, stock = pair.partition(':')
+                inventory[size.strip()] = stock
+            yield self.clean_row(line, {
+                **row,
+                'tags': split_list(row.get('tags')),
+                'image_urls': split_list(row.get('image_urls')),
+                'inventory': inventory,
+            })
+
+    def read_jsonl(self, f):
+        for line, raw in enumerate(f, start=1):
+            if not raw.strip():
+                continue
+            try:
+                row = json.loads(raw)
+            except json.JSONDecodeError as e:
+                raise CommandError(f"Línea {line}: JSON inválido ({e})")
+            yield self.clean_row(line, row)
+
+    def clean_row(self, line, row):
+        """Valida y normaliza una fila del archivo"""
+        sku = str(row.get('sku') or '').strip()
+        name = str(row.get('name') or '').strip()
+        category = str(row.get('category') or '').strip()
+        if not sku or not name or not category:
+            raise CommandError(
+                f"Línea {line}: sku, name y category son obligatorios")
+
+        try:
+            price = Decimal(str(row.get('price')))
+            inventory = {
+                str(size).strip(): int(stock)
+                for size, stock in (row.get('inventory') or {}).items()
+            }
+        except (InvalidOperation, TypeError, ValueError):
+            raise CommandError(f"Línea {line}: precio o stock inválido")
+
+        tags = [str(t).strip() for t in row.get('tags') or []]
+        # un valor más largo que la columna haría fallar todo el bloque
+        limits = (
+            (Product, 'sku', [sku]),
+            (Product, 'name', [name]),
+            (Category, 'name', [category]),
+            (Tag, 'name', tags),
+            (Size, 'size_name', inventory),
+        )
+        for model, field, values in limits:
+            max_length = model._meta.get_field(field).max_length
+            for value in values:
+                if not value or len(value) > max_length:
+                    raise CommandError(
+                        f"Línea {line}: {model.__name__}.{field} "
+                        f"'{value}' debe tener entre 1 y {max_length} "
+                        f"caracteres")
+
+        is_active = row.get('is_active', True)
+        if isinstance(is_active, str):
+            is_active = is_active.strip().lower() not in (
+                'false', '0', 'no', '')
+
+        return {
+            'sku': sku,
+            'name': name,
+            'description': row.get('description') or '',
+            'category': category,
+            'price': price,
+            'tags': tags,
+            'image_urls': list(row.get('image_urls') or []),
+            'inventory': inventory,
+            'is_active': bool(is_active),
+        }
+
+    def import_chunk(self, store, chunk):
+        # si el sku se repite en el bloque gana la última fila
+        rows = {row['sku']: row for row in chunk}.values()
+
+        categories = self.categories.resolve(
+            {row['category'] for row in rows})
+        tags = self.tags.resolve(
+            {tag for row in rows for tag in row['tags']})
+        sizes = self.sizes.resolve(
+            {size for row in rows for size in row['inventory']})
+
+        Product.objects.bulk_create(
+            [
+                Product(
+                    store_name=store,
+                    sku=row['sku'],
+                    name=row['name'],
+                    description=row['description'],
+                    category_id=categories[row['category']],
+                    price=row['price'],
+                    image_urls=row['image_urls'],
+                    is_active=row['is_active'],
+                )
+                for row in rows
+            ],
+            update_conflicts=True,
+            unique_fields=['store_name', 'sku'],
+            update_fields=[
+                'name', 'description', 'category', 'price',
+                'image_urls', 'is_active', 'updated_at'],
+        )
+        product_ids = dict(
+            Product.objects.filter(
+                store_name=store, sku__in=[row['sku'] for row in rows]
+            ).values_list('sku', 'id'))
+
+        ProductTag = Product.tags.through
+        ProductTag.objects.bulk_create(
+            [
+                ProductTag(product_id=product_ids[row['sku']],
+                           tag_id=tags[tag])
+                for row in rows for tag in set(row['tags'])
+            ],
+            ignore_conflicts=True,
+        )
+
+        ProductInventory.objects.bulk_create(
+            [
+                ProductInventory(product_id=product_ids[row['sku']],
+                                 size_id=sizes[size],
+                                 stock=stock)
+                for row in rows for size, stock in row['inventory'].items()
+            ],
+            update_conflicts=True,
+            unique_fields=['product', 'size'],
+            update_fields=['stock'],
+        )
+
+
+def split_list(value):
+    """separa un campo CSV del tipo 'a|b|c' ignorando vacíos"""
+    return [item.strip() for item in (value or '').split('|')
+            if item.strip()]
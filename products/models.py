@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.postgres.fields import ArrayField
+from conf.mixins import DirtyFieldsMixin
 from users.models import CustomUser
 
 # models.py
@@ -34,7 +35,7 @@ class Size(models.Model):
         return self.size_name
 
 
-class Product(models.Model):
+class Product(DirtyFieldsMixin, models.Model):
     """
     productos para mostrar en la vitrina de la web u app.
     estos se pueden filtrar por categoria, tags, precio,
@@ -43,6 +44,8 @@ class Product(models.Model):
     si todos sus articulos quedan en 0, se cambia is active = False 
     """
     name = models.CharField(max_length=200)
+    # codigo del producto en la tienda, usado en las importaciones
+    sku = models.CharField(max_length=100, blank=True, null=True)
     description = models.TextField(blank=True)
     category = models.ForeignKey(Category, on_delete=models.PROTECT)
     store_name = models.ForeignKey(CustomUser, on_delete=models.PROTECT)
@@ -50,16 +53,27 @@ class Product(models.Model):
     image_urls = ArrayField(models.URLField(), blank=True, default=list)
     image_public_ids = ArrayField(
         models.CharField(max_length=200), blank=True, default=list)
+    # variantes de cada imagen, misma posición que image_urls:
+    # {"source": url, "full"|"card"|"thumb": {"webp": url, "jpg": url},
+    #  "public_ids": [...]}
+    image_variants = models.JSONField(blank=True, default=list)
     tags = models.ManyToManyField(Tag, blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     is_active = models.BooleanField(default=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['store_name', 'sku'],
+                name='unique_product_sku_per_store'),
+        ]
+
     def __str__(self):
         return self.name
 
 
-class ProductInventory(models.Model):
+class ProductInventory(DirtyFieldsMixin, models.Model):
     """
     Inventario de producto asociado a un producto.
     Un producto puede contener multiples tallas y cada talla
@@ -1,6 +1,24 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
+
 from rest_framework import serializers
-from django.db import transaction
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import connections, transaction
 from .models import Product, Category, Tag, Size, ProductInventory
+from conf.ingesta import validar_encabezado
+from images.models import ImageAsset
+from images.utils import (
+    content_hash,
+    delete_unused,
+    reference_asset,
+    release_assets,
+    store_asset,
+)
+
+# imagenes por producto y texto que borra la imagen de una posición
+MAX_IMAGES = 5
+DELETE_IMAGE = "delete-product.png"
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -47,6 +65,23 @@ class SizeSerializer(serializers.ModelSerializer):
         fields = ['id', 'size_name', 'description']
 
 
+def variant_urls(instance, variante, ext):
+    """
+    Urls de una variante por cada imagen de image_urls.
+    Si la imagen no tiene variantes o cambió desde que se generaron
+    se usa la url original.
+    """
+    variants = instance.image_variants or []
+    urls = []
+    for i, url in enumerate(instance.image_urls):
+        derived = variants[i] if i < len(variants) else None
+        if derived and derived.get("source") == url:
+            urls.append(derived[variante][ext])
+        else:
+            urls.append(url)
+    return urls
+
+
 class ProductSerializerGetAll(serializers.ModelSerializer):
     """serializer para el endpoint getAll de los productos"""
 
@@ -67,6 +102,9 @@ class ProductSerializerGetAll(serializers.ModelSerializer):
         rep = super().to_representation(instance)
         rep['category'] = instance.category.name
         rep['tags'] = [tag.name for tag in instance.tags.all()]
+        # el listado usa la variante card y no la imagen completa
+        rep['image_urls'] = variant_urls(instance, 'card', 'jpg')
+        rep['image_urls_webp'] = variant_urls(instance, 'card', 'webp')
         rep.pop('description')
         rep.pop('is_active')
         return rep
@@ -90,7 +128,7 @@ class ProductSerializerDetail(serializers.ModelSerializer):
         model = Product
         fields = [
             'id', 'name', 'description', 'image_urls',
-            'price', 'store_name', 'category',
+            'image_variants', 'price', 'store_name', 'category',
             'tags', 'product_inventory'
         ]
 
@@ -99,60 +137,267 @@ class ProductSerializerDetail(serializers.ModelSerializer):
         return ProductInventorySerializer(inventory, many=True).data
 
 
-#TODO: añadir logica de cloudinary para manejar las imangenes.
-#La idea es que podamos añadir hasta 5 imagenes, elminar las 
-# de una posicion recibiendo un texto delete-product.png que borre
-#la imagen de esa misma posicion de cloudinary y lo mismo al editarla.
-#las imagenes se guardaran en la carpeta del usuario dentro de la
-#carpeta products y los nombres sera tipo product-1 hasta product-5
-#asi poder sobreescribir la imagen.
-#si no se recibe una imagen, se omite y no se cambia/actualiza
+class ImageSlotField(serializers.Field):
+    """
+    Imagen de una posición del producto (image_1 a image_5).
+    Recibe un archivo, o el texto delete-product.png para borrar
+    la imagen de esa posición.
+    """
+    default_error_messages = {
+        'invalid': f"Debe enviar una imagen o {DELETE_IMAGE}",
+    }
+
+    def to_internal_value(self, data):
+        if data == DELETE_IMAGE or getattr(data, 'name', None) == DELETE_IMAGE:
+            return DELETE_IMAGE
+        if not isinstance(data, UploadedFile):
+            self.fail('invalid')
+        try:
+            validar_encabezado(data, "articulo")
+        except serializers.ValidationError as e:
+            raise serializers.ValidationError(e.detail["detail"])
+        return data
+
+    def to_representation(self, value):
+        return None
+
+
+def store_product_image(upload):
+    """store_asset desde un hilo del pool, cierra su conexión al terminar"""
+    try:
+        return store_asset(upload, "articulo")
+    finally:
+        connections.close_all()
+
+
 class ProductSerializer(serializers.ModelSerializer):
     """
     Serializer para crear/editar producto junto con su inventario.
+
+    Las imagenes se reciben en image_1 a image_5 (multipart), cada
+    una reemplaza la imagen de esa posición y delete-product.png la
+    borra. Las posiciones que no se envían no se tocan.
     """
     inventory = ProductInventorySerializer(many=True)
     store_name = serializers.StringRelatedField(read_only=True)
+    image_1 = ImageSlotField(write_only=True, required=False)
+    image_2 = ImageSlotField(write_only=True, required=False)
+    image_3 = ImageSlotField(write_only=True, required=False)
+    image_4 = ImageSlotField(write_only=True, required=False)
+    image_5 = ImageSlotField(write_only=True, required=False)
 
     class Meta:
         model = Product
         fields = [
             'id', 'name', 'description', 'image_urls',
             'price', 'category', 'store_name', 'tags',
-            'inventory'
+            'inventory', 'image_1', 'image_2', 'image_3',
+            'image_4', 'image_5',
         ]
+        read_only_fields = ['image_urls']
 
-    @transaction.atomic
     def create(self, validated_data):
-        inventory_data = validated_data.pop('inventory', [])
-        user = self.context['request'].user
-        tags = validated_data.pop('tags', [])
-
-        # Crear producto
-        product = Product.objects.create(**validated_data, store_name=user)
-        product.tags.set(tags)
-
-        # Crear inventario
-        for inv in inventory_data:
-            ProductInventory.objects.create(product=product, **inv)
+        slots = self.pop_slots(validated_data)
+        stored = self.upload_slots(None, slots)
+
+        try:
+            with transaction.atomic():
+                assets = self.reference_slots(slots, stored)
+                inventory_data = validated_data.pop('inventory', [])
+                user = self.context['request'].user
+                tags = validated_data.pop('tags', [])
+
+                # Crear producto
+                product = Product(**validated_data, store_name=user)
+                self.apply_slots(product, slots, assets)
+                product.save()
+                product.tags.set(tags)
+
+                # Crear inventario
+                for inv in inventory_data:
+                    ProductInventory.objects.create(product=product, **inv)
+        except Exception:
+            # las referencias se deshicieron con la transacción
+            delete_unused([asset.id for asset in stored.values()])
+            raise
 
         return product
 
-    @transaction.atomic
     def update(self, instance, validated_data):
-        inventory_data = validated_data.pop('inventory', [])
-        tags = validated_data.pop('tags', None)
-
-        # Actualizar campos del producto
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        if tags is not None:
-            instance.tags.set(tags)
-        instance.save()
-
-        # Actualizar inventario (borramos y volvemos a crear)
-        ProductInventory.objects.filter(product=instance).delete()
-        for inv in inventory_data:
-            ProductInventory.objects.create(product=instance, **inv)
-
+        slots = self.pop_slots(validated_data)
+        stored = self.upload_slots(instance, slots)
+
+        try:
+            with transaction.atomic():
+                assets = self.reference_slots(slots, stored)
+                removed = []
+                if slots:
+                    # se releen las imagenes bloqueando el producto para
+                    # no pisar otra edición simultánea
+                    locked = Product.objects.select_for_update().only(
+                        'image_urls', 'image_public_ids', 'image_variants'
+                    ).get(pk=instance.pk)
+                    instance.image_urls = locked.image_urls
+                    instance.image_public_ids = locked.image_public_ids
+                    instance.image_variants = locked.image_variants
+                    removed = self.apply_slots(instance, slots, assets)
+
+                inventory_data = validated_data.pop('inventory', None)
+                tags = validated_data.pop('tags', None)
+
+                # Actualizar campos del producto
+                for attr, value in validated_data.items():
+                    setattr(instance, attr, value)
+                if tags is not None:
+                    instance.tags.set(tags)
+                instance.save()
+
+                # en un PATCH sin inventario no se toca el stock
+                if inventory_data is not None:
+                    self.sync_inventory(instance, inventory_data)
+        except Exception:
+            delete_unused([asset.id for asset in stored.values()])
+            raise
+
+        # las imagenes reemplazadas o borradas
+        release_assets(removed)
         return instance
+
+    def pop_slots(self, validated_data):
+        """{posición: archivo o DELETE_IMAGE} de las posiciones enviadas"""
+        return {
+            position: validated_data.pop(f'image_{position}')
+            for position in range(1, MAX_IMAGES + 1)
+            if f'image_{position}' in validated_data
+        }
+
+    def upload_slots(self, instance, slots):
+        """
+        Sube las imagenes nuevas en paralelo, de a
+        IMAGE_UPLOADS_PER_REQUEST para dejar cupos del pool de
+        imagenes a otros requests. Las posiciones que reciben la
+        misma imagen que ya tienen se omiten.
+        Retorna {posición: ImageAsset} sin sumar referencias, ver
+        reference_slots.
+        """
+        urls = instance.image_urls if instance is not None else []
+        current = dict(ImageAsset.objects.filter(
+            url__in=urls, profile="articulo"
+        ).values_list('url', 'content_hash')) if urls else {}
+
+        uploads = {}
+        for position, upload in slots.items():
+            if upload == DELETE_IMAGE:
+                continue
+            url = urls[position - 1] if position <= len(urls) else None
+            if url and current.get(url) == content_hash(upload):
+                continue
+            uploads[position] = upload
+
+        if not uploads:
+            return {}
+
+        workers = min(len(uploads), settings.IMAGE_UPLOADS_PER_REQUEST)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                position: pool.submit(store_product_image, upload)
+                for position, upload in uploads.items()
+            }
+
+        assets = {}
+        errors = []
+        for position, future in futures.items():
+            try:
+                assets[position] = future.result()
+            except Exception as e:
+                errors.append(e)
+
+        # si una falla se borran las que se subieron y nadie usa
+        if errors:
+            delete_unused([asset.id for asset in assets.values()])
+            raise errors[0]
+        return assets
+
+    def reference_slots(self, slots, stored):
+        """
+        Suma las referencias de las imagenes subidas dentro de la
+        transacción del producto, si se deshace no quedan contadas.
+        Retorna {posición: ImageAsset}
+        """
+        return {
+            position: reference_asset(asset, slots[position])
+            for position, asset in stored.items()
+        }
+
+    def apply_slots(self, product, slots, assets):
+        """
+        Aplica los cambios de cada posición a image_urls,
+        image_public_ids e image_variants, que se mantienen alineados.
+        Las posiciones borradas se compactan.
+        Retorna las urls que el producto dejó de usar.
+        """
+        images = [
+            (url, public_id or "", variants)
+            for url, public_id, variants in zip_longest(
+                product.image_urls, product.image_public_ids,
+                product.image_variants or [])
+            if url
+        ]
+        images += [None] * (MAX_IMAGES - len(images))
+
+        removed = []
+        for position, upload in slots.items():
+            old = images[position - 1]
+            if upload == DELETE_IMAGE:
+                new = None
+            elif position in assets:
+                asset = assets[position]
+                new = (asset.url, asset.public_id,
+                       {**asset.variants, "source": asset.url})
+            else:
+                # misma imagen, sin cambios
+                continue
+            if old:
+                removed.append(old[0])
+            images[position - 1] = new
+
+        images = [image for image in images if image]
+        product.image_urls = [url for url, _, _ in images]
+        product.image_public_ids = [public_id for _, public_id, _ in images]
+        product.image_variants = [variants for _, _, variants in images]
+        return removed
+
+    def sync_inventory(self, instance, inventory_data):
+        """
+        Sincroniza el inventario comparando por talla.
+        Las tallas existentes solo actualizan su stock, las nuevas
+        se crean y las que no vienen se eliminan. No se borra todo
+        el inventario para no perder el historial de OrderDetail.
+        """
+        existing = {
+            inv.size_id: inv
+            for inv in ProductInventory.objects.filter(product=instance)
+        }
+        # si una talla viene repetida gana la última
+        incoming = {inv['size'].id: inv for inv in inventory_data}
+
+        to_update = []
+        to_create = []
+        for size_id, inv in incoming.items():
+            current = existing.get(size_id)
+            if current is None:
+                to_create.append(
+                    ProductInventory(product=instance, **inv))
+            elif current.stock != inv.get('stock', current.stock):
+                current.stock = inv['stock']
+                to_update.append(current)
+
+        removed = existing.keys() - incoming.keys()
+
+        if to_update:
+            ProductInventory.objects.bulk_update(to_update, ['stock'])
+        if to_create:
+            ProductInventory.objects.bulk_create(to_create)
+        if removed:
+            ProductInventory.objects.filter(
+                product=instance, size_id__in=removed).delete()
@@ -1,3 +1,182 @@
-from django.test import TestCase
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from images.models import ImageAsset
+from images.utils import store_asset
+from products.models import Category, Product, ProductInventory, Size
+from products.serializers import ProductSerializer
+from users.models import CustomUser
+
+
+class InlineExecutor:
+    """
+    ThreadPoolExecutor en el mismo hilo, las conexiones de otros hilos
+    no ven la transacción del test
+    """
+
+    def __init__(self, max_workers):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+def images(count):
+    return {
+        position: SimpleUploadedFile(
+            f"{position}.jpg", f"imagen {position}".encode())
+        for position in range(1, count + 1)
+    }
+
+
+class ProductImageUploadTests(TestCase):
+    """
+    las imagenes se suben fuera de la transacción del producto y sus
+    referencias se cuentan dentro de ella
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = CustomUser.objects.create_user(
+            "dueno@example.com", "Tienda Test", "+56911111111",
+            password="clave-segura-123")
+        cls.category = Category.objects.create(name="Ropa")
+
+    def setUp(self):
+        self.storage = mock.Mock()
+        patchers = [
+            mock.patch.dict("images.utils.PROFILES", articulo=self.upload),
+            mock.patch(
+                "images.utils.get_image_storage", return_value=self.storage),
+            mock.patch(
+                "products.serializers.ThreadPoolExecutor", InlineExecutor),
+            mock.patch(
+                "products.serializers.store_product_image",
+                lambda upload: store_asset(upload, "articulo")),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def upload(self, upload, digest):
+        return {
+            "url": f"https://cdn.example.com/{digest}.jpg",
+            "public_ids": [f"assets/articulo/{digest}-full-jpg"],
+            "variants": {"full": {"jpg": f"{digest}.jpg"}},
+        }
+
+    def create(self, count):
+        request = mock.Mock(user=self.store)
+        serializer = ProductSerializer(context={"request": request})
+        data = {
+            "name": "Polera", "description": "", "price": 5000,
+            "category": self.category, "tags": [], "inventory": [],
+        }
+        for position, upload in images(count).items():
+            data[f"image_{position}"] = upload
+        return serializer.create(data)
+
+    def test_assets_are_referenced_with_the_product(self):
+        product = self.create(3)
+        self.assertEqual(len(product.image_urls), 3)
+        assets = ImageAsset.objects.filter(url__in=product.image_urls)
+        self.assertEqual([a.ref_count for a in assets], [1, 1, 1])
+
+    def test_failed_product_discards_new_assets(self):
+        with mock.patch.object(Product, "save", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.create(2)
+        self.assertFalse(ImageAsset.objects.exists())
+        self.assertEqual(self.storage.delete.call_count, 2)
+
+    def test_failed_product_keeps_shared_assets(self):
+        product = self.create(1)
+        with mock.patch.object(Product, "save", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.create(2)
+        # la imagen 1 la usa el primer producto, la 2 se borra
+        asset = ImageAsset.objects.get()
+        self.assertEqual(asset.url, product.image_urls[0])
+        self.assertEqual(asset.ref_count, 1)
+        self.storage.delete.assert_called_once()
+
+
+class UploadSlotsConcurrencyTests(TestCase):
+    """un request no ocupa todos los cupos del pool de imagenes"""
+
+    def setUp(self):
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def store(self, upload):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+        return mock.Mock(id=upload.name)
+
+    @override_settings(IMAGE_UPLOADS_PER_REQUEST=2)
+    def test_uploads_per_request_are_bounded(self):
+        with mock.patch(
+                "products.serializers.store_product_image", self.store):
+            assets = ProductSerializer().upload_slots(None, images(5))
+        self.assertEqual(len(assets), 5)
+        self.assertEqual(self.max_running, 2)
+
+
+class ImportCatalogTests(TestCase):
+    """import_catalog rechaza valores que no caben en sus columnas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = CustomUser.objects.create_user(
+            "dueno@example.com", "Tienda Test", "+56911111111",
+            password="clave-segura-123")
+
+    def import_csv(self, inventory):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name) / "catalogo.csv"
+        path.write_text(
+            "sku,name,category,price,inventory\n"
+            f"P-1,Polera,Ropa,5000,{inventory}\n")
+        call_command(
+            "import_catalog", str(path), store=self.store.slug,
+            stdout=StringIO())
+
+    def test_sizes_are_imported(self):
+        self.import_csv("M:3|XL:1")
+        product = Product.objects.get(sku="P-1")
+        self.assertEqual(
+            dict(ProductInventory.objects.filter(product=product)
+                 .values_list("size__size_name", "stock")),
+            {"M": 3, "XL": 1})
+
+    def test_too_long_size_is_rejected(self):
+        with self.assertRaisesMessage(CommandError, "Línea 2: Size.size_name"):
+            self.import_csv("Talla Única Grande:3")
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(Size.objects.exists())
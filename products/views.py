@@ -20,7 +20,9 @@ from .serializers import (
     SizeSerializer
 )
 
+from conf.filters import OwnerStoreFilterBackend
 from conf.permissions import IsOwnerByGUIDOrAdminForRestApp
+from images.utils import release_assets
 from logs.utils import create_log
 
 
@@ -181,6 +183,10 @@ class ProductViewSet(PublicReadOnly):
         'inventory', 'tags', 'category'
     )
     serializer_class = ProductSerializer
+    # la lectura es pública, al modificar solo se buscan los
+    # productos de la tienda del usuario
+    filter_backends = [OwnerStoreFilterBackend]
+    owner_actions = ['update', 'partial_update', 'destroy']
 
     def perform_log(self, action, message, instance=None):
         """Crea un log asociado al usuario y producto"""
@@ -224,6 +230,12 @@ class ProductViewSet(PublicReadOnly):
                          instance=instance)
         return super().destroy(request, *args, **kwargs)
 
+    def perform_destroy(self, instance):
+        image_urls = list(instance.image_urls)
+        instance.delete()
+        # las imagenes compartidas con otros productos se mantienen
+        release_assets(image_urls)
+
 
 # Category ViewSet
 class CategoryViewSet(PublicReadOnly):
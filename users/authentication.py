@@ -0,0 +1,77 @@
+"""
+Autenticación JWT con el usuario en cache.
+JWTAuthentication busca al usuario por guid en cada request, los
+paneles de las tiendas consultan las ordenes seguido así que el
+usuario se guarda en el cache por JWT_USER_CACHE_TTL segundos.
+La llave incluye una versión por usuario que se incrementa al
+guardarlo (edición, desactivación, cambio de contraseña), las
+entradas anteriores quedan huérfanas y expiran solas.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed,
+    InvalidToken,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def version_key(guid):
+    return f"auth:user-version:{guid}"
+
+
+def user_key(guid, version):
+    return f"auth:user:{guid}:{version}"
+
+
+def invalidate_user_cache(guid):
+    """descarta el usuario cacheado subiendo su versión"""
+    key = version_key(guid)
+    # add no pisa una versión existente, dos invalidaciones
+    # simultáneas terminan en 2 y no en 1
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # la llave se perdió (ej: eviction) entre add e incr
+        cache.add(key, 1, None)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication que busca al usuario primero en el cache y
+    solo consulta la base de datos si no está.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            guid = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification"))
+
+        # la versión se lee antes que la base de datos, si el usuario
+        # cambia entre medio el valor antiguo queda en una llave
+        # que ya no se usa
+        version = cache.get(version_key(guid), 0)
+        key = user_key(guid, version)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(key, user, settings.JWT_USER_CACHE_TTL)
+            return user
+
+        # las mismas revisiones que hace simplejwt con la base de datos
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(
+                _("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) \
+                    != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."),
+                    code="password_changed")
+        return user
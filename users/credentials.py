@@ -0,0 +1,91 @@
+"""
+Códigos temporales del login (código de sesión y OTP) guardados en
+Redis con TTL nativo, en lugar de escribirlos en la fila del usuario.
+La verificación final compara y borra ambos códigos en un solo paso
+atómico (script Lua), así un código no se puede usar dos veces.
+"""
+from django.core.cache import cache
+from django_redis import get_redis_connection
+
+SESSION_CODE_TTL = 3 * 60
+OTP_TTL = 2 * 60
+
+# borra ambas llaves solo si las dos tienen el valor esperado
+CONSUME_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1]
+        and redis.call('GET', KEYS[2]) == ARGV[2] then
+    return redis.call('DEL', KEYS[1], KEYS[2])
+end
+return 0
+"""
+
+
+def session_key(guid):
+    return f"login:session:{guid}"
+
+
+def otp_key(guid):
+    return f"login:otp:{guid}"
+
+
+def get_connection():
+    """cliente de Redis, None si el cache no es django-redis"""
+    try:
+        return get_redis_connection("default")
+    except NotImplementedError:
+        return None
+
+
+def store_code(key, code, ttl):
+    conn = get_connection()
+    if conn is None:
+        cache.set(key, str(code), ttl)
+    else:
+        # llave con el mismo prefijo que usa el cache
+        conn.set(cache.make_key(key), str(code), ex=ttl)
+
+
+def read_code(key):
+    conn = get_connection()
+    if conn is None:
+        return cache.get(key)
+    value = conn.get(cache.make_key(key))
+    return value.decode() if value is not None else None
+
+
+def store_session_code(guid, code):
+    """código del paso 1 del login, válido por 3 minutos"""
+    store_code(session_key(guid), code, SESSION_CODE_TTL)
+
+
+def store_otp(guid, code):
+    """código enviado por sms, válido por 2 minutos"""
+    store_code(otp_key(guid), code, OTP_TTL)
+
+
+def session_code_matches(guid, code):
+    return code is not None and read_code(session_key(guid)) == str(code)
+
+
+def otp_matches(guid, code):
+    return code is not None and read_code(otp_key(guid)) == str(code)
+
+
+def consume_login_codes(guid, otp_code, session_code):
+    """
+    Verifica y borra el OTP y el código de sesión a la vez.
+    Retorna False si alguno no coincide, expiró o ya se usó.
+    """
+    conn = get_connection()
+    if conn is None:
+        # sin Redis no es atómico, solo para desarrollo
+        if not (otp_matches(guid, otp_code)
+                and session_code_matches(guid, session_code)):
+            return False
+        cache.delete_many([otp_key(guid), session_key(guid)])
+        return True
+
+    return bool(conn.eval(
+        CONSUME_SCRIPT, 2,
+        cache.make_key(otp_key(guid)), cache.make_key(session_key(guid)),
+        str(otp_code), str(session_code)))
@@ -0,0 +1,68 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.credentials import get_connection
+from users.sms import get_provider, pop_sms, schedule_retry
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Worker que envía los SMS encolados con users.sms.enqueue_sms.
+    Usa un solo proveedor (y cliente HTTP) durante todo el proceso,
+    se pueden correr varios workers. Un SMS que falla se reintenta
+    con espera exponencial hasta --max-attempts veces o hasta que
+    expire.
+    """
+
+    help = "Envía los SMS pendientes de la cola"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-attempts', type=int, default=5,
+            help="Intentos antes de abandonar un SMS")
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Envía lo pendiente y termina")
+        parser.add_argument(
+            '--timeout', type=int, default=5,
+            help="Segundos de espera cuando la cola está vacía")
+
+    def handle(self, *args, **options):
+        conn = get_connection()
+        if conn is None:
+            raise CommandError(
+                "La cola de SMS necesita el cache de Redis")
+
+        provider = get_provider()
+        max_attempts = options['max_attempts']
+
+        while True:
+            message = pop_sms(conn, options['timeout'])
+            if message is None:
+                if options['once']:
+                    break
+                continue
+
+            if message["expires_at"] and message["expires_at"] < time.time():
+                logger.info("SMS a %s expirado", message["to"])
+                continue
+
+            try:
+                provider.send(message["to"], message["body"])
+            except Exception as e:
+                message["attempts"] += 1
+                logger.warning(
+                    "No se pudo enviar el SMS a %s: %r", message["to"], e)
+                if message["attempts"] < max_attempts:
+                    # los OTP duran pocos minutos, la espera es corta
+                    schedule_retry(
+                        conn, message, min(2 ** message["attempts"], 30))
+                continue
+
+            self.stdout.write(f"SMS enviado a {message['to']}")
+            if options['verbosity'] > 1:
+                self.stdout.write(message["body"])
@@ -0,0 +1,54 @@
+# Generated by Django 6.1.2 on 2026-10-19 12:35
+
+import django.utils.timezone
+import users.models
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomUser',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('is_superuser', models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status')),
+                ('first_name', models.CharField(blank=True, max_length=150, verbose_name='first name')),
+                ('last_name', models.CharField(blank=True, max_length=150, verbose_name='last name')),
+                ('is_staff', models.BooleanField(default=False, help_text='Designates whether the user can log into this admin site.', verbose_name='staff status')),
+                ('is_active', models.BooleanField(default=True, help_text='Designates whether this user should be treated as active. Unselect this instead of deleting accounts.', verbose_name='active')),
+                ('date_joined', models.DateTimeField(default=django.utils.timezone.now, verbose_name='date joined')),
+                ('guid', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('store_name', models.CharField(unique=True)),
+                ('slug', models.SlugField(default='')),
+                ('email', models.EmailField(max_length=254, unique=True, verbose_name='email address')),
+                ('phone_number', models.CharField(max_length=15, unique=True)),
+                ('store_logo_url', models.URLField(blank=True, max_length=500, null=True)),
+                ('is_2fa_enabled', models.BooleanField(default=True)),
+                ('current_otp', models.CharField(blank=True, max_length=6, null=True)),
+                ('code_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('last_2fa_verified_at', models.DateTimeField(blank=True, null=True)),
+                ('login_session_code', models.CharField(blank=True, max_length=6, null=True)),
+                ('login_session_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('groups', models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.group', verbose_name='groups')),
+                ('user_permissions', models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.permission', verbose_name='user permissions')),
+            ],
+            options={
+                'verbose_name': 'user',
+                'verbose_name_plural': 'users',
+                'abstract': False,
+            },
+            managers=[
+                ('objects', users.models.UserManager()),
+            ],
+        ),
+    ]
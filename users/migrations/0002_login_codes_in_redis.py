@@ -0,0 +1,56 @@
+# Generated by Django 6.1.2 on 2026-10-19 12:35
+
+from django.db import migrations, models
+
+
+def dedupe_slugs(apps, schema_editor):
+    """
+    slug pasa a ser único, las tiendas que quedaron con el mismo slug
+    (dos registros simultáneos) toman el primer slug-N libre
+    """
+    CustomUser = apps.get_model('users', 'CustomUser')
+    taken = set(CustomUser.objects.values_list('slug', flat=True))
+    seen = set()
+    for user_id, slug in CustomUser.objects.order_by('id').values_list(
+            'id', 'slug'):
+        if slug not in seen:
+            seen.add(slug)
+            continue
+        counter = 1
+        while f"{slug}-{counter}" in taken:
+            counter += 1
+        taken.add(f"{slug}-{counter}")
+        CustomUser.objects.filter(pk=user_id).update(
+            slug=f"{slug}-{counter}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='customuser',
+            name='code_expires_at',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='current_otp',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='login_session_code',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='login_session_expires_at',
+        ),
+        migrations.RunPython(dedupe_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='customuser',
+            name='slug',
+            field=models.SlugField(default='', unique=True),
+        ),
+    ]
@@ -1,9 +1,13 @@
 import uuid
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Q
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
-from django.utils import timezone
+
+from conf.mixins import DirtyFieldsMixin
+from users import credentials
+from users.authentication import invalidate_user_cache
 
 class UserManager(BaseUserManager):
     use_in_migrations = True
@@ -44,31 +48,25 @@ class UserManager(BaseUserManager):
             email, phone_number, store_name, password, **extra_fields)
 
 
-class CustomUser(AbstractUser):
+class CustomUser(DirtyFieldsMixin, AbstractUser):
     """Usuario personalizado para el proyecto"""
     guid = models.UUIDField(
         default=uuid.uuid4, unique=True, editable=False)
 
     username = None  # No usamos username
     store_name = models.CharField(blank=False, null=False, unique=True)
-    slug = models.SlugField(default="", null=False)
+    slug = models.SlugField(default="", null=False, unique=True)
     email = models.EmailField(_('email address'), unique=True)
     phone_number = models.CharField(max_length=15, unique=True)
     #profile picture
     store_logo_url = models.URLField(
         max_length=500, null=True, blank=True)
 
-    # 2FA vía SMS para entregar el token
+    # 2FA vía SMS para entregar el token, el OTP y el codigo de
+    # sesión del login viven en Redis (ver users/credentials.py)
     is_2fa_enabled = models.BooleanField(default=True)
-    current_otp = models.CharField(max_length=6, blank=True, null=True)
-    code_expires_at = models.DateTimeField(blank=True, null=True)
     last_2fa_verified_at = models.DateTimeField(blank=True, null=True)
 
-    #codigo para el login para que junto a otp validen y den el token
-    login_session_code = models.CharField(
-        max_length=6, blank=True, null=True)
-    login_session_expires_at = models.DateTimeField(blank=True, null=True)
-
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['phone_number', 'store_name']
 
@@ -78,37 +76,75 @@ class CustomUser(AbstractUser):
         """Guarda usuario y genera slug"""
         # Solo genera/actualiza el slug si el store_name cambia
         # o si el slug está vacío (nueva instancia)
-        if not self.slug or (
-                self.pk 
-                and CustomUser.objects.get(pk=self.pk).store_name 
-                != self.store_name):
-            
-            base_slug = slugify(self.store_name)
-            self.slug = base_slug
-            counter = 1
-            # Se asegura que el slug sea unico
-            while CustomUser.objects.filter(
-                slug=self.slug).exclude(pk=self.pk).exists():
-
-                self.slug = f"{base_slug}-{counter}"
-                counter += 1
-        super().save(*args, **kwargs)
+        # el mixin guarda el store_name con que se cargó el usuario
+        dirty = self.get_dirty_fields()
+        if self.slug and (dirty is None or 'store_name' not in dirty):
+            super().save(*args, **kwargs)
+            self.invalidate_cache()
+            return
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'slug'}
+
+        # el unique de slug resuelve las carreras entre dos usuarios
+        # que toman el mismo slug, se reintenta con el siguiente libre
+        for attempt in range(3):
+            self.slug = self.next_free_slug()
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                break
+            except IntegrityError:
+                taken = CustomUser.objects.filter(
+                    slug=self.slug).exclude(pk=self.pk).exists()
+                if not taken or attempt == 2:
+                    raise
+        self.invalidate_cache()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.invalidate_cache()
+        return result
+
+    def invalidate_cache(self):
+        """
+        Descarta el usuario cacheado por la autenticación una vez
+        confirmada la transacción, antes de eso otro request podría
+        volver a cachear la fila antigua
+        """
+        guid = self.guid
+        transaction.on_commit(lambda: invalidate_user_cache(guid))
+
+    def next_free_slug(self):
+        """
+        Slug del store_name, si está ocupado el primer slug-N libre.
+        Trae todos los slug y slug-N existentes en una sola consulta.
+        """
+        base_slug = slugify(self.store_name)
+        taken = set(
+            CustomUser.objects.filter(
+                Q(slug=base_slug) | Q(slug__startswith=f"{base_slug}-")
+            ).exclude(pk=self.pk).values_list('slug', flat=True))
+        if base_slug not in taken:
+            return base_slug
+
+        suffixes = {
+            int(slug[len(base_slug) + 1:]) for slug in taken
+            if slug[len(base_slug) + 1:].isdigit()
+        }
+        counter = 1
+        while counter in suffixes:
+            counter += 1
+        return f"{base_slug}-{counter}"
 
     def __str__(self):
         return self.store_name
 
     def has_valid_otp(self, code):
         """Valida el codigo del sms para generar el token"""
-        return (
-            self.current_otp == code and
-            self.code_expires_at and
-            timezone.now() < self.code_expires_at
-        )
+        return credentials.otp_matches(self.guid, code)
     
     def has_valid_session_token(self, code):
         """Valida el codigo de sesión para mandar el sms"""
-        return (
-            self.login_session_code == code and
-            self.login_session_expires_at and
-            timezone.now() < self.login_session_expires_at
-        )
+        return credentials.session_code_matches(self.guid, code)
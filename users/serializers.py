@@ -1,9 +1,9 @@
 import phonenumbers
-import cloudinary.uploader
 
 from rest_framework import serializers
 from users.models import CustomUser
-from conf.manejo_imagenes import procesar_imagen
+from conf.ingesta import ImagenField
+from images.utils import acquire_asset, release_assets
 from logs.utils import create_log
 
 class SendOTPSerializer(serializers.Serializer):
@@ -42,11 +42,16 @@ class SendOTPSerializer(serializers.Serializer):
 class UserLoginSerializer(serializers.ModelSerializer):
     """Valida que el correo y la contraseña sean correctas"""
     phone_number = serializers.SerializerMethodField()
+    # el codigo se genera en LoginView y no se guarda en el usuario
+    login_session_code = serializers.SerializerMethodField()
 
     class Meta:
         model = CustomUser
         fields = ['guid', 'phone_number', 'login_session_code']
 
+    def get_login_session_code(self, obj):
+        return self.context.get('login_session_code')
+
     def get_phone_number(self, obj):
         if not obj.phone_number:
             return None
@@ -94,7 +99,7 @@ class UserSerializer(serializers.ModelSerializer):
 
 class UserUpdateSerializer(serializers.ModelSerializer):
     """Actualiza el usuario sin modificar el password"""
-    store_logo_url = serializers.ImageField(required=True)
+    store_logo_url = ImagenField("logo", required=True)
 
     class Meta:
         model = CustomUser
@@ -105,20 +110,14 @@ class UserUpdateSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         #procesa imagen a logo
         # Si el usuario envía un logo
+        old_logo = None
         if validated_data.get("store_logo_url"):
-            processed_img = procesar_imagen(
-                validated_data.get("store_logo_url"), 
-                f"Store-logo", 
-                "logo")
-
-            # Subir a Cloudinary
-            result = cloudinary.uploader.upload(
-                processed_img, 
-                folder=f"users/{instance.guid}/logo/",
-                public_id=f"Store-logo",
-                overwrite=True)
-                
-            instance.store_logo_url = result["secure_url"]
+            # un logo ya subido antes (por cualquier tienda) no se
+            # vuelve a procesar ni a subir
+            asset = acquire_asset(
+                validated_data.get("store_logo_url"), "logo")
+            old_logo = instance.store_logo_url
+            instance.store_logo_url = asset.url
 
         instance.first_name = validated_data.get("first_name")
         instance.last_name = validated_data.get("last_name")
@@ -127,6 +126,10 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         instance.email = validated_data.get("email")
         instance.save()
 
+        # el logo anterior se borra si ya nadie lo usa
+        if old_logo:
+            release_assets([old_logo])
+
         return instance
 
 
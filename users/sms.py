@@ -0,0 +1,128 @@
+"""
+Envío de SMS.
+Los mensajes no se envían en el request, enqueue_sms los deja en una
+lista de Redis y el comando send_sms los envía con un proveedor que
+vive todo el proceso (un solo cliente HTTP con conexiones reusadas).
+Los que fallan pasan a un sorted set con la hora del siguiente
+intento, los que expiran (ej: un OTP vencido) se descartan.
+"""
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+from users.credentials import get_connection
+
+logger = logging.getLogger(__name__)
+
+SMS_QUEUE = "sms:queue"
+SMS_RETRY = "sms:retry"
+
+_providers = {}
+
+
+class BaseSMSProvider:
+    """Interfaz de un proveedor de SMS"""
+    name = None
+
+    def send(self, to, body):
+        """envía el mensaje, lanza una excepción si falla"""
+        raise NotImplementedError
+
+
+class TwilioProvider(BaseSMSProvider):
+    """
+    Twilio con un solo Client por proceso, su TwilioHttpClient
+    mantiene una sesión de requests con las conexiones abiertas
+    """
+    name = "twilio"
+
+    def __init__(self):
+        from twilio.http.http_client import TwilioHttpClient
+        from twilio.rest import Client
+
+        self.client = Client(
+            settings.TWILIO_ACCOUNT_SID,
+            settings.TWILIO_AUTH_TOKEN,
+            http_client=TwilioHttpClient(
+                pool_connections=True, timeout=10))
+
+    def send(self, to, body):
+        self.client.messages.create(
+            body=body, from_=settings.TWILIO_PHONE_NUMBER, to=to)
+
+
+class FakeProvider(BaseSMSProvider):
+    """
+    Proveedor local, solo se registra con DEBUG o en los tests.
+    No envía nada, guarda los mensajes en outbox y en el log deja
+    solo el destino. El cuerpo (con el OTP) va en nivel DEBUG.
+    """
+    name = "fake"
+    outbox = []
+
+    def send(self, to, body):
+        self.outbox.append({"to": to, "body": body})
+        logger.info("SMS a %s", to)
+        logger.debug("SMS a %s: %s", to, body)
+
+
+def get_provider(name=None):
+    """
+    Retorna el proveedor configurado en SMS_PROVIDERS, se crea una
+    vez por proceso. Lanza KeyError si no existe.
+    """
+    name = name or settings.SMS_DEFAULT_PROVIDER
+    if name not in _providers:
+        _providers[name] = import_string(settings.SMS_PROVIDERS[name])()
+    return _providers[name]
+
+
+def enqueue_sms(to, body, ttl=None):
+    """
+    Deja el mensaje en la cola, ttl en segundos descarta el mensaje
+    si no se alcanzó a enviar.
+    Sin Redis (cache local en desarrollo) se envía en el momento.
+    """
+    conn = get_connection()
+    if conn is None:
+        get_provider().send(to, body)
+        return
+
+    message = {
+        "to": to,
+        "body": body,
+        "attempts": 0,
+        "expires_at": time.time() + ttl if ttl else None,
+    }
+    conn.lpush(cache.make_key(SMS_QUEUE), json.dumps(message))
+
+
+def pop_sms(conn, timeout):
+    """
+    Siguiente mensaje de la cola, espera hasta timeout segundos.
+    Antes devuelve a la cola los reintentos que ya tocan.
+    """
+    requeue_due(conn)
+    item = conn.brpop(cache.make_key(SMS_QUEUE), timeout=timeout)
+    if item is None:
+        return None
+    return json.loads(item[1])
+
+
+def requeue_due(conn):
+    """mueve a la cola los reintentos cuya hora ya pasó"""
+    retry_key = cache.make_key(SMS_RETRY)
+    for raw in conn.zrangebyscore(retry_key, 0, time.time()):
+        # con varios workers solo el que lo saca lo vuelve a encolar
+        if conn.zrem(retry_key, raw):
+            conn.lpush(cache.make_key(SMS_QUEUE), raw)
+
+
+def schedule_retry(conn, message, delay):
+    conn.zadd(
+        cache.make_key(SMS_RETRY),
+        {json.dumps(message): time.time() + delay})
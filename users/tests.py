@@ -1,3 +1,385 @@
-from django.test import TestCase
+import json
+import re
+import time
+import unittest
+import uuid
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users import credentials
+from users.authentication import (
+    CachedJWTAuthentication, invalidate_user_cache, version_key)
+from users.models import CustomUser
+from users.sms import SMS_QUEUE, SMS_RETRY, FakeProvider, enqueue_sms
+from users.utils import LOCKOUT_KEY
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+def updated_columns(sql):
+    """columnas del SET de un UPDATE"""
+    set_clause = sql.split(" SET ", 1)[1].split(" WHERE ", 1)[0]
+    return re.findall(r'"(\w+)" = ', set_clause)
+
+
+class DirtyFieldsSaveTests(TestCase):
+    """save() de CustomUser escribe solo las columnas que cambiaron"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            "dueno@example.com", "Tienda Test", "+56911111111",
+            password="clave-segura-123")
+
+    def test_unchanged_save_runs_no_queries(self):
+        user = CustomUser.objects.get(pk=self.user.pk)
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        self.assertEqual(len(queries), 0)
+
+    def test_changed_field_updates_only_that_column(self):
+        user = CustomUser.objects.get(pk=self.user.pk)
+        user.first_name = "Nueva"
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]["sql"]
+        self.assertTrue(sql.startswith("UPDATE"))
+        self.assertEqual(updated_columns(sql), ["first_name"])
+
+    def test_store_name_change_updates_slug(self):
+        user = CustomUser.objects.get(pk=self.user.pk)
+        user.store_name = "Otra Tienda"
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        updates = [q["sql"] for q in queries
+                   if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(
+            sorted(updated_columns(updates[0])), ["slug", "store_name"])
+        self.assertEqual(
+            CustomUser.objects.get(pk=user.pk).slug, "otra-tienda")
+
+
+# hasher rápido, el tiempo medido es el de la vista
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class FailedAttemptLockoutTests(TestCase):
+    """
+    Un login fallido responde de inmediato y bloquea al cliente,
+    ningún request queda esperando en el worker
+    """
+
+    def setUp(self):
+        # los throttles y bloqueos viven en el cache
+        cache.clear()
+        self.client = APIClient()
+
+    def login(self, ip="10.0.0.1"):
+        return self.client.post(
+            "/api/users/login/",
+            {"email": "nadie@example.com", "password": "incorrecta"},
+            format="json", REMOTE_ADDR=ip)
+
+    def test_failed_logins_do_not_wait(self):
+        start = time.monotonic()
+        for i in range(20):
+            self.assertEqual(self.login(ip=f"10.0.1.{i}").status_code, 401)
+        # cada uno esperaba entre 4 y 10 segundos en el worker
+        self.assertLess(time.monotonic() - start, 2)
+
+    def test_locked_client_gets_429_without_reaching_the_view(self):
+        self.assertEqual(self.login().status_code, 401)
+        with mock.patch("users.views.authenticate") as authenticate:
+            start = time.monotonic()
+            for _ in range(10):
+                response = self.login()
+                self.assertEqual(response.status_code, 429)
+            self.assertLess(time.monotonic() - start, 1)
+        authenticate.assert_not_called()
+        self.assertGreater(int(response["Retry-After"]), 0)
+
+    def test_other_clients_are_not_locked(self):
+        self.login()
+        self.assertEqual(self.login(ip="10.0.0.2").status_code, 401)
+
+    def test_lockout_expires(self):
+        self.login()
+        cache.set(LOCKOUT_KEY.format("10.0.0.1"), time.time() - 1)
+        self.assertEqual(self.login().status_code, 401)
+
+
+class ConsumeLoginCodesTests(TestCase):
+    """
+    el OTP y el código de sesión se usan una sola vez. Corre contra el
+    cache configurado (el script Lua si es django-redis)
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.guid = uuid.uuid4()
+        credentials.store_otp(self.guid, 123456)
+        credentials.store_session_code(self.guid, "abc")
+
+    def test_codes_are_consumed_once(self):
+        self.assertTrue(
+            credentials.consume_login_codes(self.guid, "123456", "abc"))
+        self.assertFalse(
+            credentials.consume_login_codes(self.guid, "123456", "abc"))
+
+    def test_wrong_otp_keeps_both_codes(self):
+        self.assertFalse(
+            credentials.consume_login_codes(self.guid, "000000", "abc"))
+        self.assertTrue(credentials.otp_matches(self.guid, "123456"))
+        self.assertTrue(credentials.session_code_matches(self.guid, "abc"))
+
+    def test_wrong_session_code_keeps_both_codes(self):
+        self.assertFalse(
+            credentials.consume_login_codes(self.guid, "123456", "otro"))
+        self.assertTrue(credentials.otp_matches(self.guid, "123456"))
+
+    def test_expired_otp_is_rejected(self):
+        cache.delete(credentials.otp_key(self.guid))
+        conn = credentials.get_connection()
+        if conn is not None:
+            conn.delete(cache.make_key(credentials.otp_key(self.guid)))
+        self.assertFalse(
+            credentials.consume_login_codes(self.guid, "123456", "abc"))
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis no está instalado")
+class ConsumeLoginCodesLuaTests(ConsumeLoginCodesTests):
+    """los mismos casos con el script Lua sobre fakeredis"""
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        connection = mock.patch(
+            "users.credentials.get_connection", return_value=self.redis)
+        connection.start()
+        self.addCleanup(connection.stop)
+        super().setUp()
+
+    def test_codes_are_stored_with_ttl(self):
+        key = cache.make_key(credentials.otp_key(self.guid))
+        self.assertEqual(self.redis.get(key), b"123456")
+        self.assertLessEqual(self.redis.ttl(key), credentials.OTP_TTL)
+        self.assertGreater(self.redis.ttl(key), 0)
+
+
+class NextFreeSlugTests(TestCase):
+    """
+    el slug de la tienda toma el primer sufijo libre. store_name es
+    único, los choques vienen de nombres con el mismo slugify
+    """
+
+    names = ["Tienda Test", "tienda test", "Tienda-Test", "TIENDA TEST!"]
+
+    def setUp(self):
+        self.created = 0
+
+    def create_user(self, store_name):
+        index = self.created = self.created + 1
+        return CustomUser.objects.create_user(
+            f"tienda{index}@example.com", store_name, f"+5691111111{index}",
+            password="clave-segura-123")
+
+    def test_first_store_gets_plain_slug(self):
+        self.assertEqual(self.create_user("Tienda Test").slug, "tienda-test")
+
+    def test_collisions_take_the_first_free_suffix(self):
+        slugs = [self.create_user(name).slug for name in self.names[:3]]
+        self.assertEqual(
+            slugs, ["tienda-test", "tienda-test-1", "tienda-test-2"])
+
+    def test_freed_suffix_is_reused(self):
+        self.create_user(self.names[0])
+        freed = self.create_user(self.names[1])
+        self.create_user(self.names[2])
+        freed.delete()
+        self.assertEqual(
+            self.create_user(self.names[3]).slug, "tienda-test-1")
+
+    def test_other_slugs_with_the_prefix_are_ignored(self):
+        self.create_user("Tienda Test")
+        self.create_user("Tienda Test Norte")
+        self.assertEqual(self.create_user("tienda test").slug, "tienda-test-1")
+
+    def test_resave_keeps_own_slug(self):
+        user = self.create_user("Tienda Test")
+        user.store_name = "TIENDA test"
+        user.save()
+        self.assertEqual(user.slug, "tienda-test")
+
+    def test_slug_taken_concurrently_is_retried(self):
+        self.create_user("Tienda Test")
+        user = CustomUser(
+            email="otro@example.com", store_name="tienda test",
+            phone_number="+56911111119")
+        # otro request tomó el slug entre la consulta y el INSERT
+        with mock.patch.object(
+                CustomUser, "next_free_slug", autospec=True,
+                side_effect=["tienda-test", "tienda-test-1"]):
+            user.save()
+        self.assertEqual(user.slug, "tienda-test-1")
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    """el usuario cacheado se descarta al confirmar sus cambios"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            "dueno@example.com", "Tienda Test", "+56911111111",
+            password="clave-segura-123")
+
+    def setUp(self):
+        cache.clear()
+        self.auth = CachedJWTAuthentication()
+        self.token = AccessToken.for_user(self.user)
+
+    def test_second_lookup_uses_the_cache(self):
+        self.auth.get_user(self.token)
+        with CaptureQueriesContext(connection) as queries:
+            user = self.auth.get_user(self.token)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_cache_is_invalidated_only_on_commit(self):
+        self.auth.get_user(self.token)
+        user = CustomUser.objects.get(pk=self.user.pk)
+        user.first_name = "Nueva"
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            user.save()
+        # antes del commit se sigue usando la fila cacheada
+        self.assertEqual(self.auth.get_user(self.token).first_name, "")
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(
+            self.auth.get_user(self.token).first_name, "Nueva")
+
+    def test_rolled_back_save_keeps_the_cache(self):
+        self.auth.get_user(self.token)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    user = CustomUser.objects.get(pk=self.user.pk)
+                    user.first_name = "Nueva"
+                    user.save()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertIsNone(cache.get(version_key(self.user.guid)))
+
+    def test_deactivated_user_is_rejected(self):
+        self.auth.get_user(self.token)
+        user = CustomUser.objects.get(pk=self.user.pk)
+        user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.get_user(self.token)
+
+    def test_invalidations_bump_the_version(self):
+        invalidate_user_cache(self.user.guid)
+        invalidate_user_cache(self.user.guid)
+        self.assertEqual(cache.get(version_key(self.user.guid)), 2)
+
+
+class EnqueueSMSWithoutRedisTests(TestCase):
+    """sin Redis (desarrollo) el SMS se envía en el momento"""
+
+    def setUp(self):
+        FakeProvider.outbox.clear()
+
+    def test_message_is_sent_right_away(self):
+        with mock.patch(
+                "users.sms.get_connection", return_value=None):
+            enqueue_sms("+56911111111", "Código 123456", ttl=60)
+        self.assertEqual(
+            FakeProvider.outbox,
+            [{"to": "+56911111111", "body": "Código 123456"}])
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis no está instalado")
+class SendSMSTests(TestCase):
+    """enqueue_sms deja el mensaje en Redis y send_sms lo envía"""
+
+    def setUp(self):
+        FakeProvider.outbox.clear()
+        self.redis = fakeredis.FakeRedis()
+        for target in ("users.sms.get_connection",
+                       "users.management.commands.send_sms.get_connection"):
+            patcher = mock.patch(target, return_value=self.redis)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def send(self, **options):
+        call_command(
+            "send_sms", once=True, timeout=1, stdout=mock.Mock(), **options)
+
+    def retries(self):
+        return self.redis.zrange(cache.make_key(SMS_RETRY), 0, -1)
+
+    def test_message_waits_in_the_queue(self):
+        enqueue_sms("+56911111111", "Código 123456", ttl=60)
+        self.assertEqual(FakeProvider.outbox, [])
+        self.assertEqual(self.redis.llen(cache.make_key(SMS_QUEUE)), 1)
+
+        self.send()
+        self.assertEqual(
+            FakeProvider.outbox,
+            [{"to": "+56911111111", "body": "Código 123456"}])
+        self.assertEqual(self.redis.llen(cache.make_key(SMS_QUEUE)), 0)
+
+    def test_expired_message_is_dropped(self):
+        enqueue_sms("+56911111111", "Código 123456", ttl=60)
+        with mock.patch("time.time", return_value=time.time() + 61):
+            self.send()
+        self.assertEqual(FakeProvider.outbox, [])
+        self.assertEqual(self.retries(), [])
+
+    def test_failed_message_is_retried_later(self):
+        enqueue_sms("+56911111111", "Código 123456")
+        with mock.patch.object(
+                FakeProvider, "send", side_effect=ConnectionError), \
+                self.assertLogs("users.management.commands.send_sms",
+                                "WARNING"):
+            self.send()
+
+        retries = self.retries()
+        self.assertEqual(len(retries), 1)
+        self.assertEqual(json.loads(retries[0])["attempts"], 1)
+
+        # la espera (2 segundos) aún no termina
+        self.send()
+        self.assertEqual(FakeProvider.outbox, [])
+
+        with mock.patch("time.time", return_value=time.time() + 3):
+            self.send()
+        self.assertEqual(len(FakeProvider.outbox), 1)
+        self.assertEqual(self.retries(), [])
+
+    def test_message_is_abandoned_after_max_attempts(self):
+        enqueue_sms("+56911111111", "Código 123456")
+        with mock.patch.object(
+                FakeProvider, "send", side_effect=ConnectionError), \
+                self.assertLogs("users.management.commands.send_sms",
+                                "WARNING"):
+            self.send(max_attempts=1)
+        self.assertEqual(self.retries(), [])
+        self.assertEqual(self.redis.llen(cache.make_key(SMS_QUEUE)), 0)
 
-# Create your tests here.
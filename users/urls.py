@@ -6,14 +6,18 @@ from users.views import (LoginView,
                          VerificarOTPView,
                          UserViewSet,
                          ChangePasswordView)
+from users.utils import failed_attempt_lockout
 
 router = DefaultRouter()
 router.register(r'user-admin', UserViewSet, basename='user-admin')
 
 urlpatterns = [
-    path('login/', LoginView.as_view(), name='login'),
-    path('send-otp/', SendOTPView.as_view(), name='send-otp'),
-    path('verify-otp/', VerificarOTPView.as_view()),
+    # un intento fallido bloquea al cliente unos segundos (429)
+    path('login/', failed_attempt_lockout(LoginView.as_view()), name='login'),
+    path('send-otp/', 
+         failed_attempt_lockout(SendOTPView.as_view()), 
+         name='send-otp'),
+    path('verify-otp/', failed_attempt_lockout(VerificarOTPView.as_view())),
     path('user-admin/<int:id>/change-password/', 
          ChangePasswordView.as_view(), 
          name='change-password'),
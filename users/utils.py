@@ -0,0 +1,59 @@
+import functools
+import math
+import random
+import time
+
+from django.core.cache import cache
+from django.http import JsonResponse
+from rest_framework.throttling import AnonRateThrottle
+
+# segundos que un cliente queda bloqueado tras un intento fallido
+# (anti fuerza bruta y enumeración)
+FAILED_ATTEMPT_LOCKOUT = (4, 10)
+
+LOCKOUT_KEY = "login:lockout:{}"
+
+
+def failed_attempt(response):
+    """
+    Marca la respuesta de un intento fallido para que
+    failed_attempt_lockout bloquee al cliente.
+    """
+    response.failed_attempt_lockout = random.randint(*FAILED_ATTEMPT_LOCKOUT)
+    return response
+
+
+def client_ident(request):
+    """IP del cliente, la misma que usan los throttles de DRF"""
+    return AnonRateThrottle().get_ident(request)
+
+
+def failed_attempt_lockout(view):
+    """
+    Envuelve una vista (ej: LoginView.as_view()). Tras un intento
+    fallido la respuesta sale de inmediato y el cliente queda
+    bloqueado unos segundos en Redis, sus intentos durante el bloqueo
+    responden 429 sin llegar a la vista. Ningún worker queda
+    esperando, con WSGI o ASGI.
+    """
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = LOCKOUT_KEY.format(client_ident(request))
+        now = time.time()
+        locked_until = cache.get(key)
+        if locked_until and locked_until > now:
+            response = JsonResponse(
+                {"detail": "Demasiados intentos, espere unos segundos",
+                 "code": "too_many_attempts"},
+                status=429)
+            response["Retry-After"] = str(math.ceil(locked_until - now))
+            return response
+
+        response = view(request, *args, **kwargs)
+        lockout = getattr(response, "failed_attempt_lockout", None)
+        if lockout:
+            cache.set(key, now + lockout, lockout)
+        return response
+
+    return wrapper
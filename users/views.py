@@ -1,11 +1,7 @@
 # users/views.py
 import random
-import datetime
-from time import sleep
+import secrets
 
-from twilio.rest import Client
-
-from django.conf import settings
 from django.utils import timezone
 from django.contrib.auth import authenticate
 
@@ -24,6 +20,9 @@ from users.serializers import (UserLoginSerializer,
                                UserUpdateSerializer,
                                ChangePasswordSerializer)
 from users.models import CustomUser
+from users.utils import failed_attempt
+from users import credentials
+from users.sms import enqueue_sms
 
 from logs.utils import create_log
 
@@ -76,26 +75,22 @@ class LoginView(APIView):
         user = authenticate(request, email=email, password=password)
 
         if user is None:
-            sleep(random.randint(4, 10))
-            return Response(
+            return failed_attempt(Response(
                 {"detail": "Credenciales inválidas"}, 
-                status=status.HTTP_401_UNAUTHORIZED)
+                status=status.HTTP_401_UNAUTHORIZED))
 
         if not user.is_active:
-            sleep(random.randint(4, 10))
-            return Response(
+            return failed_attempt(Response(
                 {"detail": "Cuenta desactivada"}, 
-                status=status.HTTP_403_FORBIDDEN)
+                status=status.HTTP_403_FORBIDDEN))
 
-        # Generar token temporal de 6 dígitos
+        # Generar token temporal de 6 dígitos, queda en Redis
         session_code = str(random.randint(100000, 999999))
-        user.login_session_code = session_code
-        user.login_session_expires_at = (
-            timezone.now() + datetime.timedelta(minutes=3))
-        user.save()
+        credentials.store_session_code(user.guid, session_code)
 
         #Aquí podrías generar y enviar el código 2FA (por SMS o usar TOTP)
-        serializer = UserLoginSerializer(user)
+        serializer = UserLoginSerializer(
+            user, context={'login_session_code': session_code})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -117,36 +112,24 @@ class SendOTPView(APIView):
 
         try:
             user = CustomUser.objects.get(phone_number=phone)
-            print(user)
         except CustomUser.DoesNotExist:
-            sleep(random.randint(4, 10))
-            return Response(
-                {'detail': 'Credenciales inválidas'}, status=404)
+            return failed_attempt(Response(
+                {'detail': 'Credenciales inválidas'}, status=404))
         
-        if session_code != user.login_session_code:
-            sleep(random.randint(4, 10))
-            return Response(
-                {'detail': 'Credenciales inválidas'}, status=400)
+        if not user.has_valid_session_token(session_code):
+            return failed_attempt(Response(
+                {'detail': 'Credenciales inválidas'}, status=400))
 
-        #TODO: descomentar las lineas de codigo de 3 comillas
         # Generar OTP de 6 dígitos
-        """otp_code = str(random.randint(100000, 999999))
-        user.current_otp = otp_code"""
-        #TODO: eliminar codigo de la linea 133
-        user.current_otp = 123456
-        user.code_expires_at = (
-            timezone.now() + datetime.timedelta(minutes=2))
-        user.save()
+        otp_code = f"{secrets.randbelow(10 ** 6):06d}"
+        credentials.store_otp(user.guid, otp_code)
 
-        #TODO: descomentar las lineas de codigo de 3 comillas
-        # Enviar SMS con Twilio
-        """client = Client(
-            settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
-        message = client.messages.create(
-            body=f"Tu código de verificación es: {otp_code}",
-            from_=settings.TWILIO_PHONE_NUMBER,
-            to=phone
-        )"""
+        # el SMS lo envía el comando send_sms, si no alcanza a salir
+        # antes de que venza el OTP se descarta
+        enqueue_sms(
+            phone,
+            f"Tu código de verificación es: {otp_code}",
+            ttl=credentials.OTP_TTL)
 
         return Response(
             {'detail': 'Código enviado correctamente'}, status=200)
@@ -166,36 +149,35 @@ class VerificarOTPView(APIView):
         login_session_code = request.data.get('login_session_code')
 
         if not guid or not otp_code or not login_session_code:
-            sleep(random.randint(4, 10))
-            return Response(
-                {"detail": "Credenciales inválidas"}, status=400)
+            return failed_attempt(Response(
+                {"detail": "Credenciales inválidas"}, status=400))
 
         try:
             user = CustomUser.objects.get(guid=guid)
         except CustomUser.DoesNotExist:
-            sleep(random.randint(4, 10))
-            return Response({'detail': 'Credenciales inválidas'}, 
-                            status=404)
+            return failed_attempt(Response(
+                {'detail': 'Credenciales inválidas'}, status=404))
 
         if not user.has_valid_otp(otp_code):
-            sleep(random.randint(4, 10))
-            return Response({'detail': 'Credenciales inválidas'}, 
-                            status=401)
+            return failed_attempt(Response(
+                {'detail': 'Credenciales inválidas'}, status=401))
         
         if not user.has_valid_session_token(login_session_code):
-            sleep(random.randint(4, 10))
-            return Response({'detail': 'Credenciales inválidas'}, 
-                            status=401)
+            return failed_attempt(Response(
+                {'detail': 'Credenciales inválidas'}, status=401))
 
-        # Limpiar OTP después de validarlo
-        user.last_2fa_verified_at = timezone.now()
-        user.current_otp = None
-        user.code_expires_at = None
+        # borra el OTP y el codigo de sesión, si otro request ya los
+        # usó la verificación falla
+        if not credentials.consume_login_codes(
+                user.guid, otp_code, login_session_code):
+            return failed_attempt(Response(
+                {'detail': 'Credenciales inválidas'}, status=401))
 
-        #limpiar token temporal despues de validar
-        user.login_session_code = None
-        user.login_session_expires_at = None
-        user.save()
+        # único campo del login que se escribe en la base de datos
+        user.last_2fa_verified_at = timezone.now()
+        CustomUser.objects.filter(pk=user.pk).update(
+            last_2fa_verified_at=user.last_2fa_verified_at)
+        user.invalidate_cache()
 
         refresh = RefreshToken.for_user(user)
 